@@ -2,7 +2,7 @@
 Configuration settings for the RAG system.
 """
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -20,34 +20,124 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = "llama3"
     OLLAMA_TIMEOUT: int = 120
     OLLAMA_MAX_RETRIES: int = 3
+    OLLAMA_RETRY_BACKOFF: float = 0.5
+    OLLAMA_MAX_CONCURRENCY: int = 4
     
     # Embedding settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
     EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: Path = EMBEDDINGS_DIR / "cache"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 100_000
+    EMBEDDING_STORAGE_DTYPE: str = "float32"
+    EMBEDDING_BACKEND: str = "torch"
+    ONNX_MODEL_DIR: Path = BASE_DIR / "onnx_models"
+    ONNX_QUANTIZE: bool = False
+    ONNX_INTRA_OP_THREADS: Optional[int] = None
+    ONNX_BATCH_TOKENS: int = 16384
+    ONNX_MIN_COSINE: float = 0.99
     
     # Vector database settings
     CHROMA_PERSIST_DIR: Path = BASE_DIR / "chroma_db"
     CHROMA_COLLECTION_NAME: str = "research_notes"
+    VECTOR_BACKEND: str = "chroma"
+    VECTOR_INDEX_DIR: Path = BASE_DIR / "vector_index"
+    VECTOR_INDEX_DTYPE: str = "float32"
+    VECTOR_QUANTIZATION: str = "none"
+    PQ_SUBVECTORS: int = 48
+    PQ_TRAIN_SIZE: int = 4096
+    QUANTIZATION_RERANK_FACTOR: int = 10
+
+    # Lexical and hybrid search
+    SEARCH_MODE: str = "vector"
+    LEXICAL_INDEX_ENABLED: bool = True
+    LEXICAL_SAVE_INTERVAL: float = 5.0
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    HYBRID_RRF_K: int = 60
+    HYBRID_VECTOR_WEIGHT: float = 1.0
+    HYBRID_LEXICAL_WEIGHT: float = 1.0
+    HYBRID_CANDIDATE_FACTOR: int = 4
     
     # Document processing
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
+    CHUNK_SIZE: int = 250
+    CHUNK_OVERLAP: int = 50
+    CHUNK_TOKENIZER: str = "model"
+    READ_BLOCK_SIZE: int = 1 << 20
+    STREAMING_THRESHOLD_BYTES: int = 64 * 1024 * 1024
+
+    # Document loading
+    DOCUMENT_INCLUDE: List[str] = ["*"]
+    DOCUMENT_EXCLUDE: List[str] = [".*", "*/.*"]
+    JSONL_TEXT_FIELDS: List[str] = ["text", "content", "body"]
+    
+    # Incremental ingestion
+    INGEST_MANIFEST_PATH: Path = EMBEDDINGS_DIR / "ingest_manifest.json"
+    INGEST_WORKERS: Optional[int] = None
+    INGEST_QUEUE_SIZE: int = 64
+    INGEST_UPSERT_BATCH_SIZE: int = 1024
+    
+    # Near-duplicate chunk detection
+    DEDUP_ENABLED: bool = True
+    DEDUP_INDEX_PATH: Path = EMBEDDINGS_DIR / "dedup_index.sqlite"
+    DEDUP_THRESHOLD: float = 0.85
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_SHINGLE_SIZE: int = 5
     
     # Retrieval settings
     TOP_K_RESULTS: int = 3
-    SIMILARITY_THRESHOLD: float = 0.7
+    SIMILARITY_THRESHOLD: float = 0.3
+    ADAPTIVE_TOP_K_DROP: float = 0.2
+    QUERY_CACHE_SIZE: int = 1024
+    QUERY_CACHE_TTL: float = 3600.0
+    
+    # Cross-encoder reranking
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_LATENCY_BUDGET_MS: float = 250.0
+    RERANK_CACHE_SIZE: int = 8192
+    
+    # Prompt context packing
+    CONTEXT_TOKEN_BUDGET: int = 2048
+    CONTEXT_DEDUPE_THRESHOLD: float = 0.8
+    CONTEXT_SHINGLE_SIZE: int = 5
+    CONTEXT_MERGE_ADJACENT: bool = True
+    CONTEXT_TOKENIZER: str = "approx"
     
     # Generation settings
     MAX_TOKENS: int = 1000
     TEMPERATURE: float = 0.7
     TOP_P: float = 0.9
+    RESPONSE_CACHE_SIZE: int = 256
+    RESPONSE_CACHE_TTL: float = 3600.0
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_SIZE: int = 1024
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9
+    SEMANTIC_CACHE_TTL: float = 3600.0
+    
+    # API service
+    API_HOST: str = "127.0.0.1"
+    API_PORT: int = 8000
+    SEARCH_BATCH_MAX_SIZE: int = 32
+    SEARCH_BATCH_MAX_WAIT_MS: float = 5.0
+    CLI_SERVER_URL: Optional[str] = None
     
     # System prompt
     SYSTEM_PROMPT: str = """You are a helpful AI assistant that provides accurate and relevant information based on the given context. 
     If you don't know the answer or the context doesn't contain relevant information, say so. 
     Always cite your sources when providing information."""
     
+    # Collection inspection
+    INSPECT_PAGE_SIZE: int = 1000
+    INSPECT_NEAR_DUPLICATE_BITS: int = 3
+    
+    # Metrics and tracing
+    METRICS_ENABLED: bool = True
+    TRACE_REQUESTS: bool = False
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: Optional[Path] = BASE_DIR / "logs" / "app.log"
@@ -0,0 +1,381 @@
+"""
+HTTP query service for the RAG system.
+
+The embedding model and the Chroma collection are loaded once at startup
+and stay resident, concurrent ``/search`` requests are embedded together in
+micro-batches, and ``/ask`` can stream tokens as server-sent events.
+Stage latencies are exported at ``/metrics``, and a request sent with
+``"trace": true`` gets the timings of its own stages back.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, Literal
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from config.config import settings
+from src.core.async_generator import AsyncGenerator
+from src.core.ingest import ingest
+from src.core.metrics import current_trace, record_span, render_metrics, trace
+from src.core.vector_store import VectorStore
+
+
+class SearchRequest(BaseModel):
+    """Body of a /search request."""
+
+    query: str
+    n_results: Optional[int] = None
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    where: Optional[Dict[str, Any]] = None
+    threshold: Optional[float] = None
+    max_drop: Optional[float] = None
+    rerank: Optional[bool] = None
+    trace: bool = False
+
+
+class AskRequest(BaseModel):
+    """Body of an /ask request."""
+
+    query: str
+    n_results: Optional[int] = None
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    where: Optional[Dict[str, Any]] = None
+    threshold: Optional[float] = None
+    max_drop: Optional[float] = None
+    rerank: Optional[bool] = None
+    stream: bool = False
+    trace: bool = False
+
+
+class IngestRequest(BaseModel):
+    """Body of an /ingest request."""
+
+    incremental: bool = True
+    workers: Optional[int] = None
+
+
+class SearchBatcher:
+    """Coalesce concurrent searches into micro-batches.
+
+    The first queued query opens a batch that collects further queries for
+    up to ``max_wait_ms`` or until ``max_batch_size`` are waiting; the whole
+    batch is then embedded in one forward pass by ``search_batch``. The
+    spans of a batch are added to the trace of every traced query in it.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """Initialize the batcher.
+
+        Args:
+            vector_store: Vector store to search
+            max_batch_size: Maximum queries per batch (defaults to settings.SEARCH_BATCH_MAX_SIZE)
+            max_wait_ms: Maximum time to wait for a batch to fill
+                (defaults to settings.SEARCH_BATCH_MAX_WAIT_MS)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.vector_store = vector_store
+        self.max_batch_size = max_batch_size or settings.SEARCH_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.SEARCH_BATCH_MAX_WAIT_MS) / 1000
+        self._queue: "asyncio.Queue[Tuple[str, Tuple[Any, ...], asyncio.Future, Optional[List[Dict[str, Any]]]]]" = (
+            asyncio.Queue()
+        )
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.queries = 0
+
+    def start(self) -> None:
+        """Start the batching loop on the running event loop."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the batching loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def search(
+        self,
+        query: str,
+        n_results: Optional[int] = None,
+        mode: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        threshold: Optional[float] = None,
+        max_drop: Optional[float] = None,
+        rerank: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """Queue a query and wait for its results.
+
+        Args:
+            query: Query text
+            n_results: Number of results to return
+            mode: Search mode ("vector", "lexical" or "hybrid")
+            where: Metadata filter
+            threshold: Minimum similarity
+            max_drop: Largest similarity drop from the best result
+            rerank: Rerank candidates with the cross-encoder
+
+        Returns:
+            List[Dict[str, Any]]: Similar documents
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Options group queries into batches, so the filter is keyed by its JSON
+        options = (n_results, mode, json.dumps(where, sort_keys=True) if where else None, threshold, max_drop, rerank)
+        await self._queue.put((query, options, future, current_trace()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # search_batch takes one set of options, so group by them
+                groups: Dict[
+                    Tuple[Any, ...], List[Tuple[str, asyncio.Future, Optional[List[Dict[str, Any]]]]]
+                ] = {}
+                for query, options, future, spans in batch:
+                    groups.setdefault(options, []).append((query, future, spans))
+                for (n_results, mode, where, threshold, max_drop, rerank), items in groups.items():
+                    try:
+                        with trace() as batch_spans:
+                            results = await asyncio.to_thread(
+                                self.vector_store.search_batch, [query for query, _, _ in items],
+                                n_results, mode, json.loads(where) if where else None, threshold, max_drop, rerank
+                            )
+                    except Exception as e:
+                        for _, future, _ in items:
+                            if not future.done():
+                                future.set_exception(e)
+                        continue
+                    for (_, future, spans), docs in zip(items, results):
+                        if spans is not None:
+                            spans.extend(batch_spans)
+                        if not future.done():
+                            future.set_result(docs)
+                self.batches += 1
+                self.queries += len(batch)
+            except Exception as e:
+                # Never let one bad batch stop the loop and strand later searches
+                self.logger.error(f"Error running search batch: {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+def create_app(
+    vector_store: Optional[VectorStore] = None,
+    generator: Optional[AsyncGenerator] = None
+) -> FastAPI:
+    """Create the query service.
+
+    Args:
+        vector_store: Vector store to serve (opened at startup if omitted)
+        generator: Async generator (created at startup if omitted)
+
+    Returns:
+        FastAPI: Application
+    """
+    logger = logging.getLogger(__name__)
+    state: Dict[str, Any] = {"ready": False, "warmup_seconds": None}
+    ingest_lock = threading.Lock()
+
+    async def warm_up() -> None:
+        start = time.perf_counter()
+        store = state["vector_store"]
+        # Opens the collection and loads the embedding model once
+        await asyncio.to_thread(store.search_batch, ["warm up"], 1)
+        if settings.LEXICAL_INDEX_ENABLED:
+            await asyncio.to_thread(lambda: store.lexical_index)
+        if settings.RERANK_ENABLED:
+            await asyncio.to_thread(lambda: store.reranker.model)
+        state["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        state["ready"] = True
+        logger.info(f"Warm-up finished in {state['warmup_seconds']}s")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        state["vector_store"] = vector_store or await asyncio.to_thread(VectorStore)
+        state["generator"] = generator or AsyncGenerator()
+        state["batcher"] = SearchBatcher(state["vector_store"])
+        state["batcher"].start()
+        warmup = asyncio.create_task(warm_up())
+        yield
+        warmup.cancel()
+        await state["batcher"].stop()
+        await state["generator"].aclose()
+        await asyncio.to_thread(state["vector_store"].flush)
+
+    app = FastAPI(title="RAG Research Notes", lifespan=lifespan)
+
+    def traced(request: Any) -> Any:
+        """Collect the request's spans if it or TRACE_REQUESTS asks for them."""
+        return trace() if request.trace or settings.TRACE_REQUESTS else contextlib.nullcontext()
+
+    def finish_request(
+        endpoint: str,
+        request: Any,
+        start: float,
+        spans: Optional[List[Dict[str, Any]]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Record the request's latency and publish its trace.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The spans, if the request asked for them
+        """
+        seconds = time.perf_counter() - start
+        record_span("request", seconds, endpoint=endpoint)
+        if spans is None:
+            return None
+        spans.append({"span": "request", "endpoint": endpoint, "ms": round(seconds * 1000, 3)})
+        if settings.TRACE_REQUESTS:
+            logger.info(f"Trace {json.dumps({'endpoint': endpoint, 'query': request.query, 'spans': spans})}")
+        return spans if request.trace else None
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return {"status": "ok"}
+
+    @app.get("/ready")
+    async def ready() -> JSONResponse:
+        body = {"ready": state["ready"], "warmup_seconds": state["warmup_seconds"]}
+        return JSONResponse(body, status_code=200 if state["ready"] else 503)
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        batcher = state["batcher"]
+        return {
+            "vector_store": state["vector_store"].cache_stats(),
+            "generator": state["generator"].cache_stats(),
+            "search_batches": {
+                "batches": batcher.batches,
+                "queries": batcher.queries,
+                "mean_batch_size": batcher.queries / batcher.batches if batcher.batches else 0.0,
+            },
+        }
+
+    @app.get("/metrics")
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    @app.post("/search")
+    async def search(request: SearchRequest) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            with traced(request) as spans:
+                body: Dict[str, Any] = {"results": await state["batcher"].search(
+                    request.query, request.n_results, request.mode, request.where, request.threshold,
+                    request.max_drop, request.rerank
+                )}
+        except Exception as e:
+            logger.error(f"Error serving search: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        spans = finish_request("search", request, start, spans)
+        if spans is not None:
+            body["trace"] = spans
+        return body
+
+    @app.post("/ask")
+    async def ask(request: AskRequest):
+        start = time.perf_counter()
+        generator: AsyncGenerator = state["generator"]
+        with traced(request) as spans:
+            try:
+                retrieved_docs = await state["batcher"].search(
+                    request.query, request.n_results, request.mode, request.where, request.threshold,
+                    request.max_drop, request.rerank
+                )
+            except Exception as e:
+                logger.error(f"Error serving ask: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+
+            if not request.stream:
+                try:
+                    response = await generator.agenerate_response(request.query, retrieved_docs)
+                except Exception as e:
+                    raise HTTPException(status_code=502, detail=str(e))
+
+        if not request.stream:
+            body = {"response": response, "retrieved_docs": retrieved_docs}
+            spans = finish_request("ask", request, start, spans)
+            if spans is not None:
+                body["trace"] = spans
+            return body
+
+        async def events():
+            stats: Dict[str, Any] = {}
+            yield f"event: retrieved\ndata: {json.dumps(retrieved_docs)}\n\n"
+            try:
+                # The stream runs after the handler returned, so resume its trace
+                with trace(spans) if spans is not None else contextlib.nullcontext():
+                    async for token in generator.agenerate_stream(request.query, retrieved_docs, stats):
+                        yield f"data: {json.dumps(token)}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+                return
+            request_spans = finish_request("ask", request, start, spans)
+            if request_spans is not None:
+                stats["trace"] = request_spans
+            yield f"event: done\ndata: {json.dumps(stats)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/ingest")
+    async def run_ingest(request: IngestRequest) -> Dict[str, Any]:
+        if not ingest_lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="Ingestion already running")
+        try:
+            store = state["vector_store"]
+            return await asyncio.to_thread(
+                ingest,
+                workers=request.workers,
+                incremental=request.incremental,
+                vector_store=store,
+                generator=store.embedding_generator
+            )
+        except Exception as e:
+            logger.error(f"Error serving ingest: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            ingest_lock.release()
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    uvicorn.run(create_app(), host=settings.API_HOST, port=settings.API_PORT)
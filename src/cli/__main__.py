@@ -0,0 +1,10 @@
+"""
+Entry point of ``python -m src.cli``.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.cli.main import main
+
+sys.exit(main())
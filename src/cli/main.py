@@ -0,0 +1,280 @@
+"""
+Command line interface of the RAG system.
+
+    python -m src.cli ingest [--full] [--workers N]
+    python -m src.cli search "query" [-n 5] [--mode hybrid]
+    python -m src.cli ask "query" [--stream]
+    python -m src.cli inspect
+    python -m src.cli bench {startup,rag,embeddings,chunker,memory,quantization,load} [args...]
+
+Only the standard library and the settings are imported up front; each
+command imports what it needs when it runs, so ``inspect`` or ``--help``
+never pay for PyTorch. With ``--server URL`` (or CLI_SERVER_URL), ingest,
+search and ask are sent to a running query service, whose model is
+already warm, instead of loading it in this process.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import json
+import time
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from config.config import settings
+
+
+# Benchmarks runnable through "bench", by module
+BENCHMARKS = {
+    "rag": "src.utils.bench_rag",
+    "embeddings": "src.utils.bench_embeddings",
+    "chunker": "src.utils.bench_chunker",
+    "memory": "src.utils.bench_memory",
+    "quantization": "src.utils.bench_quantization",
+    "load": "src.utils.load_test",
+}
+
+# Commands that must start without the embedding stack, and their cold-start
+# budget; importing PyTorch alone takes several seconds
+LIGHT_COMMANDS = (["--help"], ["inspect"])
+STARTUP_TARGET_SECONDS = 2.0
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers")
+
+
+def _post(server: str, path: str, body: Dict[str, Any]) -> Any:
+    """POST a JSON body to the query service and return the open response."""
+    import urllib.request
+
+    request = urllib.request.Request(
+        server.rstrip("/") + path,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    return urllib.request.urlopen(request, timeout=settings.OLLAMA_TIMEOUT)
+
+
+def _server_events(response: Any) -> Iterator[Tuple[str, Any]]:
+    """Parse the server-sent events of a streaming /ask response."""
+    event = "message"
+    for raw in response:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+        elif not line:
+            event = "message"
+
+
+def _print_results(results: List[Dict[str, Any]]) -> None:
+    for i, result in enumerate(results, 1):
+        score = result.get("rerank_score", result.get("score"))
+        if score is None and result.get("distance") is not None:
+            score = 1 - result["distance"]
+        print(f"\n{i}. From: {result['metadata']['source']} (chunk {result['metadata'].get('chunk_index')})")
+        print(f"Text: {result['text'][:200]}...")
+        if score is not None:
+            print(f"Score: {score:.4f}")
+
+
+def _search_body(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "query": args.query,
+        "n_results": args.n_results,
+        "mode": args.mode,
+        "where": json.loads(args.where) if args.where else None,
+        "threshold": args.threshold,
+        "max_drop": args.max_drop,
+        "rerank": args.rerank,
+    }
+
+
+def cmd_ingest(args: argparse.Namespace) -> int:
+    """Ingest the data directory."""
+    if args.server:
+        with _post(args.server, "/ingest", {"incremental": not args.full, "workers": args.workers}) as response:
+            stats = json.load(response)
+    else:
+        from src.core.ingest import ingest
+        stats = ingest(workers=args.workers, incremental=not args.full)
+    print(json.dumps(stats, indent=2, default=str))
+    return 0
+
+
+def cmd_search(args: argparse.Namespace) -> int:
+    """Search the vector store."""
+    body = _search_body(args)
+    if args.server:
+        with _post(args.server, "/search", body) as response:
+            results = json.load(response)["results"]
+    else:
+        from src.core.vector_store import VectorStore
+        query = body.pop("query")
+        results = VectorStore().search(query, **body)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Search results for: {args.query}")
+        _print_results(results)
+    return 0
+
+
+def cmd_ask(args: argparse.Namespace) -> int:
+    """Answer a question from the retrieved notes."""
+    body = {**_search_body(args), "stream": args.stream}
+    if args.server and args.stream:
+        with _post(args.server, "/ask", body) as response:
+            for event, data in _server_events(response):
+                if event == "message":
+                    print(data, end="", flush=True)
+                elif event == "error":
+                    print(f"\nError: {data}", file=sys.stderr)
+                    return 1
+        print()
+        return 0
+    if args.server:
+        with _post(args.server, "/ask", body) as response:
+            print(json.load(response)["response"])
+        return 0
+
+    from src.core.generator import Generator
+    from src.core.vector_store import VectorStore
+
+    query = body.pop("query")
+    body.pop("stream")
+    retrieved_docs = VectorStore().search(query, **body)
+    generator = Generator()
+    if args.stream:
+        for token in generator.generate_stream(query, retrieved_docs):
+            print(token, end="", flush=True)
+        print()
+    else:
+        print(generator.generate_response(query, retrieved_docs))
+    return 0
+
+
+def cmd_inspect(args: argparse.Namespace) -> int:
+    """Summarize the collection without loading the embedding model."""
+    from src.utils.inspect_db import inspect_collection
+
+    report = json.dumps(inspect_collection(page_size=args.page_size), indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    print(report)
+    return 0
+
+
+def measure_startup(repeats: int = 5) -> Dict[str, Any]:
+    """Time the light commands in fresh interpreters.
+
+    Args:
+        repeats: Runs per command; the median is reported
+
+    Returns:
+        Dict[str, Any]: Median wall-clock seconds per command, the target
+        and whether a heavy module was imported
+    """
+    import statistics
+    import subprocess
+
+    probe = (
+        "import json, runpy, sys\n"
+        "sys.argv = ['src.cli'] + sys.argv[1:]\n"
+        "try:\n    runpy.run_module('src.cli', run_name='__main__')\n"
+        "except SystemExit:\n    pass\n"
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)), file=sys.stderr)"
+    )
+    results: Dict[str, Any] = {"target_seconds": STARTUP_TARGET_SECONDS, "commands": {}}
+    for command in LIGHT_COMMANDS:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-c", probe, *command], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            )
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        results["commands"][" ".join(command)] = {
+            "median_seconds": round(median, 3),
+            "within_target": median <= STARTUP_TARGET_SECONDS,
+            "heavy_imports": json.loads(completed.stderr.strip().splitlines()[-1]),
+        }
+    return results
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    """Run a benchmark, passing the remaining arguments through."""
+    if args.benchmark == "startup":
+        print(json.dumps(measure_startup(), indent=2))
+        return 0
+
+    import runpy
+
+    sys.argv = [BENCHMARKS[args.benchmark], *args.args]
+    runpy.run_module(BENCHMARKS[args.benchmark], run_name="__main__", alter_sys=True)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser of every command."""
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Query and manage the research notes")
+    parser.add_argument("--log-level", default=settings.LOG_LEVEL, help="Logging level")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    server_help = "Send the request to a running query service (default: CLI_SERVER_URL)"
+
+    ingest = commands.add_parser("ingest", help="Ingest the data directory")
+    ingest.add_argument("--full", action="store_true", help="Re-ingest every file, not only changed ones")
+    ingest.add_argument("--workers", type=int, default=None, help="Read/chunk processes")
+    ingest.add_argument("--server", default=settings.CLI_SERVER_URL, help=server_help)
+    ingest.set_defaults(handler=cmd_ingest)
+
+    for name, handler, help_text in (("search", cmd_search, "Search the notes"), ("ask", cmd_ask, "Ask a question")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("query")
+        command.add_argument("-n", "--n-results", type=int, default=None, help="Number of results")
+        command.add_argument("--mode", choices=("vector", "lexical", "hybrid"), default=None)
+        command.add_argument("--where", default=None, help='Metadata filter as JSON, e.g. \'{"source": "rag.txt"}\'')
+        command.add_argument("--threshold", type=float, default=None, help="Minimum similarity")
+        command.add_argument("--max-drop", type=float, default=None, help="Largest similarity drop from the best result")
+        command.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=None)
+        command.add_argument("--server", default=settings.CLI_SERVER_URL, help=server_help)
+        command.set_defaults(handler=handler)
+    commands.choices["search"].add_argument("--json", action="store_true", help="Print the results as JSON")
+    commands.choices["ask"].add_argument("--stream", action="store_true", help="Print tokens as they arrive")
+
+    inspect = commands.add_parser("inspect", help="Summarize the vector store")
+    inspect.add_argument("--page-size", type=int, default=None, help="Records read per page")
+    inspect.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    inspect.set_defaults(handler=cmd_inspect)
+
+    bench = commands.add_parser("bench", help="Run a benchmark")
+    bench.add_argument("benchmark", choices=("startup", *BENCHMARKS))
+    bench.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the benchmark")
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a command.
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv[1:])
+
+    Returns:
+        int: Exit status
+    """
+    import logging
+
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Async generator component for RAG system using Ollama.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import time
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+import httpx
+from config.config import settings
+from src.core.generator import Generator, RETRY_STATUS_CODES
+from src.core.metrics import record_ollama_stats, span
+
+
+class AsyncGenerator(Generator):
+    """Async generator sharing one pooled connection to Ollama.
+
+    All requests go through a single keep-alive ``httpx.AsyncClient``, are
+    retried with exponential backoff up to ``OLLAMA_MAX_RETRIES`` times on
+    connection errors and transient status codes, and are capped at
+    ``OLLAMA_MAX_CONCURRENCY`` in flight by a semaphore. The client belongs
+    to the event loop it was created on and is closed when that loop shuts
+    down, when another loop takes over, or by ``aclose``.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        """Initialize the async generator.
+
+        Args:
+            max_concurrency: Maximum in-flight requests
+                (defaults to settings.OLLAMA_MAX_CONCURRENCY)
+        """
+        super().__init__()
+        self.logger = logging.getLogger(__name__)
+        self.max_concurrency = max_concurrency or settings.OLLAMA_MAX_CONCURRENCY
+        self.retry_backoff = settings.OLLAMA_RETRY_BACKOFF
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closer: Optional["asyncio.Task[None]"] = None
+
+    async def __aenter__(self) -> "AsyncGenerator":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled client."""
+        if self._client is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            self._closer.cancel()
+            await asyncio.gather(self._closer, return_exceptions=True)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._closer.cancel)
+        self._client = None
+
+    @staticmethod
+    async def _close_with_loop(client: httpx.AsyncClient) -> None:
+        """Keep a client open until cancelled, which shutting down its loop does."""
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await client.aclose()
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """Create the pooled client and semaphore for the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None and not self._loop.is_closed():
+                # The old client's connections can only be closed on its own loop
+                self._loop.call_soon_threadsafe(self._closer.cancel)
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+            self._closer = loop.create_task(self._close_with_loop(self._client))
+        return self._client
+
+    async def _send(self, body: Dict[str, Any], stream: bool) -> httpx.Response:
+        """Send a generate request, retrying transient failures.
+
+        Args:
+            body: JSON request body
+            stream: Leave the response body unread for streaming
+
+        Returns:
+            httpx.Response: Successful response (caller closes it if streaming)
+        """
+        client = self._ensure_client()
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                request = client.build_request("POST", "/api/generate", json=body)
+                response = await client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise
+                self.logger.warning(f"Ollama request failed ({e!r}), retrying")
+            else:
+                if response.status_code == 200:
+                    return response
+                text = (await response.aread()).decode("utf-8", "replace")
+                await response.aclose()
+                if last_attempt or response.status_code not in RETRY_STATUS_CODES:
+                    raise Exception(f"Ollama API returned status code {response.status_code}: {text}")
+                self.logger.warning(f"Ollama returned status code {response.status_code}, retrying")
+
+            # Exponential backoff with jitter
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+        raise AssertionError("unreachable")
+
+    @contextlib.asynccontextmanager
+    async def _astream_request(self, body: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        """Open a streaming generate request on the pooled client."""
+        self._ensure_client()
+        async with self._semaphore:
+            response = await self._send(body, stream=True)
+            try:
+                yield response
+            finally:
+                await response.aclose()
+
+    async def agenerate_stream(
+        self,
+        query: str,
+        retrieved_docs: List[Dict[str, Any]],
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Async variant of generate_stream, streaming over the pooled client.
+
+        Args:
+            query: User's query
+            retrieved_docs: Retrieved documents from vector store
+            stats: Optional dict to fill with the final generation stats
+
+        Yields:
+            str: Response tokens
+        """
+        try:
+            prompt = self._format_prompt(query, retrieved_docs)
+            options = self._options()
+            cached, lookup = await asyncio.to_thread(self._lookup_answer, query, retrieved_docs, prompt, options)
+            if cached is not None:
+                self._set_stats(stats, {"cached": True})
+                yield cached
+                return
+
+            start = time.perf_counter()
+            first_token_at = None
+            done = False
+            parts = []
+            async with self._astream_request(self._request_body(prompt, options, stream=True)) as response:
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise Exception(f"Ollama API returned an error: {chunk['error']}")
+                    token = chunk.get("response", "")
+                    if token:
+                        first_token_at = first_token_at or time.perf_counter()
+                        parts.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        done = True
+                        self._set_stats(stats, self._final_stats(chunk, start, first_token_at))
+                        break
+
+            if not done:
+                # A dropped connection ends the lines early; never cache a truncated answer
+                raise Exception("Ollama stream ended before the final chunk")
+            self._remember_answer(lookup, "".join(parts).strip(), time.perf_counter() - start)
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {e}")
+            raise
+
+    async def agenerate_response(self, query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
+        """Generate a response using Ollama without blocking the event loop.
+
+        Args:
+            query: User's query
+            retrieved_docs: Retrieved documents from vector store
+
+        Returns:
+            str: Generated response
+        """
+        try:
+            prompt = self._format_prompt(query, retrieved_docs)
+            options = self._options()
+            cached, lookup = await asyncio.to_thread(self._lookup_answer, query, retrieved_docs, prompt, options)
+            if cached is not None:
+                return cached
+
+            self._ensure_client()
+            start = time.perf_counter()
+            async with self._semaphore:
+                with span("ollama_generate"):
+                    response = await self._send(self._request_body(prompt, options, stream=False), stream=False)
+            result = response.json()
+            record_ollama_stats(result)
+            answer = result["response"].strip()
+            self._remember_answer(lookup, answer, time.perf_counter() - start)
+            return answer
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            raise
+
+    async def generate_many(
+        self,
+        queries: List[str],
+        vector_store: Any,
+        n_results: Optional[int] = None,
+        retrieval_batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many queries, overlapping retrieval and generation.
+
+        Queries are retrieved in batches with ``vector_store.search_batch`` in
+        a worker thread, and each query starts generating as soon as its batch
+        is retrieved, while later batches are still being searched.
+        Generation concurrency is bounded by the semaphore.
+
+        Args:
+            queries: Questions to answer
+            vector_store: Vector store providing search_batch
+            n_results: Documents retrieved per query (defaults to settings.TOP_K_RESULTS)
+            retrieval_batch_size: Queries per search_batch call
+                (defaults to settings.EMBEDDING_BATCH_SIZE)
+
+        Returns:
+            List[Dict[str, Any]]: Per query, in input order, the query, the
+            retrieved documents and the response, or the error raised
+        """
+        retrieval_batch_size = retrieval_batch_size or settings.EMBEDDING_BATCH_SIZE
+        loop = asyncio.get_running_loop()
+        retrieved: List["asyncio.Future[List[Dict[str, Any]]]"] = [loop.create_future() for _ in queries]
+
+        async def retrieve() -> None:
+            for start in range(0, len(queries), retrieval_batch_size):
+                batch = queries[start:start + retrieval_batch_size]
+                try:
+                    results = await asyncio.to_thread(vector_store.search_batch, batch, n_results)
+                except Exception as e:
+                    for future in retrieved[start:start + len(batch)]:
+                        future.set_exception(e)
+                    continue
+                for future, docs in zip(retrieved[start:start + len(batch)], results):
+                    future.set_result(docs)
+
+        async def answer(i: int) -> Dict[str, Any]:
+            result: Dict[str, Any] = {"query": queries[i]}
+            try:
+                result["retrieved_docs"] = await retrieved[i]
+                result["response"] = await self.agenerate_response(queries[i], result["retrieved_docs"])
+            except Exception as e:
+                result["error"] = str(e)
+            return result
+
+        retriever = asyncio.create_task(retrieve())
+        results = await asyncio.gather(*(answer(i) for i in range(len(queries))))
+        await retriever
+        return results
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Answer a batch of questions concurrently
+    from src.core.vector_store import VectorStore
+
+    async def main() -> None:
+        queries = [
+            "What is RAG architecture?",
+            "How do attention mechanisms work?",
+            "What are the key components of a vector database?",
+        ]
+        async with AsyncGenerator() as generator:
+            for result in await generator.generate_many(queries, VectorStore()):
+                print(f"\nQuery: {result['query']}")
+                print(f"Response: {result.get('response', result.get('error'))}")
+
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+"""
+Storage backends of the vector store.
+
+Backend modules are imported on demand, so opening a collection loads
+neither the Chroma stack (unless it is used) nor the embedding model.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from typing import Optional
+
+from config.config import settings
+from src.core.backends.base import VectorBackend
+
+
+BACKENDS = ("chroma", "numpy")
+
+
+def create_backend(name: Optional[str] = None) -> VectorBackend:
+    """Create a storage backend by name.
+
+    Backend modules are imported on demand, so the Chroma stack is only
+    loaded when it is used.
+
+    Args:
+        name: "chroma" or "numpy" (defaults to settings.VECTOR_BACKEND)
+
+    Returns:
+        VectorBackend: Opened backend
+    """
+    name = name or settings.VECTOR_BACKEND
+    if name == "chroma":
+        from src.core.backends.chroma_backend import ChromaBackend
+        return ChromaBackend()
+    if name == "numpy":
+        from src.core.backends.numpy_backend import NumpyBackend
+        return NumpyBackend()
+    raise ValueError(f"Unknown vector backend {name!r}, expected one of {BACKENDS}")
@@ -0,0 +1,136 @@
+"""
+Storage backend interface of the vector store.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent))
+
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
+
+
+class VectorBackend(ABC):
+    """Persistent collection of vectors with their text and metadata.
+
+    The interface mirrors the subset of the Chroma collection API the vector
+    store uses, so results are dictionaries of per-query lists ("ids",
+    "documents", "metadatas", "distances") and distances are cosine
+    distances. ``where`` filters use Chroma's syntax: ``{"key": value}``,
+    ``{"key": {"$op": value}}`` with $eq, $ne, $gt, $gte, $lt, $lte, $in
+    and $nin, combined with ``{"$and": [...]}`` and ``{"$or": [...]}``.
+    """
+
+    #: Directory holding the backend's files
+    path: Path
+    #: Collection name
+    name: str
+
+    @property
+    def max_batch_size(self) -> int:
+        """Largest number of records accepted by one upsert call."""
+        return 5461
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[Any],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """Insert records, replacing those whose id already exists."""
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Delete records by id or by metadata filter."""
+
+    @abstractmethod
+    def query(
+        self,
+        query_embeddings: List[Any],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        max_distance: Optional[float] = None
+    ) -> Dict[str, List[List[Any]]]:
+        """Return the nearest records of each query embedding.
+
+        Args:
+            query_embeddings: One embedding per query
+            n_results: Records per query
+            where: Metadata filter
+            max_distance: Leave out records farther than this
+
+        Returns:
+            Dict[str, List[List[Any]]]: "ids", "documents", "metadatas" and
+            "distances", each with one list per query, nearest first
+        """
+
+    @abstractmethod
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include_embeddings: bool = False
+    ) -> Dict[str, List[Any]]:
+        """Return records by id or filter, with "ids", "documents" and "metadatas".
+
+        With include_embeddings, "embeddings" holds the stored vectors as a
+        float32 matrix, one row per record. Records without ids or a filter
+        come in a stable order, so ``limit``/``offset`` page through them.
+        """
+
+    @abstractmethod
+    def get_ids(self, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Return the ids of the records matching a filter, without their documents or metadata."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Return the number of records."""
+
+
+_COMPARISONS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style metadata filter against one record.
+
+    Args:
+        metadata: Record metadata
+        where: Filter (None matches everything)
+
+    Returns:
+        bool: Whether the record matches
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator not in _COMPARISONS:
+                    raise ValueError(f"Unsupported filter operator {operator!r}")
+                try:
+                    if not _COMPARISONS[operator](value, operand):
+                        return False
+                except TypeError:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
@@ -0,0 +1,108 @@
+"""
+ChromaDB storage backend of the vector store.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent))
+
+import logging
+from typing import List, Dict, Any, Optional
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+from config.config import settings
+from src.core.backends.base import VectorBackend
+
+
+class ChromaBackend(VectorBackend):
+    """Persistent Chroma collection with an HNSW cosine index."""
+
+    def __init__(self, path: Optional[Path] = None, name: Optional[str] = None):
+        """Open or create the collection.
+
+        Args:
+            path: Persistence directory (defaults to settings.CHROMA_PERSIST_DIR)
+            name: Collection name (defaults to settings.CHROMA_COLLECTION_NAME)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path or settings.CHROMA_PERSIST_DIR)
+        self.name = name or settings.CHROMA_COLLECTION_NAME
+        self.client = chromadb.PersistentClient(
+            path=str(self.path),
+            settings=ChromaSettings(
+                anonymized_telemetry=False
+            )
+        )
+        self.collection = self.client.get_or_create_collection(
+            name=self.name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    @property
+    def max_batch_size(self) -> int:
+        return self.client.get_max_batch_size()
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[Any],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    @staticmethod
+    def _where(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Rewrite a filter on several keys as the single "$and" clause Chroma requires."""
+        if where and len(where) > 1:
+            return {"$and": [{key: condition} for key, condition in where.items()]}
+        return where or None
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        self.collection.delete(ids=ids, where=self._where(where))
+
+    def query(
+        self,
+        query_embeddings: List[Any],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        max_distance: Optional[float] = None
+    ) -> Dict[str, List[List[Any]]]:
+        results = self.collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=self._where(where)
+        )
+        results = {key: results[key] for key in ("ids", "documents", "metadatas", "distances")}
+        if max_distance is not None:
+            for row, distances in enumerate(results["distances"]):
+                # Nearest first, so the records to keep are a prefix
+                keep = sum(1 for distance in distances if distance <= max_distance)
+                for key in results:
+                    results[key][row] = results[key][row][:keep]
+        return results
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include_embeddings: bool = False
+    ) -> Dict[str, List[Any]]:
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        results = self.collection.get(
+            ids=ids, where=self._where(where), limit=limit, offset=offset, include=include
+        )
+        records = {key: results[key] for key in ("ids", "documents", "metadatas")}
+        if include_embeddings:
+            records["embeddings"] = (
+                np.asarray(results["embeddings"], dtype=np.float32) if len(results["ids"])
+                else np.empty((0, 0), dtype=np.float32)
+            )
+        return records
+
+    def get_ids(self, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        return self.collection.get(where=self._where(where), include=[])["ids"]
+
+    def count(self) -> int:
+        return self.collection.count()
@@ -0,0 +1,539 @@
+"""
+Exact in-process vector index backed by a memory-mapped NumPy matrix.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent))
+
+import contextlib
+import json
+import logging
+import os
+import threading
+from typing import List, Dict, Any, Callable, Iterator, Optional, Set, Tuple
+
+import numpy as np
+
+from config.config import settings
+from src.core.backends.base import VectorBackend, matches_where
+from src.core.quantization import ProductQuantizer, load_quantizer
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+SUPPORTED_DTYPES = ("float32", "float16")
+QUANTIZATIONS = ("none", "int8", "pq")
+# Rows scored per matrix multiply; keeps per-block temporaries (scores, decoded codes) cache-sized
+SEARCH_BLOCK_ROWS = 8192
+
+
+class NumpyBackend(VectorBackend):
+    """Brute-force cosine search over a contiguous matrix of normalized vectors.
+
+    Layout of ``<path>/<name>/``:
+
+    - ``index.json``: dimension, storage dtype and current generation
+    - ``vectors-<generation>.bin``: raw row-major matrix, memory-mapped and
+      grown by doubling
+    - ``records-<generation>.jsonl``: append-only log of upserts (id, row,
+      text, metadata) and deletes, replayed on open
+
+    A query is one matrix multiply per block of rows followed by
+    ``argpartition``, so there is no index to build or tune and results are
+    exact. Writes append to the log under a file lock; readers in other
+    processes pick them up by replaying the log tail before each call.
+    Deleted rows are reused, and the files are compacted into a new
+    generation once more than half of the rows are free.
+
+    With quantization ("int8" or "pq") compact codes are kept in
+    ``<array>-<generation>.bin`` files beside the matrix. Queries scan the
+    codes and re-rank a shortlist of ``QUANTIZATION_RERANK_FACTOR`` times
+    the requested results with the full-precision rows, so only the codes
+    need to stay in memory. Product quantization is trained once the index
+    holds ``PQ_TRAIN_SIZE`` vectors; until then queries are exact.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        name: Optional[str] = None,
+        dtype: Optional[str] = None,
+        quantization: Optional[str] = None
+    ):
+        """Open or create the index.
+
+        Args:
+            path: Directory of the indexes (defaults to settings.VECTOR_INDEX_DIR)
+            name: Collection name (defaults to settings.CHROMA_COLLECTION_NAME)
+            dtype: Storage dtype of new indexes, "float32" or "float16"
+                (defaults to settings.VECTOR_INDEX_DTYPE)
+            quantization: Code format of new indexes, "none", "int8" or "pq"
+                (defaults to settings.VECTOR_QUANTIZATION)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path or settings.VECTOR_INDEX_DIR)
+        self.name = name or settings.CHROMA_COLLECTION_NAME
+        self.dtype = dtype or settings.VECTOR_INDEX_DTYPE
+        if self.dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported vector index dtype {self.dtype!r}, expected one of {SUPPORTED_DTYPES}")
+        self.quantization = quantization or settings.VECTOR_QUANTIZATION
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization {self.quantization!r}, expected one of {QUANTIZATIONS}")
+        self.directory = self.path / self.name
+        self._index_path = self.directory / "index.json"
+        self._lock = threading.RLock()
+        self._index_stat: Optional[Tuple[int, int]] = None
+        self._reset(generation=None)
+
+    def _reset(self, generation: Optional[int]) -> None:
+        """Forget the in-memory state."""
+        self.generation = generation
+        self.dimension: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self.quantizer = None
+        self._codes: Dict[str, np.memmap] = {}
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._valid = np.zeros(0, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        self._free: Set[int] = set()
+        self._n_rows = 0
+        self._log_offset = 0
+        self._version = 0
+        self._mask_cache: Dict[str, np.ndarray] = {}
+
+    # Files
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.directory / f"vectors-{generation}.bin"
+
+    def _log_path(self, generation: int) -> Path:
+        return self.directory / f"records-{generation}.jsonl"
+
+    def _array_path(self, array: str, generation: int) -> Path:
+        return self.directory / f"{array}-{generation}.bin"
+
+    def _codebook_path(self, generation: int) -> Path:
+        return self.directory / f"codebook-{generation}.npy"
+
+    @contextlib.contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Hold the thread lock and, where available, an exclusive file lock."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / "lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_index(self, generation: int) -> None:
+        tmp = self._index_path.with_name("index.json.tmp")
+        tmp.write_text(json.dumps({
+            "dimension": self.dimension,
+            "dtype": self.dtype,
+            "quantization": self.quantization,
+            "generation": generation,
+        }))
+        os.replace(tmp, self._index_path)
+
+    def _sync(self) -> None:
+        """Catch up with writes made by other instances or processes."""
+        try:
+            stat = self._index_path.stat()
+        except FileNotFoundError:
+            if self.generation is not None:
+                self._reset(generation=None)
+            return
+        if (stat.st_ino, stat.st_mtime_ns) != self._index_stat:
+            index = json.loads(self._index_path.read_text())
+            self._index_stat = (stat.st_ino, stat.st_mtime_ns)
+            if index["generation"] != self.generation:
+                self._reset(index["generation"])
+                self.dimension = index["dimension"]
+                self.dtype = index["dtype"]
+                self.quantization = index.get("quantization", "none")
+        if self.quantizer is None and self.quantization != "none":
+            self.quantizer = load_quantizer(self.quantization, self.dimension, self._codebook_path(self.generation))
+            if self.quantizer is not None:
+                self._map(self._n_rows)
+
+        log_path = self._log_path(self.generation)
+        try:
+            size = log_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size > self._log_offset:
+            with open(log_path, "rb") as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # a write in progress
+                    self._log_offset += len(line)
+                    self._apply(json.loads(line))
+            self._map(self._n_rows)
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """Apply one log record to the in-memory state."""
+        self._version += 1
+        self._mask_cache.clear()
+        if record["op"] == "delete":
+            row = self._rows.pop(record["id"], None)
+            if row is not None:
+                self._valid[row] = False
+                self._ids[row] = self._documents[row] = self._metadatas[row] = None
+                self._free.add(row)
+            return
+
+        row = record["row"]
+        if row >= len(self._ids):
+            grow = row + 1 - len(self._ids)
+            self._ids.extend([None] * grow)
+            self._documents.extend([None] * grow)
+            self._metadatas.extend([None] * grow)
+        if row >= len(self._valid):
+            valid = np.zeros(max(row + 1, 2 * len(self._valid)), dtype=bool)
+            valid[:len(self._valid)] = self._valid
+            self._valid = valid
+        self._free.discard(row)
+        self._ids[row] = record["id"]
+        self._documents[row] = record["document"]
+        self._metadatas[row] = record["metadata"]
+        self._valid[row] = True
+        self._rows[record["id"]] = row
+        self._n_rows = max(self._n_rows, row + 1)
+
+    def _open_rows(self, path: Path, dtype: str, width: int, min_rows: int, grow: bool) -> np.memmap:
+        """Memory-map a row-major file, growing it by doubling if allowed."""
+        row_bytes = width * np.dtype(dtype).itemsize
+        capacity = path.stat().st_size // row_bytes if path.exists() else 0
+        if capacity < min_rows:
+            if not grow:
+                raise RuntimeError(f"Vector file {path} holds {capacity} rows, the log references {min_rows}")
+            capacity = max(min_rows, 2 * capacity, 1024)
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+
+    def _map(self, min_rows: int, grow: bool = False) -> None:
+        """Memory-map the matrix and code files so they cover at least min_rows rows."""
+        if self.dimension is None or min_rows == 0:
+            return
+        if self._matrix is None or self._matrix.shape[0] < min_rows:
+            self._matrix = self._open_rows(
+                self._vectors_path(self.generation), self.dtype, self.dimension, min_rows, grow
+            )
+        if self.quantizer is not None:
+            for array, dtype, width in self.quantizer.arrays():
+                if array not in self._codes or self._codes[array].shape[0] < min_rows:
+                    self._codes[array] = self._open_rows(
+                        self._array_path(array, self.generation), dtype, width, min_rows, grow
+                    )
+
+    # Writes
+
+    @staticmethod
+    def _normalize(vectors: Any) -> np.ndarray:
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[Any],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        with self._write_lock():
+            self._sync()
+            if self.generation is None:
+                self.generation = 0
+                self.dimension = int(vectors.shape[1])
+                self._write_index(self.generation)
+                self._sync()
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional embeddings, got {vectors.shape[1]}")
+
+            rows: Dict[str, int] = {}
+            free = sorted(self._free, reverse=True)
+            next_row = self._n_rows
+            for id_ in ids:
+                if id_ in rows:
+                    continue
+                if id_ in self._rows:
+                    rows[id_] = self._rows[id_]
+                elif free:
+                    rows[id_] = free.pop()
+                else:
+                    rows[id_] = next_row
+                    next_row += 1
+
+            self._map(next_row, grow=True)
+            targets = np.array([rows[id_] for id_ in ids])
+            self._matrix[targets] = vectors
+            self._matrix.flush()
+            if self.quantizer is not None:
+                self._write_codes(targets, vectors)
+
+            # The vectors are on disk before the log references them
+            lines = [
+                json.dumps({"op": "upsert", "id": id_, "row": rows[id_], "document": document, "metadata": metadata})
+                for id_, document, metadata in zip(ids, documents, metadatas)
+            ]
+            self._append(lines)
+            if self.quantization == "pq" and self.quantizer is None and len(self._rows) >= settings.PQ_TRAIN_SIZE:
+                self._train_pq()
+
+    def _write_codes(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Encode vectors and store their codes at the given rows."""
+        for array, codes in self.quantizer.encode(vectors).items():
+            self._codes[array][rows] = codes
+            self._codes[array].flush()
+
+    def _train_pq(self) -> None:
+        """Train the product quantizer on the live rows and encode them all."""
+        live = np.flatnonzero(self._valid[:self._n_rows])
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, min(len(live), 65536), replace=False))
+        quantizer = ProductQuantizer.train(
+            np.asarray(self._matrix[sample], dtype=np.float32), settings.PQ_SUBVECTORS
+        )
+        self.quantizer = quantizer
+        self._map(self._n_rows, grow=True)
+        for start in range(0, self._n_rows, SEARCH_BLOCK_ROWS):
+            rows = np.arange(start, min(start + SEARCH_BLOCK_ROWS, self._n_rows))
+            self._write_codes(rows, np.asarray(self._matrix[rows], dtype=np.float32))
+        # Readers start using the codes once the codebook appears
+        path = self._codebook_path(self.generation)
+        with open(path.with_name(path.name + ".tmp"), "wb") as f:
+            np.save(f, quantizer.codebooks)
+        os.replace(path.with_name(path.name + ".tmp"), path)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        with self._write_lock():
+            self._sync()
+            if where is not None:
+                matching = {self._ids[row] for row in np.flatnonzero(self._where_mask(where))}
+                ids = [id_ for id_ in (ids if ids is not None else matching) if id_ in matching]
+            ids = [id_ for id_ in ids or [] if id_ in self._rows]
+            if not ids:
+                return
+            self._append([json.dumps({"op": "delete", "id": id_}) for id_ in ids])
+            if len(self._free) > max(1024, len(self._rows)):
+                self._compact()
+
+    def _append(self, lines: List[str]) -> None:
+        """Append records to the log and apply them."""
+        with open(self._log_path(self.generation), "ab") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() != self._log_offset:
+                raise RuntimeError("Vector index log changed while locked")
+            f.write("".join(line + "\n" for line in lines).encode("utf-8"))
+        self._sync()
+
+    def _compact(self) -> None:
+        """Rewrite the live rows into a new generation without holes."""
+        generation = self.generation + 1
+        live = [row for row in range(self._n_rows) if self._valid[row]]
+        row_bytes = self.dimension * np.dtype(self.dtype).itemsize
+        vectors_path = self._vectors_path(generation)
+        with open(vectors_path, "wb") as f:
+            f.truncate(max(len(live), 1) * row_bytes)
+        if live:
+            matrix = np.memmap(vectors_path, dtype=self.dtype, mode="r+", shape=(len(live), self.dimension))
+            for start in range(0, len(live), SEARCH_BLOCK_ROWS):
+                block = live[start:start + SEARCH_BLOCK_ROWS]
+                matrix[start:start + len(block)] = self._matrix[block]
+            matrix.flush()
+            del matrix
+            if self.quantizer is not None:
+                for array, dtype, width in self.quantizer.arrays():
+                    codes = self._open_rows(self._array_path(array, generation), dtype, width, len(live), grow=True)
+                    codes[:len(live)] = self._codes[array][live]
+                    codes.flush()
+                    del codes
+                if self.quantization == "pq":
+                    np.save(self._codebook_path(generation), self.quantizer.codebooks)
+        with open(self._log_path(generation), "w", encoding="utf-8") as f:
+            for new_row, row in enumerate(live):
+                f.write(json.dumps({
+                    "op": "upsert", "id": self._ids[row], "row": new_row,
+                    "document": self._documents[row], "metadata": self._metadatas[row],
+                }) + "\n")
+
+        old_generation = self.generation
+        self._write_index(generation)
+        self._sync()
+        for path in self.directory.glob(f"*-{old_generation}.*"):
+            path.unlink(missing_ok=True)
+        self.logger.info(f"Compacted vector index {self.name} to {len(live)} rows")
+
+    # Reads
+
+    def _where_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Boolean mask of the live rows matching a filter."""
+        valid = self._valid[:self._n_rows]
+        if not where:
+            return valid
+        key = json.dumps(where, sort_keys=True)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (bool(valid[row]) and matches_where(self._metadatas[row], where) for row in range(self._n_rows)),
+                dtype=bool, count=self._n_rows
+            )
+            if len(self._mask_cache) >= 64:
+                self._mask_cache.clear()
+            self._mask_cache[key] = mask
+        return mask
+
+    @staticmethod
+    def _keep_best(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Reduce per-query candidate scores and rows to the k best, unordered."""
+        if scores.shape[1] <= k:
+            return scores, rows
+        keep = np.argpartition(scores, -k, axis=1)[:, -k:]
+        return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+
+    def _score_exact(self, queries: np.ndarray, rows: Any) -> np.ndarray:
+        """Inner products of queries with full-precision rows."""
+        return queries @ np.asarray(self._matrix[rows], dtype=np.float32).T
+
+    def _score_codes(self, queries: np.ndarray, rows: Any) -> np.ndarray:
+        """Approximate inner products of queries with quantized rows."""
+        return self.quantizer.score(queries, {array: codes[rows] for array, codes in self._codes.items()})
+
+    def _top_k(
+        self,
+        queries: np.ndarray,
+        mask: np.ndarray,
+        k: int,
+        score: Callable[[np.ndarray, Any], np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the rows and scores of the k best rows per query, best first."""
+        n_queries = len(queries)
+        selected = None if mask.all() else np.flatnonzero(mask)
+        if selected is not None and 4 * len(selected) < self._n_rows:
+            # Selective filter: gather the matching rows instead of scanning all
+            scores = score(queries, selected)
+            scores, rows = self._keep_best(scores, np.broadcast_to(selected, scores.shape), k)
+        else:
+            scores = np.empty((n_queries, 0), dtype=np.float32)
+            rows = np.empty((n_queries, 0), dtype=np.int64)
+            for start in range(0, self._n_rows, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self._n_rows)
+                block_scores = score(queries, slice(start, end))
+                if selected is not None:
+                    block_scores[:, ~mask[start:end]] = -np.inf
+                block_scores, block_rows = self._keep_best(
+                    block_scores, np.broadcast_to(np.arange(start, end), block_scores.shape), k
+                )
+                # Merge with the best rows of earlier blocks
+                scores, rows = self._keep_best(
+                    np.concatenate([scores, block_scores], axis=1), np.concatenate([rows, block_rows], axis=1), k
+                )
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def _rerank(self, queries: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score each query's shortlist with full-precision rows and keep the k best."""
+        rows = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for i, query in enumerate(queries):
+            shortlist = np.sort(candidates[i])  # ascending rows read the memory map sequentially
+            exact = self._score_exact(query[None, :], shortlist)[0]
+            best = np.argsort(-exact, kind="stable")[:k]
+            rows[i], scores[i] = shortlist[best], exact[best]
+        return rows, scores
+
+    def query(
+        self,
+        query_embeddings: List[Any],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        max_distance: Optional[float] = None
+    ) -> Dict[str, List[List[Any]]]:
+        queries = self._normalize(query_embeddings)
+        with self._lock:
+            self._sync()
+            results: Dict[str, List[List[Any]]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            mask = self._where_mask(where) if self._n_rows else np.zeros(0, dtype=bool)
+            k = min(n_results, int(mask.sum()))
+            if k == 0:
+                for key in results:
+                    results[key] = [[] for _ in range(len(queries))]
+                return results
+            if queries.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional queries, got {queries.shape[1]}")
+
+            if self.quantizer is not None:
+                shortlist = min(k * settings.QUANTIZATION_RERANK_FACTOR, int(mask.sum()))
+                candidates, _ = self._top_k(queries, mask, shortlist, self._score_codes)
+                rows, scores = self._rerank(queries, candidates, k)
+            else:
+                rows, scores = self._top_k(queries, mask, k, self._score_exact)
+            for query_rows, query_scores in zip(rows.tolist(), scores.tolist()):
+                if max_distance is not None:
+                    # Best first: cut before materializing rows that are too far
+                    keep = sum(1 for score in query_scores if 1.0 - score <= max_distance)
+                    query_rows, query_scores = query_rows[:keep], query_scores[:keep]
+                results["ids"].append([self._ids[row] for row in query_rows])
+                results["documents"].append([self._documents[row] for row in query_rows])
+                results["metadatas"].append([dict(self._metadatas[row]) for row in query_rows])
+                results["distances"].append([1.0 - score for score in query_scores])
+            return results
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include_embeddings: bool = False
+    ) -> Dict[str, List[Any]]:
+        with self._lock:
+            self._sync()
+            if self._n_rows == 0:
+                rows: List[int] = []
+            elif ids is not None:
+                mask = self._where_mask(where)
+                rows = [self._rows[id_] for id_ in ids if id_ in self._rows and mask[self._rows[id_]]]
+            else:
+                rows = np.flatnonzero(self._where_mask(where))
+            start = offset or 0
+            # Slice before converting, so paging through a large index stays cheap
+            rows = np.asarray(rows, dtype=np.int64)[start:start + limit if limit is not None else None].tolist()
+            records = {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._documents[row] for row in rows],
+                "metadatas": [dict(self._metadatas[row]) for row in rows],
+            }
+            if include_embeddings:
+                records["embeddings"] = (
+                    np.asarray(self._matrix[rows], dtype=np.float32) if rows
+                    else np.empty((0, self.dimension or 0), dtype=np.float32)
+                )
+            return records
+
+    def get_ids(self, where: Optional[Dict[str, Any]] = None) -> List[str]:
+        with self._lock:
+            self._sync()
+            if self._n_rows == 0:
+                return []
+            return [self._ids[row] for row in np.flatnonzero(self._where_mask(where))]
+
+    def count(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._rows)
@@ -0,0 +1,174 @@
+"""
+Token-aware text chunking for the RAG system.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import functools
+import logging
+import re
+from collections import deque
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from config.config import settings
+
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+# Approximate word pieces: punctuation marks and words, long words split every 8 characters
+_APPROX_TOKEN = re.compile(r"\w{1,8}|[^\w\s]")
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """Lazily split text into sentences.
+
+    Args:
+        text: Text to split
+
+    Yields:
+        str: Non-empty sentences
+    """
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        sentence = text[start:match.start()]
+        if sentence.strip():
+            yield sentence
+        start = match.end()
+    if text[start:].strip():
+        yield text[start:]
+
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(model_name: Optional[str] = None) -> Any:
+    """Load the word-piece tokenizer of an embedding model.
+
+    Args:
+        model_name: Embedding model (defaults to settings.EMBEDDING_MODEL)
+
+    Returns:
+        Any: Hugging Face fast tokenizer
+    """
+    from transformers import AutoTokenizer
+
+    model_name = model_name or settings.EMBEDDING_MODEL
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+class TextChunker:
+    """Split text into overlapping chunks sized in embedding-model tokens.
+
+    Chunks are built from whole sentences until adding the next one would
+    exceed ``chunk_size`` tokens; the next chunk then starts with the
+    trailing sentences of the previous one that fit in ``chunk_overlap``
+    tokens. Sentences longer than ``chunk_size`` are hard-split. Sentences
+    flow through a single sliding window, so the text is scanned once.
+
+    Token counts come either from the embedding model's own tokenizer
+    (``"model"``) or from a fast regex approximation of word pieces
+    (``"approx"``).
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        tokenizer: Optional[str] = None
+    ):
+        """Initialize the chunker.
+
+        Args:
+            chunk_size: Maximum tokens per chunk (defaults to settings.CHUNK_SIZE)
+            chunk_overlap: Tokens shared by consecutive chunks (defaults to settings.CHUNK_OVERLAP)
+            tokenizer: "model" or "approx" (defaults to settings.CHUNK_TOKENIZER)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.CHUNK_OVERLAP
+        self.tokenizer_mode = tokenizer or settings.CHUNK_TOKENIZER
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError(f"CHUNK_OVERLAP ({self.chunk_overlap}) must be smaller than CHUNK_SIZE ({self.chunk_size})")
+        if self.tokenizer_mode not in ("model", "approx"):
+            raise ValueError(f"Unknown chunk tokenizer {self.tokenizer_mode!r}, expected 'model' or 'approx'")
+        self.tokenizer = load_tokenizer() if self.tokenizer_mode == "model" else None
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of a piece of text.
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            int: Number of tokens (excluding special tokens)
+        """
+        if self.tokenizer is not None:
+            return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+        return len(_APPROX_TOKEN.findall(text))
+
+    def _token_spans(self, text: str) -> List[Tuple[int, int, int]]:
+        """Return (start, end, tokens) character spans covering the text."""
+        if self.tokenizer is not None:
+            offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+            return [(start, end, 1) for start, end in offsets]
+        return [(m.start(), m.end(), 1) for m in _APPROX_TOKEN.finditer(text)]
+
+    def _split_long(self, sentence: str) -> Iterator[Tuple[str, int]]:
+        """Hard-split a sentence longer than chunk_size into pieces that fit."""
+        piece_start = None
+        piece_end = 0
+        piece_tokens = 0
+        for start, end, tokens in self._token_spans(sentence):
+            if piece_start is not None and piece_tokens + tokens > self.chunk_size:
+                yield sentence[piece_start:piece_end], piece_tokens
+                piece_start, piece_tokens = None, 0
+            if piece_start is None:
+                piece_start = start
+            piece_end = end
+            piece_tokens += tokens
+        if piece_start is not None:
+            yield sentence[piece_start:piece_end], piece_tokens
+
+    def chunk_sentences(self, sentences: Iterable[str]) -> Iterator[str]:
+        """Group a stream of sentences into chunks.
+
+        Args:
+            sentences: Sentences in document order
+
+        Yields:
+            str: Chunks of at most chunk_size tokens
+        """
+        window: Deque[Tuple[str, int]] = deque()
+        window_tokens = 0
+        fresh = False  # whether the window holds sentences not yet emitted
+
+        for sentence in sentences:
+            n_tokens = self.count_tokens(sentence)
+            pieces = self._split_long(sentence) if n_tokens > self.chunk_size else ((sentence, n_tokens),)
+            for piece, n_tokens in pieces:
+                if window and window_tokens + n_tokens > self.chunk_size:
+                    if fresh:
+                        yield " ".join(text for text, _ in window)
+                        fresh = False
+                    # Keep the tail that fits in the overlap and leaves room for the piece
+                    while window and (
+                        window_tokens > self.chunk_overlap or window_tokens + n_tokens > self.chunk_size
+                    ):
+                        window_tokens -= window.popleft()[1]
+                window.append((piece, n_tokens))
+                window_tokens += n_tokens
+                fresh = True
+
+        if fresh:
+            yield " ".join(text for text, _ in window)
+
+    def chunk(self, text: str) -> List[str]:
+        """Split text into chunks.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List[str]: List of text chunks
+        """
+        return list(self.chunk_sentences(split_sentences(text)))
@@ -0,0 +1,265 @@
+"""
+Context packing for the generator prompt.
+
+Retrieved chunks overlap: neighbouring chunks of a document share
+CHUNK_OVERLAP tokens, and the same passage is often stored under several
+files. The packer removes near-duplicate chunks, stitches adjacent chunks
+of one source into a single passage without repeating their overlap, and
+fills a token budget in relevance order, so prompt prefill time stays
+bounded whatever TOP_K_RESULTS is.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import json
+import logging
+import re
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from config.config import settings
+from src.core.chunker import TextChunker, split_sentences
+
+
+_WORD = re.compile(r"\w+")
+
+
+def format_section(number: int, doc: Dict[str, Any]) -> str:
+    """Format one retrieved passage for the prompt.
+
+    Args:
+        number: 1-based position in the context
+        doc: Retrieved document
+
+    Returns:
+        str: Prompt section
+    """
+    source = doc["metadata"]["source"]
+    # Passages deduplicated at ingest list the other files they were copied to
+    copies = sorted({ref["source"] for ref in json.loads(doc["metadata"].get("references") or "[]")} - {source})
+    if copies:
+        source += f" (also in {', '.join(copies)})"
+    return f"Document {number} from {source}:\n{doc['text']}"
+
+
+def shingles(text: str, size: int) -> Set[int]:
+    """Hash the overlapping word n-grams of a text.
+
+    Args:
+        text: Text to shingle
+        size: Words per shingle
+
+    Returns:
+        Set[int]: Shingle hashes; texts shorter than size give one shingle
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {hash(tuple(words))}
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def _overlap_length(previous: str, following: str) -> int:
+    """Characters at the start of ``following`` that repeat the end of ``previous``."""
+    limit = min(len(previous), len(following))
+    # Overlaps are whole sentences, so only try ends of sentences as cut points
+    for end in sorted((m.end() for m in re.finditer(r"[.!?](?=\s|$)", following[:limit])), reverse=True):
+        if previous.endswith(following[:end]):
+            return end
+    return 0
+
+
+class ContextPacker:
+    """Turn retrieved chunks into a compact, budgeted prompt context.
+
+    Chunks are ranked by cross-encoder "rerank_score" or fused "score" when
+    every chunk has one, otherwise by "distance", otherwise kept in
+    retrieval order. A chunk whose word
+    shingles have a Jaccard similarity of at least ``dedupe_threshold``
+    with a better-ranked chunk is dropped. Consecutive chunks of the same
+    source are merged into one passage, ranked at its best chunk, with the
+    overlapping sentences written once. Passages are then added best first
+    until ``token_budget`` is reached; the first one that does not fit is
+    cut at a sentence boundary and the rest are left out.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        dedupe_threshold: Optional[float] = None,
+        shingle_size: Optional[int] = None,
+        merge_adjacent: Optional[bool] = None,
+        tokenizer: Optional[str] = None
+    ):
+        """Initialize the packer.
+
+        Args:
+            token_budget: Maximum context tokens, 0 for no limit
+                (defaults to settings.CONTEXT_TOKEN_BUDGET)
+            dedupe_threshold: Shingle Jaccard similarity at which a chunk
+                counts as a duplicate, above 1 disables deduplication
+                (defaults to settings.CONTEXT_DEDUPE_THRESHOLD)
+            shingle_size: Words per shingle (defaults to settings.CONTEXT_SHINGLE_SIZE)
+            merge_adjacent: Whether to merge consecutive chunks of a source
+                (defaults to settings.CONTEXT_MERGE_ADJACENT)
+            tokenizer: "model" or "approx" token counts (defaults to settings.CONTEXT_TOKENIZER)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.token_budget = token_budget if token_budget is not None else settings.CONTEXT_TOKEN_BUDGET
+        self.dedupe_threshold = (
+            dedupe_threshold if dedupe_threshold is not None else settings.CONTEXT_DEDUPE_THRESHOLD
+        )
+        self.shingle_size = shingle_size or settings.CONTEXT_SHINGLE_SIZE
+        self.merge_adjacent = merge_adjacent if merge_adjacent is not None else settings.CONTEXT_MERGE_ADJACENT
+        self.chunker = TextChunker(tokenizer=tokenizer or settings.CONTEXT_TOKENIZER)
+
+    @staticmethod
+    def _rank(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Order chunks by relevance, best first."""
+        for key in ("rerank_score", "score"):
+            if docs and all(doc.get(key) is not None for doc in docs):
+                return sorted(docs, key=lambda doc: -doc[key])
+        if docs and all(doc.get("distance") is not None for doc in docs):
+            return sorted(docs, key=lambda doc: doc["distance"])
+        return list(docs)
+
+    def _dedupe(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop chunks nearly identical to a better-ranked chunk."""
+        if self.dedupe_threshold > 1:
+            return docs
+        kept: List[Tuple[Dict[str, Any], Set[int]]] = []
+        for doc in docs:
+            doc_shingles = shingles(doc["text"], self.shingle_size)
+            if not any(
+                len(doc_shingles & other) / len(doc_shingles | other) >= self.dedupe_threshold
+                for _, other in kept
+            ):
+                kept.append((doc, doc_shingles))
+        return [doc for doc, _ in kept]
+
+    def _merge(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge runs of consecutive chunks of the same source, keeping rank order."""
+        groups: Dict[Tuple[Any, Any], List[int]] = {}
+        for rank, doc in enumerate(docs):
+            metadata = doc["metadata"]
+            if metadata.get("chunk_index") is not None:
+                groups.setdefault((metadata["source"], metadata.get("file_path")), []).append(rank)
+
+        merged_into: Dict[int, int] = {}
+        passages: Dict[int, Dict[str, Any]] = {}
+        def index_of(rank: int) -> int:
+            return docs[rank]["metadata"]["chunk_index"]
+
+        for ranks in groups.values():
+            ranks.sort(key=index_of)
+            run = [ranks[0]]
+            for rank in ranks[1:] + [None]:
+                if rank is not None and index_of(rank) == index_of(run[-1]) + 1:
+                    run.append(rank)
+                    continue
+                if len(run) > 1:
+                    text = docs[run[0]]["text"]
+                    for following in run[1:]:
+                        following_text = docs[following]["text"]
+                        text = f"{text} {following_text[_overlap_length(text, following_text):].lstrip()}".rstrip()
+                    best = min(run)
+                    passages[best] = {
+                        **docs[best],
+                        "text": text,
+                        "metadata": {**docs[run[0]]["metadata"]},
+                        "merged_ids": [docs[r].get("id") for r in run],
+                    }
+                    merged_into.update({r: best for r in run})
+                if rank is not None:
+                    run = [rank]
+
+        packed = []
+        for rank, doc in enumerate(docs):
+            if rank not in merged_into:
+                packed.append(doc)
+            elif merged_into[rank] == rank:
+                packed.append(passages[rank])
+        return packed
+
+    def _truncate(self, doc: Dict[str, Any], number: int, budget: int) -> Optional[Dict[str, Any]]:
+        """Cut a passage at a sentence boundary so its section fits the budget."""
+        header_tokens = self.chunker.count_tokens(format_section(number, {**doc, "text": ""}))
+        kept, used = [], header_tokens
+        for sentence in split_sentences(doc["text"]):
+            tokens = self.chunker.count_tokens(sentence)
+            if used + tokens > budget:
+                break
+            kept.append(sentence.strip())
+            used += tokens
+        if not kept:
+            return None
+        return {**doc, "text": " ".join(kept), "truncated": True}
+
+    def pack(self, docs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Select and compact the retrieved chunks for the prompt.
+
+        Args:
+            docs: Retrieved documents, as returned by VectorStore.search
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, Any]]: Passages to put in
+            the prompt, best first, and packing statistics ("input_tokens",
+            "context_tokens", "tokens_saved", "duplicates", "merged",
+            "truncated", "dropped")
+        """
+        try:
+            input_tokens = sum(
+                self.chunker.count_tokens(format_section(i + 1, doc)) for i, doc in enumerate(docs)
+            )
+            ranked = self._rank(docs)
+            unique = self._dedupe(ranked)
+            passages = self._merge(unique) if self.merge_adjacent else unique
+
+            packed: List[Dict[str, Any]] = []
+            used = 0
+            truncated = False
+            for passage in passages:
+                tokens = self.chunker.count_tokens(format_section(len(packed) + 1, passage))
+                if self.token_budget and used + tokens > self.token_budget:
+                    cut = self._truncate(passage, len(packed) + 1, self.token_budget - used)
+                    if cut is not None:
+                        packed.append(cut)
+                        used += self.chunker.count_tokens(format_section(len(packed), cut))
+                        truncated = True
+                    break
+                packed.append(passage)
+                used += tokens
+
+            stats = {
+                "input_tokens": input_tokens,
+                "context_tokens": used,
+                "tokens_saved": input_tokens - used,
+                "duplicates": len(ranked) - len(unique),
+                "merged": len(unique) - len(passages),
+                "truncated": truncated,
+                "dropped": len(passages) - len(packed),
+            }
+            return packed, stats
+        except Exception as e:
+            self.logger.error(f"Error packing context: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Pack the context of a test query
+    from vector_store import VectorStore
+
+    test_query = "What is RAG architecture?"
+    retrieved_docs = VectorStore().search(test_query, n_results=10)
+    passages, stats = ContextPacker().pack(retrieved_docs)
+
+    print(f"\nContext for: {test_query}")
+    for i, passage in enumerate(passages, 1):
+        print(f"\n{i}. From: {passage['metadata']['source']} ({passage.get('merged_ids') or passage.get('id')})")
+        print(f"Text: {passage['text'][:200]}...")
+    print(f"\nStats: {stats}")
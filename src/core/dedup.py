@@ -0,0 +1,402 @@
+"""
+Near-duplicate chunk detection for ingestion.
+
+Every chunk is reduced to a MinHash signature of its word shingles and
+indexed with locality-sensitive hashing (LSH): the signature is cut into
+bands and chunks sharing any band are candidate duplicates, whose
+estimated Jaccard similarity is then checked against the threshold. Each
+lookup touches a handful of index rows, so the cost per chunk stays flat
+however many chunks are stored, instead of growing with the collection.
+
+A chunk that duplicates a stored one is not embedded or stored: it is
+recorded as a reference of that canonical chunk. When a canonical chunk
+is deleted or changes, its first remaining reference takes its place.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import functools
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import zlib
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from config.config import settings
+from src.core.manifest import hash_text
+
+_WORD = re.compile(r"\w+")
+
+# Candidates verified per lookup; more only come from boilerplate shared by many chunks
+_MAX_CANDIDATES = 64
+
+
+@functools.lru_cache(maxsize=8)
+def _permutations(num_perm: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Coefficients of the multiply-add-shift hash functions ((a * x + b) mod 2**64) >> 32."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(text: str, num_perm: int = 128, shingle_size: int = 5) -> np.ndarray:
+    """MinHash signature of the word shingles of a text.
+
+    Two signatures agree in each position with probability equal to the
+    Jaccard similarity of the shingle sets. Shingles are hashed with CRC32,
+    so signatures are stable across processes and runs.
+
+    Args:
+        text: Text to sign
+        num_perm: Number of hash functions
+        shingle_size: Words per shingle
+
+    Returns:
+        np.ndarray: uint32 signature of length num_perm
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= shingle_size:
+        shingle_texts = {" ".join(words)}
+    else:
+        shingle_texts = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingle_texts), dtype=np.uint64, count=len(shingle_texts)
+    )
+    a, b = _permutations(num_perm)
+    # uint64 arithmetic wraps, which is the mod 2**64 of the hash functions
+    return ((np.outer(hashes, a) + b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+def lsh_bands(num_perm: int, threshold: float, recall: float = 0.99) -> Tuple[int, int]:
+    """Choose the LSH band layout for a similarity threshold.
+
+    Pairs of similarity s become candidates with probability
+    1 - (1 - s**rows)**bands. Candidates are verified afterwards, so a
+    missed pair costs more than a spurious one: the layout with the most
+    rows per band (the fewest spurious candidates) that still finds pairs
+    at the threshold with the given recall is chosen.
+
+    Args:
+        num_perm: Signature length
+        threshold: Jaccard similarity of duplicates
+        recall: Probability of finding a pair exactly at the threshold
+
+    Returns:
+        Tuple[int, int]: Number of bands and rows per band
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class ChunkDeduplicator:
+    """Persistent MinHash/LSH index of the stored chunks.
+
+    A small SQLite database records, for every ingested chunk id, its
+    canonical chunk (itself for stored chunks) and where it came from.
+    Canonical chunks also keep their signature and one row per LSH band.
+    Changes are committed by ``commit`` once the vector store was written,
+    so a failed ingestion leaves the index as it was.
+    """
+
+    def __init__(
+        self,
+        index_path: Optional[Path] = None,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        shingle_size: Optional[int] = None
+    ):
+        """Initialize the deduplicator.
+
+        Args:
+            index_path: SQLite index file (defaults to settings.DEDUP_INDEX_PATH)
+            threshold: Estimated Jaccard similarity above which chunks are
+                duplicates (defaults to settings.DEDUP_THRESHOLD)
+            num_perm: MinHash signature length (defaults to settings.DEDUP_NUM_PERM)
+            shingle_size: Words per shingle (defaults to settings.DEDUP_SHINGLE_SIZE)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.index_path = Path(index_path or settings.DEDUP_INDEX_PATH)
+        self.threshold = threshold or settings.DEDUP_THRESHOLD
+        self.num_perm = num_perm or settings.DEDUP_NUM_PERM
+        self.shingle_size = shingle_size or settings.DEDUP_SHINGLE_SIZE
+        self.bands, self.rows = lsh_bands(self.num_perm, self.threshold)
+
+        self.checked = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.text_bytes_avoided = 0
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self) -> None:
+        """Open the index, resetting it if it was built with other parameters."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, canonical TEXT NOT NULL, source TEXT NOT NULL, chunk_index INTEGER NOT NULL,"
+            "file_path TEXT, text_hash TEXT NOT NULL, signature BLOB);"
+            "CREATE INDEX IF NOT EXISTS chunks_canonical ON chunks (canonical);"
+            "CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);"
+            "CREATE INDEX IF NOT EXISTS chunks_text_hash ON chunks (text_hash);"
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, key INTEGER NOT NULL, id TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS bands_key ON bands (band, key);"
+            "CREATE INDEX IF NOT EXISTS bands_id ON bands (id);"
+        )
+        params = json.dumps({"num_perm": self.num_perm, "shingle_size": self.shingle_size,
+                             "bands": self.bands, "rows": self.rows})
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row is not None and row[0] != params:
+            self.logger.warning(
+                f"Deduplication parameters changed, resetting {self.index_path}; "
+                f"run a full ingestion to deduplicate existing chunks"
+            )
+            self.db.executescript("DELETE FROM chunks; DELETE FROM bands;")
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (params,))
+        self.db.commit()
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        """(band, key) pairs of a signature, each key a 64-bit hash of the band's rows."""
+        return [
+            (band, int.from_bytes(hashlib.blake2b(
+                signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8
+            ).digest(), "little", signed=True))
+            for band in range(self.bands)
+        ]
+
+    def assign(self, chunk_id: str, text: str, source: str, chunk_index: int, file_path: str = "") -> Optional[str]:
+        """Record a chunk, returning the canonical chunk it duplicates.
+
+        A chunk that duplicates no stored chunk becomes canonical itself.
+        The chunk id must not be in the index already; release it first.
+
+        Args:
+            chunk_id: Id of the chunk in the vector store
+            text: Chunk text
+            source: Source file name
+            chunk_index: Position of the chunk in its file
+            file_path: Path of the source file
+
+        Returns:
+            Optional[str]: Id of the canonical chunk, or None if the chunk
+            is new and must be stored
+        """
+        try:
+            text_hash = hash_text(text)
+            with self._lock:
+                self.checked += 1
+                row = self.db.execute(
+                    "SELECT id FROM chunks WHERE text_hash = ? AND canonical = id LIMIT 1", (text_hash,)
+                ).fetchone()
+                if row is not None:
+                    self.exact_duplicates += 1
+                    return self._add_reference(row[0], chunk_id, text, source, chunk_index, file_path, text_hash)
+
+                signature = minhash_signature(text, self.num_perm, self.shingle_size)
+                band_keys = self._band_keys(signature)
+                candidates = [candidate for (candidate,) in self.db.execute(
+                    "SELECT DISTINCT id FROM bands WHERE "
+                    + " OR ".join(["(band = ? AND key = ?)"] * len(band_keys))
+                    + f" LIMIT {_MAX_CANDIDATES}",
+                    [value for pair in band_keys for value in pair]
+                )]
+                best, best_similarity = None, self.threshold
+                if candidates:
+                    placeholders = ",".join("?" * len(candidates))
+                    for candidate, blob in self.db.execute(
+                        f"SELECT id, signature FROM chunks WHERE id IN ({placeholders})", candidates
+                    ):
+                        similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+                        if similarity >= best_similarity:
+                            best, best_similarity = candidate, similarity
+                if best is not None:
+                    self.near_duplicates += 1
+                    return self._add_reference(best, chunk_id, text, source, chunk_index, file_path, text_hash)
+
+                self.db.execute(
+                    "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (chunk_id, chunk_id, source, chunk_index, file_path, text_hash, signature.tobytes())
+                )
+                self.db.executemany("INSERT INTO bands VALUES (?, ?, ?)", [(*pair, chunk_id) for pair in band_keys])
+                return None
+        except Exception as e:
+            self.logger.error(f"Error deduplicating chunk {chunk_id}: {e}")
+            raise
+
+    def _add_reference(
+        self, canonical: str, chunk_id: str, text: str, source: str, chunk_index: int, file_path: str, text_hash: str
+    ) -> str:
+        self.db.execute(
+            "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            (chunk_id, canonical, source, chunk_index, file_path, text_hash)
+        )
+        self.text_bytes_avoided += len(text.encode("utf-8"))
+        self._dirty.add(canonical)
+        return canonical
+
+    def release(self, chunk_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Forget chunks that changed or were deleted.
+
+        A released canonical chunk with remaining references is replaced by
+        the first of them, which inherits its signature; the caller must
+        move the stored record accordingly.
+
+        Args:
+            chunk_ids: Ids of the chunks; unknown ids are ignored
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Promotions, mapping each released
+            canonical id to the "id", "source", "chunk_index" and
+            "file_path" of the chunk that replaces it
+        """
+        try:
+            released = list(dict.fromkeys(chunk_ids))
+            promotions: Dict[str, Dict[str, Any]] = {}
+            with self._lock:
+                rows: Dict[str, str] = {}
+                for start in range(0, len(released), 500):
+                    batch = released[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows.update(self.db.execute(
+                        f"SELECT id, canonical FROM chunks WHERE id IN ({placeholders})", batch
+                    ).fetchall())
+
+                references = [id_ for id_, canonical in rows.items() if id_ != canonical]
+                self.db.executemany("DELETE FROM chunks WHERE id = ?", [(id_,) for id_ in references])
+                self._dirty.update(rows[id_] for id_ in references)
+
+                for old in (id_ for id_, canonical in rows.items() if id_ == canonical):
+                    successor = self.db.execute(
+                        "SELECT id, source, chunk_index, file_path FROM chunks "
+                        "WHERE canonical = ? AND id != ? ORDER BY rowid LIMIT 1", (old, old)
+                    ).fetchone()
+                    if successor is None:
+                        self.db.execute("DELETE FROM bands WHERE id = ?", (old,))
+                    else:
+                        new = successor[0]
+                        self.db.execute("UPDATE chunks SET canonical = ? WHERE canonical = ?", (new, old))
+                        self.db.execute(
+                            "UPDATE chunks SET signature = (SELECT signature FROM chunks WHERE id = ?) WHERE id = ?",
+                            (old, new)
+                        )
+                        self.db.execute("UPDATE bands SET id = ? WHERE id = ?", (new, old))
+                        promotions[old] = dict(zip(("id", "source", "chunk_index", "file_path"), successor))
+                        self._dirty.add(new)
+                    self.db.execute("DELETE FROM chunks WHERE id = ?", (old,))
+                    self._dirty.discard(old)
+            return promotions
+        except Exception as e:
+            self.logger.error(f"Error releasing chunks from the deduplication index: {e}")
+            raise
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """Ids of the recorded chunks of a source file."""
+        with self._lock:
+            return [id_ for (id_,) in self.db.execute("SELECT id FROM chunks WHERE source = ?", (source,))]
+
+    def references(self, canonical_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Duplicates recorded for canonical chunks.
+
+        Args:
+            canonical_ids: Ids of canonical chunks
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: "source" and "chunk_index" of
+            each duplicate, per canonical id, in insertion order
+        """
+        with self._lock:
+            results: Dict[str, List[Dict[str, Any]]] = {}
+            for canonical in canonical_ids:
+                results[canonical] = [
+                    {"source": source, "chunk_index": chunk_index}
+                    for source, chunk_index in self.db.execute(
+                        "SELECT source, chunk_index FROM chunks WHERE canonical = ? AND id != ? ORDER BY rowid",
+                        (canonical, canonical)
+                    )
+                ]
+            return results
+
+    def pop_changed_references(self) -> Dict[str, List[Dict[str, Any]]]:
+        """References of the canonical chunks whose duplicates changed since the last call."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return self.references(sorted(dirty))
+
+    def reset(self) -> None:
+        """Forget every chunk, e.g. when the vector store is rebuilt from scratch.
+
+        Like other changes, the reset is only persisted by ``commit``.
+        """
+        with self._lock:
+            self.db.execute("DELETE FROM chunks")
+            self.db.execute("DELETE FROM bands")
+            self._dirty.clear()
+
+    def commit(self) -> None:
+        """Persist the changes since the last commit."""
+        with self._lock:
+            self.db.commit()
+
+    def rollback(self) -> None:
+        """Discard the changes since the last commit."""
+        with self._lock:
+            self.db.rollback()
+            self._dirty.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Chunks checked and duplicates found since the deduplicator was created."""
+        duplicates = self.exact_duplicates + self.near_duplicates
+        return {
+            "checked_chunks": self.checked,
+            "duplicate_chunks": duplicates,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "duplicate_rate": round(duplicates / self.checked, 4) if self.checked else 0.0,
+            "text_bytes_avoided": self.text_bytes_avoided,
+        }
+
+    def close(self) -> None:
+        """Close the index."""
+        with self._lock:
+            self.db.close()
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    import tempfile
+
+    passage = (
+        "Retrieval-Augmented Generation combines a retriever with a generator. The retriever finds "
+        "passages relevant to a question in a collection of notes, and the generator writes an answer "
+        "grounded in them. Because the answer cites retrieved text, it can be checked against the "
+        "sources, and the collection can be updated without retraining the model. Chunking, embedding "
+        "quality and the number of retrieved passages all affect how good the answers are."
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        deduplicator = ChunkDeduplicator(Path(tmp) / "dedup.sqlite")
+        print(f"Bands x rows: {deduplicator.bands} x {deduplicator.rows}")
+        print(deduplicator.assign("a.txt_0", passage, "a.txt", 0))
+        print(deduplicator.assign("b.txt_3", passage, "b.txt", 3))
+        print(deduplicator.assign("c.txt_1", passage + " Evaluation closes the loop.", "c.txt", 1))
+        print(deduplicator.release(["a.txt_0"]))
+        print(deduplicator.pop_changed_references())
+        print(deduplicator.stats())
+        deduplicator.close()
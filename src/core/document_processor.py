@@ -5,11 +5,16 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
+import fnmatch
 import logging
-from typing import List, Dict, Any
-import re
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional
 
 from config.config import settings
+from src.core.chunker import SENTENCE_BOUNDARY, TextChunker, split_sentences
+from src.core.loaders import get_loader, load_document
+from src.core.manifest import hash_file, hash_text
 
 
 class DocumentProcessor:
@@ -21,6 +26,46 @@ class DocumentProcessor:
         self.data_dir = settings.DATA_DIR
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
+        self.chunker = TextChunker(self.chunk_size, self.chunk_overlap)
+        self.include = settings.DOCUMENT_INCLUDE
+        self.exclude = settings.DOCUMENT_EXCLUDE
+
+    def doc_name(self, file_path: Path) -> str:
+        """Return a document's name: its path relative to the data directory.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            str: POSIX relative path, or the bare file name for files
+            outside the data directory
+        """
+        try:
+            return Path(file_path).relative_to(self.data_dir).as_posix()
+        except ValueError:
+            return Path(file_path).name
+
+    def iter_files(self) -> Iterator[Path]:
+        """Walk the data directory for files a loader can read.
+
+        Relative paths are matched against the DOCUMENT_INCLUDE and
+        DOCUMENT_EXCLUDE glob patterns.
+
+        Yields:
+            Path: Matching files, in sorted order within each directory
+        """
+        for root, dirs, files in os.walk(self.data_dir):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = Path(root) / name
+                rel = self.doc_name(file_path)
+                if get_loader(file_path) is None:
+                    continue
+                if not any(fnmatch.fnmatch(rel, pattern) for pattern in self.include):
+                    continue
+                if any(fnmatch.fnmatch(rel, pattern) for pattern in self.exclude):
+                    continue
+                yield file_path
 
     def _read_file(self, file_path: Path) -> str:
         """Read a file and return its contents.
@@ -38,38 +83,68 @@ class DocumentProcessor:
             self.logger.error(f"Error reading file {file_path}: {e}")
             raise
 
+    def iter_file_sentences(self, file_path: Path, block_size: Optional[int] = None) -> Iterator[str]:
+        """Lazily read a file's sentences in fixed-size blocks.
+
+        Each block is scanned for sentence boundaries; the last complete
+        sentence and the unfinished tail are carried into the next block, so
+        boundaries spanning block edges split exactly as in _chunk_text.
+        Peak memory is a few blocks regardless of file size.
+
+        Args:
+            file_path: Path to the file
+            block_size: Characters read at a time (defaults to settings.READ_BLOCK_SIZE)
+
+        Yields:
+            str: Sentences in file order
+        """
+        block_size = block_size or settings.READ_BLOCK_SIZE
+        carry = ""
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for block in iter(lambda: f.read(block_size), ""):
+                    buffer = carry + block
+                    start = 0
+                    last = None
+                    for match in SENTENCE_BOUNDARY.finditer(buffer):
+                        if last is not None and buffer[last[0]:last[1]].strip():
+                            yield buffer[last[0]:last[1]]
+                        last = (start, match.start())
+                        start = match.end()
+                    carry = buffer[last[0]:] if last is not None else buffer
+                    if last is None and len(carry) > 4 * block_size:
+                        # No boundary in sight; let the chunker hard-split the run
+                        yield carry
+                        carry = ""
+            yield from split_sentences(carry)
+        except Exception as e:
+            self.logger.error(f"Error reading file {file_path}: {e}")
+            raise
+
+    def iter_file_chunks(self, file_path: Path) -> Iterator[str]:
+        """Lazily chunk a file of any size.
+
+        Args:
+            file_path: Path to the file
+
+        Yields:
+            str: Text chunks, identical to those of process_file
+        """
+        return self.chunker.chunk_sentences(self.iter_file_sentences(file_path))
+
     def _chunk_text(self, text: str) -> List[str]:
         """Split text into chunks.
 
+        Chunks are sized in embedding-model tokens and overlap by
+        CHUNK_OVERLAP tokens; see TextChunker.
+
         Args:
             text: Text to split
 
         Returns:
             List[str]: List of text chunks
         """
-        # Split text into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for sentence in sentences:
-            sentence_length = len(sentence.split())
-            
-            if current_length + sentence_length > self.chunk_size:
-                if current_chunk:
-                    chunks.append(" ".join(current_chunk))
-                current_chunk = [sentence]
-                current_length = sentence_length
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        
-        return chunks
+        return self.chunker.chunk(text)
 
     def process_file(self, file_path: Path) -> Dict[str, Any]:
         """Process a single file.
@@ -81,35 +156,103 @@ class DocumentProcessor:
             Dict[str, Any]: Processed document
         """
         try:
-            text = self._read_file(file_path)
-            chunks = self._chunk_text(text)
-            
-            return {
-                "file_name": file_path.name,
+            chunks: List[str] = []
+            chunk_metadata: List[Dict[str, Any]] = []
+            for text, metadata in load_document(file_path):
+                section_chunks = self._chunk_text(text)
+                chunks.extend(section_chunks)
+                chunk_metadata.extend(metadata for _ in section_chunks)
+
+            doc = {
+                "file_name": self.doc_name(file_path),
                 "file_path": str(file_path),
                 "chunks": chunks
             }
+            if any(chunk_metadata):
+                doc["chunk_metadata"] = chunk_metadata
+            return doc
         except Exception as e:
             self.logger.error(f"Error processing file {file_path}: {e}")
             raise
 
-    def process_all_documents(self) -> List[Dict[str, Any]]:
+    def process_all_documents(self, workers: Optional[int] = None) -> List[Dict[str, Any]]:
         """Process all documents in the data directory.
 
+        Args:
+            workers: Extraction processes (defaults to settings.INGEST_WORKERS,
+                or the CPU count)
+
         Returns:
             List[Dict[str, Any]]: List of processed documents
         """
         try:
-            documents = []
-            for file_path in self.data_dir.glob("*.txt"):
-                doc = self.process_file(file_path)
-                documents.append(doc)
-                self.logger.info(f"Processed document {file_path.name}")
+            workers = workers or settings.INGEST_WORKERS or os.cpu_count() or 1
+            paths = list(self.iter_files())
+            if workers > 1 and len(paths) > 1:
+                with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+                    documents = list(pool.map(process_path, paths, chunksize=16))
+            else:
+                documents = [self.process_file(file_path) for file_path in paths]
+            for doc in documents:
+                self.logger.info(f"Processed document {doc['file_name']}")
             return documents
         except Exception as e:
             self.logger.error(f"Error processing documents: {e}")
             raise
 
+    def process_changed_file(
+        self,
+        file_path: Path,
+        entry: Optional[Dict[str, Any]] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """Process a file and diff its chunks against its manifest entry.
+
+        Args:
+            file_path: Path to the file
+            entry: Manifest entry from the previous ingestion, if any
+            force: Treat every chunk as changed
+
+        Returns:
+            Dict[str, Any]: Processed document with "stat" and "file_hash".
+            Unless the content is unchanged (``doc["unchanged"]``), it also
+            carries "chunk_hashes" and the indices of "changed_chunks" and
+            of "stale_chunks" left over from a longer previous version.
+        """
+        stat = file_path.stat()
+        file_hash = hash_file(file_path)
+        if not force and entry is not None and entry["file_hash"] == file_hash:
+            # Touched but not modified
+            return {"file_name": self.doc_name(file_path), "stat": stat, "file_hash": file_hash, "unchanged": True}
+
+        doc = self.process_file(file_path)
+        old_hashes = entry["chunk_hashes"] if entry else []
+        chunk_hashes = [hash_text(chunk) for chunk in doc["chunks"]]
+        doc["stat"] = stat
+        doc["file_hash"] = file_hash
+        doc["chunk_hashes"] = chunk_hashes
+        doc["changed_chunks"] = [
+            i for i, chunk_hash in enumerate(chunk_hashes)
+            if force or i >= len(old_hashes) or old_hashes[i] != chunk_hash
+        ]
+        doc["stale_chunks"] = list(range(len(chunk_hashes), len(old_hashes)))
+        return doc
+
+
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def process_path(file_path: Path) -> Dict[str, Any]:
+    """Process one file in a worker process.
+
+    The processor (and its tokenizer) is created once per process, not
+    once per file.
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor()
+    return _worker_processor.process_file(file_path)
+
 
 if __name__ == "__main__":
     # Set up logging
@@ -0,0 +1,230 @@
+"""
+Persistent on-disk cache of chunk embeddings.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from config.config import settings
+
+
+# Recorded lookups written to the index at once, unless a store writes them first
+TOUCH_BATCH_SIZE = 1024
+
+
+class EmbeddingCache:
+    """Size-bounded cache of embeddings keyed by chunk text hash.
+
+    Vectors live in a memory-mapped float32 matrix and a small SQLite index
+    maps each key to its row and last-used time. When the cache is full the
+    least recently used rows are reused. Last-used times of lookups are
+    kept in memory and written with the next store, so reads never commit.
+    Each embedding model, dimension
+    and backend gets its own namespace directory, so switching models, or
+    between the PyTorch, ONNX and int8 ONNX encoders, never serves vectors
+    of another encoder.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        model_name: Optional[str] = None,
+        dimension: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        backend: Optional[str] = None
+    ):
+        """Initialize the embedding cache.
+
+        Args:
+            cache_dir: Root cache directory (defaults to settings.EMBEDDING_CACHE_DIR)
+            model_name: Embedding model (defaults to settings.EMBEDDING_MODEL)
+            dimension: Embedding dimension (defaults to settings.EMBEDDING_DIMENSION)
+            max_entries: Maximum number of cached vectors
+                (defaults to settings.EMBEDDING_CACHE_MAX_ENTRIES)
+            backend: Encoder producing the vectors, "torch", "onnx" or
+                "onnx-int8" (defaults to settings.EMBEDDING_BACKEND, with
+                "-int8" when settings.ONNX_QUANTIZE applies)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.dimension = dimension or settings.EMBEDDING_DIMENSION
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        if backend is None:
+            backend = settings.EMBEDDING_BACKEND
+            if backend == "onnx" and settings.ONNX_QUANTIZE:
+                backend = "onnx-int8"
+        self.backend = backend
+        namespace = f"{re.sub(r'[^A-Za-z0-9._-]+', '_', self.model_name)}-{self.dimension}-{self.backend}"
+        self.cache_dir = Path(cache_dir or settings.EMBEDDING_CACHE_DIR) / namespace
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._touched: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self) -> None:
+        """Open the index and vector matrix, resetting them if their shape changed."""
+        vectors_path = self.cache_dir / "vectors.f32"
+        index_path = self.cache_dir / "index.sqlite"
+        expected_size = self.max_entries * self.dimension * 4
+        if vectors_path.exists() and vectors_path.stat().st_size != expected_size:
+            self.logger.info(f"Cache capacity changed, resetting {self.cache_dir}")
+            vectors_path.unlink()
+            index_path.unlink(missing_ok=True)
+
+        mode = "r+" if vectors_path.exists() else "w+"
+        self.vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(self.max_entries, self.dimension))
+        self.db = sqlite3.connect(str(index_path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self.db.commit()
+        (self._size,) = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for a list of keys.
+
+        Args:
+            keys: Chunk text hashes
+
+        Returns:
+            List[Optional[np.ndarray]]: Cached vector per key, or None on a miss
+        """
+        with self._lock:
+            found_vectors: Dict[str, np.ndarray] = {}
+            unique_keys = list(dict.fromkeys(keys))
+            # Rows are copied under the write lock, so no other process can reuse them meanwhile
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    for key, row in self.db.execute(
+                        f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                    ):
+                        found_vectors[key] = np.array(self.vectors[row])
+            finally:
+                self.db.rollback()
+
+            now = time.time_ns()
+            self._touched.update((key, now) for key in found_vectors)
+            if len(self._touched) >= TOUCH_BATCH_SIZE:
+                self._write_touched(commit=True)
+
+            results = [found_vectors.get(key) for key in keys]
+            found = sum(1 for vector in results if vector is not None)
+            self.hits += found
+            self.misses += len(keys) - found
+            return results
+
+    def _write_touched(self, commit: bool) -> None:
+        """Write the recorded last-used times; call with the lock held.
+
+        Args:
+            commit: Run in a transaction of its own instead of the caller's
+        """
+        touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        if commit:
+            self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in touched.items()]
+            )
+            if commit:
+                self.db.commit()
+        except BaseException:
+            if commit:
+                self.db.rollback()
+            raise
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Store embeddings, evicting the least recently used entries if full.
+
+        Rows are allocated inside an immediate write transaction from the
+        index itself, so processes sharing the cache directory never give
+        two keys the same row. Recorded lookups are written first, so they
+        count when choosing the rows to evict.
+
+        Args:
+            keys: Chunk text hashes
+            vectors: Matrix of embeddings aligned with keys
+        """
+        with self._lock:
+            new_items = {key: vector for key, vector in zip(keys, vectors)}
+            unique_keys = list(new_items)
+            # Lock the index against other processes before reading which rows are taken
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_touched(commit=False)
+                existing = set()
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    existing.update(key for (key,) in self.db.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", batch
+                    ))
+                pending = [key for key in unique_keys if key not in existing][-self.max_entries:]
+                if not pending:
+                    self.db.commit()
+                    return
+
+                # Rows are filled in order and reused on eviction, so the next free row is MAX(row) + 1
+                (next_row,) = self.db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()
+                free_rows = list(range(next_row, min(self.max_entries, next_row + len(pending))))
+                n_evict = len(pending) - len(free_rows)
+                if n_evict > 0:
+                    evicted = self.db.execute(
+                        "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (n_evict,)
+                    ).fetchall()
+                    self.db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                    free_rows.extend(row for _, row in evicted)
+
+                now = time.time_ns()
+                for key, row in zip(pending, free_rows):
+                    self.vectors[row] = new_items[key]
+                self.vectors.flush()
+                self.db.executemany(
+                    "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                    [(key, row, now) for key, row in zip(pending, free_rows)]
+                )
+                (self._size,) = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counts for this cache instance."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+        }
+
+    def close(self) -> None:
+        """Flush vectors and close the index."""
+        with self._lock:
+            self._write_touched(commit=True)
+            self.vectors.flush()
+            self.db.close()
@@ -0,0 +1,198 @@
+"""
+Binary on-disk format for document embeddings.
+
+Each document is stored as a ``.npy`` matrix (one row per chunk, float32 or
+float16) plus a ``.json`` sidecar with the chunk ids, chunk indices and chunk
+hashes of the rows. Loading memory-maps the matrix, so nothing is copied
+until rows are actually read.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import json
+import logging
+import os
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config.config import settings
+from src.core.manifest import chunk_id, hash_text
+
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = ("float32", "float16")
+_TEXT_LINE = re.compile(r"^Chunk (\d+): \[(.*)\]\s*$")
+
+
+def embedding_paths(base_path: Path) -> Tuple[Path, Path]:
+    """Return the matrix and sidecar paths for a base path.
+
+    Args:
+        base_path: Path without the ``.npy``/``.json`` suffix
+
+    Returns:
+        Tuple[Path, Path]: Matrix path and sidecar path
+    """
+    base_path = Path(base_path)
+    return base_path.with_name(base_path.name + ".npy"), base_path.with_name(base_path.name + ".json")
+
+
+def save_embedding_matrix(
+    base_path: Path,
+    embeddings: Any,
+    sidecar: Dict[str, Any],
+    dtype: Optional[str] = None
+) -> None:
+    """Write embeddings and their sidecar atomically.
+
+    Args:
+        base_path: Path without the ``.npy``/``.json`` suffix
+        embeddings: Matrix or list of embedding vectors
+        sidecar: Row metadata; must contain an "ids" list aligned with the rows
+        dtype: Storage dtype (defaults to settings.EMBEDDING_STORAGE_DTYPE)
+    """
+    dtype = dtype or settings.EMBEDDING_STORAGE_DTYPE
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype {dtype!r}, expected one of {SUPPORTED_DTYPES}")
+
+    matrix = np.asarray(embeddings, dtype=dtype)
+    if matrix.size == 0:
+        matrix = matrix.reshape(0, settings.EMBEDDING_DIMENSION)
+    if matrix.ndim != 2 or len(sidecar["ids"]) != matrix.shape[0]:
+        raise ValueError(f"Expected {len(sidecar['ids'])} embedding rows, got shape {matrix.shape}")
+
+    matrix_path, sidecar_path = embedding_paths(base_path)
+    matrix_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_matrix = matrix_path.with_name(matrix_path.name + ".tmp")
+    tmp_sidecar = sidecar_path.with_name(sidecar_path.name + ".tmp")
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, np.ascontiguousarray(matrix))
+    with open(tmp_sidecar, "w", encoding="utf-8") as f:
+        json.dump({**sidecar, "dtype": dtype, "dimension": int(matrix.shape[1])}, f)
+    os.replace(tmp_matrix, matrix_path)
+    os.replace(tmp_sidecar, sidecar_path)
+
+
+def load_embedding_matrix(base_path: Path, mmap: bool = True) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Load embeddings written by save_embedding_matrix.
+
+    Args:
+        base_path: Path without the ``.npy``/``.json`` suffix
+        mmap: Memory-map the matrix read-only instead of reading it
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, Any]]: Embedding matrix and sidecar
+    """
+    matrix_path, sidecar_path = embedding_paths(base_path)
+    with open(sidecar_path, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+    return matrix, sidecar
+
+
+def remove_embedding_matrix(base_path: Path) -> None:
+    """Delete the matrix and sidecar for a base path, if present."""
+    for path in embedding_paths(base_path):
+        path.unlink(missing_ok=True)
+
+
+def convert_text_dump(
+    dump_path: Path,
+    dtype: Optional[str] = None,
+    model: Optional[str] = None,
+    chunks: Optional[List[str]] = None
+) -> Path:
+    """Convert a legacy ``Chunk i: [...]`` text dump to the binary format.
+
+    The binary files are written next to the dump, which is left in place.
+    Saved embeddings are only reused for chunks whose hashes they record, so
+    without the document's chunks the converted dump is for inspection only.
+
+    Args:
+        dump_path: Path to a ``<file_name>.embeddings`` text dump
+        dtype: Storage dtype (defaults to settings.EMBEDDING_STORAGE_DTYPE)
+        model: Model that produced the dump (defaults to settings.EMBEDDING_MODEL)
+        chunks: Chunks the dump was embedded from, one per dumped row
+
+    Returns:
+        Path: Base path of the converted embeddings
+    """
+    dump_path = Path(dump_path)
+    file_name = dump_path.name[:-len(".embeddings")] if dump_path.name.endswith(".embeddings") else dump_path.stem
+    indices: List[int] = []
+    rows: List[np.ndarray] = []
+    with open(dump_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            match = _TEXT_LINE.match(line)
+            if match is None:
+                raise ValueError(f"{dump_path}:{line_number}: not a 'Chunk i: [...]' line")
+            indices.append(int(match.group(1)))
+            rows.append(np.array(match.group(2).split(","), dtype=np.float32))
+
+    sidecar: Dict[str, Any] = {
+        "file_name": file_name,
+        "model": model or settings.EMBEDDING_MODEL,
+        "ids": [chunk_id(file_name, i) for i in indices],
+        "chunk_indices": indices,
+    }
+    if chunks is not None and indices == list(range(len(chunks))):
+        sidecar["chunk_hashes"] = [hash_text(chunk) for chunk in chunks]
+    else:
+        logger.warning(f"No chunks match {dump_path}, its embeddings are for inspection only")
+
+    base_path = dump_path.with_name(file_name)
+    save_embedding_matrix(base_path, np.vstack(rows) if rows else [], sidecar, dtype=dtype)
+    logger.info(f"Converted {dump_path} ({len(rows)} chunks)")
+    return base_path
+
+
+def convert_text_dumps(
+    directory: Optional[Path] = None,
+    dtype: Optional[str] = None,
+    model: Optional[str] = None
+) -> List[Path]:
+    """Convert every legacy text dump in a directory.
+
+    Each dump's source document is re-chunked from DATA_DIR, if it still
+    exists, so the converted embeddings can be reused by ingestion. This
+    assumes the chunking settings are the ones the dump was made with.
+
+    Args:
+        directory: Directory to scan (defaults to settings.EMBEDDINGS_DIR)
+        dtype: Storage dtype (defaults to settings.EMBEDDING_STORAGE_DTYPE)
+        model: Model that produced the dumps (defaults to settings.EMBEDDING_MODEL)
+
+    Returns:
+        List[Path]: Base paths of the converted embeddings
+    """
+    from src.core.document_processor import DocumentProcessor
+
+    directory = Path(directory or settings.EMBEDDINGS_DIR)
+    processor = None
+    converted = []
+    for path in sorted(directory.glob("*.embeddings")):
+        source = Path(settings.DATA_DIR) / path.name[:-len(".embeddings")]
+        chunks = None
+        if source.is_file():
+            processor = processor or DocumentProcessor()
+            chunks = processor.process_file(source)["chunks"]
+        converted.append(convert_text_dump(path, dtype, model, chunks))
+    return converted
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Convert legacy text dumps in the embeddings directory
+    converted = convert_text_dumps(Path(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print(f"Converted {len(converted)} embedding dumps")
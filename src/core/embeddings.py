@@ -6,10 +6,21 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from config.config import settings
+from src.core.embedding_cache import EmbeddingCache
+from src.core.embedding_io import embedding_paths, load_embedding_matrix, save_embedding_matrix
+from src.core.manifest import chunk_id, hash_text
+from src.core.metrics import span, timed
+
+
+def _load_sentence_transformer(model_name: str) -> Any:
+    """Load a sentence-transformers model, importing PyTorch only when needed."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
 
 
 class EmbeddingGenerator:
@@ -18,13 +29,24 @@ class EmbeddingGenerator:
     def __init__(self):
         """Initialize the embedding generator."""
         self.logger = logging.getLogger(__name__)
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        if settings.EMBEDDING_BACKEND == "onnx":
+            from src.core.onnx_embeddings import OnnxEmbeddingModel
+            self.model = OnnxEmbeddingModel()
+        elif settings.EMBEDDING_BACKEND == "torch":
+            self.model = _load_sentence_transformer(settings.EMBEDDING_MODEL)
+        else:
+            raise ValueError(f"Unknown embedding backend {settings.EMBEDDING_BACKEND!r}, expected 'torch' or 'onnx'")
         self.embeddings_dir = settings.EMBEDDINGS_DIR
         self.embeddings_dir.mkdir(exist_ok=True)
+        self.cache = EmbeddingCache() if settings.EMBEDDING_CACHE_ENABLED else None
 
+    @timed("embed_chunks")
     def generate_embeddings(self, chunks: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of text chunks.
 
+        Chunks already in the embedding cache are not re-encoded; output order
+        always matches the input order.
+
         Args:
             chunks: List of text chunks
 
@@ -32,15 +54,69 @@ class EmbeddingGenerator:
             List[List[float]]: List of embedding vectors
         """
         try:
-            embeddings = self.model.encode(chunks, batch_size=settings.EMBEDDING_BATCH_SIZE)
+            if self.cache is None:
+                embeddings = self.model.encode(chunks, batch_size=settings.EMBEDDING_BATCH_SIZE)
+                return embeddings.tolist()
+
+            keys = [hash_text(chunk) for chunk in chunks]
+            cached = self.cache.get_many(keys)
+            embeddings = np.empty((len(chunks), settings.EMBEDDING_DIMENSION), dtype=np.float32)
+
+            # Only encode each distinct missing chunk once
+            missing: Dict[str, List[int]] = {}
+            for i, (key, vector) in enumerate(zip(keys, cached)):
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    embeddings[i] = vector
+
+            if missing:
+                texts = [chunks[positions[0]] for positions in missing.values()]
+                encoded = np.asarray(
+                    self.model.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE),
+                    dtype=np.float32
+                )
+                for vector, positions in zip(encoded, missing.values()):
+                    embeddings[positions] = vector
+                self.cache.put_many(list(missing), encoded)
+
+            self.logger.info(
+                f"Embedding cache: {len(chunks) - sum(len(p) for p in missing.values())} hits, "
+                f"{sum(len(p) for p in missing.values())} misses ({len(missing)} encoded)"
+            )
             return embeddings.tolist()
         except Exception as e:
             self.logger.error(f"Error generating embeddings: {e}")
             raise
 
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed search queries in a single batched forward pass.
+
+        Queries bypass the embedding cache; they are rarely repeated
+        verbatim and are cheap compared to a corpus.
+
+        Args:
+            queries: Query texts
+
+        Returns:
+            np.ndarray: Matrix of query embeddings, one row per query
+        """
+        try:
+            with span("embed_queries"):
+                return np.asarray(
+                    self.model.encode(queries, batch_size=settings.EMBEDDING_BATCH_SIZE),
+                    dtype=np.float32
+                )
+        except Exception as e:
+            self.logger.error(f"Error embedding queries: {e}")
+            raise
+
     def process_document(self, doc: Dict[str, Any]) -> Dict[str, Any]:
         """Process a document to generate embeddings for its chunks.
 
+        If the document carries "changed_chunks" indices, only those chunks
+        are embedded and "embeddings" is aligned with that list.
+
         Args:
             doc: Document metadata and chunks
 
@@ -48,7 +124,10 @@ class EmbeddingGenerator:
             Dict[str, Any]: Document with embeddings
         """
         try:
-            embeddings = self.generate_embeddings(doc["chunks"])
+            # Incremental ingestion only needs the chunks that changed
+            indices = doc.get("changed_chunks")
+            chunks = doc["chunks"] if indices is None else [doc["chunks"][i] for i in indices]
+            embeddings = self.generate_embeddings(chunks) if chunks else []
             doc["embeddings"] = embeddings
             self.logger.info(f"Generated embeddings for {doc['file_name']}")
             return doc
@@ -57,21 +136,96 @@ class EmbeddingGenerator:
             raise
 
     def save_embeddings(self, doc: Dict[str, Any]) -> None:
-        """Save document embeddings to a file.
+        """Save document embeddings in the binary embedding format.
+
+        Writes ``<file_name>.npy`` and a ``<file_name>.json`` sidecar of chunk
+        ids and hashes. Documents that only carry embeddings for their
+        "changed_chunks" are merged with the rows already on disk.
 
         Args:
             doc: Document with embeddings
         """
         try:
-            output_file = self.embeddings_dir / f"{doc['file_name']}.embeddings"
-            with open(output_file, "w") as f:
-                for i, embedding in enumerate(doc["embeddings"]):
-                    f.write(f"Chunk {i}: {embedding}\n")
+            base_path = self.embeddings_dir / doc["file_name"]
+            indices = doc.get("changed_chunks")
+            rows = dict(zip(range(len(doc["chunks"])) if indices is None else indices, doc["embeddings"]))
+
+            if len(rows) < len(doc["chunks"]) and embedding_paths(base_path)[0].exists():
+                matrix, sidecar = load_embedding_matrix(base_path)
+                for i, row in zip(sidecar["chunk_indices"], matrix):
+                    if i < len(doc["chunks"]) and i not in rows:
+                        rows[i] = row
+            if len(rows) < len(doc["chunks"]):
+                self.logger.warning(
+                    f"Not saving embeddings for {doc['file_name']}: "
+                    f"{len(doc['chunks']) - len(rows)} chunks have no embedding"
+                )
+                return
+
+            indices = list(range(len(doc["chunks"])))
+            save_embedding_matrix(
+                base_path,
+                [rows[i] for i in indices],
+                {
+                    "file_name": doc["file_name"],
+                    "model": settings.EMBEDDING_MODEL,
+                    "ids": [chunk_id(doc["file_name"], i) for i in indices],
+                    "chunk_indices": indices,
+                    "chunk_hashes": [hash_text(chunk) for chunk in doc["chunks"]],
+                }
+            )
             self.logger.info(f"Saved embeddings for {doc['file_name']}")
         except Exception as e:
             self.logger.error(f"Error saving embeddings for {doc['file_name']}: {e}")
             raise
 
+    def load_embeddings(self, doc: Dict[str, Any]) -> bool:
+        """Attach previously saved embeddings to a document.
+
+        Embeddings are only reused if they were produced by the current model
+        for exactly the document's current chunks.
+
+        Args:
+            doc: Document with chunks
+
+        Returns:
+            bool: True if embeddings were attached
+        """
+        base_path = self.embeddings_dir / doc["file_name"]
+        try:
+            matrix, sidecar = load_embedding_matrix(base_path)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable embeddings for {doc['file_name']}: {e}")
+            return False
+
+        chunk_hashes = [hash_text(chunk) for chunk in doc["chunks"]]
+        if sidecar.get("model") != settings.EMBEDDING_MODEL or sidecar.get("chunk_hashes") != chunk_hashes:
+            return False
+        doc.pop("changed_chunks", None)
+        doc["embeddings"] = matrix.astype(np.float32).tolist()
+        self.logger.info(f"Loaded saved embeddings for {doc['file_name']}")
+        return True
+
+
+_shared_generator: Optional[EmbeddingGenerator] = None
+_shared_generator_lock = threading.Lock()
+
+
+def get_embedding_generator() -> EmbeddingGenerator:
+    """Return the process-wide embedding generator, loading the model once.
+
+    Returns:
+        EmbeddingGenerator: Shared embedding generator
+    """
+    global _shared_generator
+    if _shared_generator is None:
+        with _shared_generator_lock:
+            if _shared_generator is None:
+                _shared_generator = EmbeddingGenerator()
+    return _shared_generator
+
 
 if __name__ == "__main__":
     # Set up logging
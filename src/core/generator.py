@@ -5,10 +5,33 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config.config import settings
+from src.core.cache import TTLCache
+from src.core.context_packer import ContextPacker, format_section
+from src.core.manifest import chunk_id, hash_text
+from src.core.metrics import record_ollama_stats, record_span, span
+
+
+# Counters Ollama reports in the final chunk of a generation
+OLLAMA_STATS_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 
 
 class Generator:
@@ -21,10 +44,76 @@ class Generator:
         self.model = settings.OLLAMA_MODEL
         self.timeout = settings.OLLAMA_TIMEOUT
         self.max_retries = settings.OLLAMA_MAX_RETRIES
+        self.session = self._create_session()
+        self.response_cache = TTLCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+        self.semantic_cache = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            from src.core.semantic_cache import SemanticAnswerCache
+            self.semantic_cache = SemanticAnswerCache()
+        self.context_packer = ContextPacker()
+        self.last_stats: Dict[str, Any] = {}
+        self.last_context_stats: Dict[str, Any] = {}
+
+    def _create_session(self) -> requests.Session:
+        """Create a keep-alive session that retries transient failures."""
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=settings.OLLAMA_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=None,
+            raise_on_status=False
+        )
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(max_retries=retry))
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        return session
+
+    def _options(self) -> Dict[str, Any]:
+        """Sampling options sent to Ollama."""
+        return {
+            "temperature": settings.TEMPERATURE,
+            "top_p": settings.TOP_P,
+            "num_predict": settings.MAX_TOKENS
+        }
+
+    def _cache_key(self, prompt: str, options: Dict[str, Any]) -> tuple:
+        """Key generated answers by model, prompt hash and sampling options."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return (self.model, prompt_hash, tuple(sorted(options.items())))
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return hit-rate statistics of the answer caches."""
+        stats = {"responses": self.response_cache.stats()}
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
+
+    @staticmethod
+    def _chunk_keys(retrieved_docs: List[Dict[str, Any]]) -> List[str]:
+        """Identify the retrieved chunks an answer is based on.
+
+        Chunk ids survive edits of their file, so the text hash is part of
+        the key: a re-ingested chunk never matches an answer built from its
+        old text.
+        """
+        return [
+            f"{doc.get('id') or chunk_id(doc['metadata']['source'], doc['metadata'].get('chunk_index'))}"
+            f"#{hash_text(doc['text'])[:16]}"
+            for doc in retrieved_docs
+        ]
+
+    def _embed_query(self, query: str) -> Any:
+        """Embed a query with the shared ingest embedding model."""
+        from src.core.embeddings import get_embedding_generator
+        return get_embedding_generator().embed_queries([query])[0]
 
     def _format_prompt(self, query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
         """Format the prompt for the LLM.
 
+        The retrieved documents are deduplicated, merged and cut to
+        CONTEXT_TOKEN_BUDGET by the context packer; its statistics are kept
+        in ``last_context_stats``.
+
         Args:
             query: User's query
             retrieved_docs: Retrieved documents from vector store
@@ -33,10 +122,14 @@ class Generator:
             str: Formatted prompt
         """
         # Format context from retrieved documents
-        context = "\n\n".join([
-            f"Document {i+1} from {doc['metadata']['source']}:\n{doc['text']}"
-            for i, doc in enumerate(retrieved_docs)
-        ])
+        with span("format_prompt"):
+            passages, self.last_context_stats = self.context_packer.pack(retrieved_docs)
+            context = "\n\n".join([format_section(i + 1, doc) for i, doc in enumerate(passages)])
+        if self.last_context_stats["tokens_saved"]:
+            self.logger.info(
+                f"Packed context to {self.last_context_stats['context_tokens']} tokens, "
+                f"{self.last_context_stats['tokens_saved']} saved"
+            )
 
         # Create the prompt
         prompt = f"""You are a helpful research assistant. Use the following pieces of context to answer the question at the end. 
@@ -51,6 +144,64 @@ Answer:"""
 
         return prompt
 
+    def _lookup_answer(
+        self,
+        query: str,
+        retrieved_docs: List[Dict[str, Any]],
+        prompt: str,
+        options: Dict[str, Any]
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Look the answer up in the response and semantic caches.
+
+        Returns:
+            Tuple[Optional[str], Dict[str, Any]]: Cached answer (or None) and
+            the keys needed to remember a freshly generated answer
+        """
+        # The prompt embeds the retrieved context, so a changed
+        # collection never hits a stale answer
+        lookup: Dict[str, Any] = {"cache_key": self._cache_key(prompt, options)}
+        cached = self.response_cache.get(lookup["cache_key"])
+        if cached is not None:
+            return cached, lookup
+
+        # Paraphrased questions over the same chunks reuse an answer
+        if self.semantic_cache is not None:
+            lookup["query_embedding"] = self._embed_query(query)
+            lookup["chunk_keys"] = self._chunk_keys(retrieved_docs)
+            cached = self.semantic_cache.lookup(lookup["query_embedding"], lookup["chunk_keys"])
+            if cached is not None:
+                self.logger.info(
+                    f"Semantic cache hit, {self.semantic_cache.saved_seconds:.1f}s of generation saved so far"
+                )
+        return cached, lookup
+
+    def _remember_answer(self, lookup: Dict[str, Any], answer: str, seconds: float) -> None:
+        """Store a freshly generated answer in the caches."""
+        self.response_cache.set(lookup["cache_key"], answer)
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(lookup["query_embedding"], lookup["chunk_keys"], answer, seconds)
+
+    def _request_body(self, prompt: str, options: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        """Build the JSON body of an Ollama generate request."""
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options
+        }
+
+    @staticmethod
+    def _final_stats(chunk: Dict[str, Any], start: float, first_token_at: Optional[float]) -> Dict[str, Any]:
+        """Collect Ollama's timing counters from the final stream chunk and record them."""
+        stats = {key: chunk[key] for key in OLLAMA_STATS_FIELDS if key in chunk}
+        stats["cached"] = False
+        stats["time_to_first_token"] = (first_token_at or time.perf_counter()) - start
+        stats["total_seconds"] = time.perf_counter() - start
+        record_span("ollama_first_token", stats["time_to_first_token"])
+        record_span("ollama_generate", stats["total_seconds"])
+        record_ollama_stats(stats)
+        return stats
+
     def generate_response(self, query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
         """Generate a response using Ollama.
 
@@ -63,32 +214,106 @@ Answer:"""
         """
         try:
             prompt = self._format_prompt(query, retrieved_docs)
-            
+            options = self._options()
+            cached, lookup = self._lookup_answer(query, retrieved_docs, prompt, options)
+            if cached is not None:
+                return cached
+            start = time.perf_counter()
+
             # Prepare the request to Ollama
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": settings.TEMPERATURE,
-                        "top_p": settings.TOP_P,
-                        "num_predict": settings.MAX_TOKENS
-                    }
-                },
-                timeout=self.timeout
-            )
+            with span("ollama_generate"):
+                response = self.session.post(
+                    f"{self.base_url}/api/generate",
+                    json=self._request_body(prompt, options, stream=False),
+                    timeout=self.timeout
+                )
             
             if response.status_code != 200:
                 raise Exception(f"Ollama API returned status code {response.status_code}: {response.text}")
             
-            return response.json()["response"].strip()
+            result = response.json()
+            record_ollama_stats(result)
+            answer = result["response"].strip()
+            self._remember_answer(lookup, answer, time.perf_counter() - start)
+            return answer
             
         except Exception as e:
             self.logger.error(f"Error generating response: {e}")
             raise
 
+    def generate_stream(
+        self,
+        query: str,
+        retrieved_docs: List[Dict[str, Any]],
+        stats: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Generate a response using Ollama, yielding tokens as they arrive.
+
+        Ollama's final counters (prompt_eval_count, eval_count, the
+        durations) plus the client-side time to first token are stored in
+        ``last_stats`` and in ``stats`` if given, once the stream is done. A
+        cached answer is yielded as a single token.
+
+        Args:
+            query: User's query
+            retrieved_docs: Retrieved documents from vector store
+            stats: Optional dict to fill with the final generation stats
+
+        Yields:
+            str: Response tokens
+        """
+        try:
+            prompt = self._format_prompt(query, retrieved_docs)
+            options = self._options()
+            cached, lookup = self._lookup_answer(query, retrieved_docs, prompt, options)
+            if cached is not None:
+                self._set_stats(stats, {"cached": True})
+                yield cached
+                return
+
+            start = time.perf_counter()
+            first_token_at = None
+            done = False
+            parts = []
+            with self.session.post(
+                f"{self.base_url}/api/generate",
+                json=self._request_body(prompt, options, stream=True),
+                timeout=self.timeout,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API returned status code {response.status_code}: {response.text}")
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise Exception(f"Ollama API returned an error: {chunk['error']}")
+                    token = chunk.get("response", "")
+                    if token:
+                        first_token_at = first_token_at or time.perf_counter()
+                        parts.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        done = True
+                        self._set_stats(stats, self._final_stats(chunk, start, first_token_at))
+                        break
+
+            if not done:
+                # A dropped connection ends the lines early; never cache a truncated answer
+                raise Exception("Ollama stream ended before the final chunk")
+            self._remember_answer(lookup, "".join(parts).strip(), time.perf_counter() - start)
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {e}")
+            raise
+
+    def _set_stats(self, stats: Optional[Dict[str, Any]], values: Dict[str, Any]) -> None:
+        """Publish the stats of a finished stream."""
+        self.last_stats = values
+        if stats is not None:
+            stats.update(values)
+
 
 if __name__ == "__main__":
     # Set up logging
@@ -110,8 +335,9 @@ if __name__ == "__main__":
     # Retrieve relevant documents
     retrieved_docs = vector_store.search(test_query)
     
-    # Generate response
-    response = generator.generate_response(test_query, retrieved_docs)
-    
+    # Stream the response
     print(f"\nQuery: {test_query}")
-    print(f"\nResponse: {response}") 
\ No newline at end of file
+    print("\nResponse: ", end="", flush=True)
+    for token in generator.generate_stream(test_query, retrieved_docs):
+        print(token, end="", flush=True)
+    print(f"\n\nStats: {generator.last_stats}") 
\ No newline at end of file
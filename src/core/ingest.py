@@ -0,0 +1,500 @@
+"""
+Ingest documents into the vector store.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from config.config import settings
+from src.core.dedup import ChunkDeduplicator
+from src.core.document_processor import DocumentProcessor
+from src.core.embedding_io import remove_embedding_matrix
+from src.core.embeddings import EmbeddingGenerator, get_embedding_generator
+from src.core.manifest import IngestManifest, chunk_id, hash_file, hash_text
+from src.core.vector_store import VectorStore
+
+
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def _process_path(file_path: Path, entry: Optional[Dict[str, Any]], force: bool) -> Dict[str, Any]:
+    """Read and chunk one file in a worker process."""
+    global _worker_processor
+    if _worker_processor is None:
+        # Loading the tokenizer once per worker, not once per file
+        _worker_processor = DocumentProcessor()
+    start = time.perf_counter()
+    doc = _worker_processor.process_changed_file(file_path, entry, force)
+    doc["chunk_seconds"] = time.perf_counter() - start
+    return doc
+
+
+class _StageStats:
+    """Item count and busy time of one pipeline stage."""
+
+    def __init__(self):
+        self.items = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "items": self.items,
+            "seconds": round(self.seconds, 3),
+            "per_second": round(self.items / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+
+class IngestPipeline:
+    """Streaming, parallel ingestion of the data directory.
+
+    Files are discovered and read/chunked in a process pool, chunks from
+    many documents are batched together to fill the embedding batch size,
+    and finished documents are upserted in large bulk writes. Stages are
+    connected by bounded queues so memory stays flat however large the
+    corpus is. Files of at least ``STREAMING_THRESHOLD_BYTES`` are never
+    loaded whole: they are read and chunked lazily in the embedding stage
+    and reach the store in partial documents. Unless ``incremental`` is
+    disabled, the ingestion manifest is used to skip unchanged files and
+    chunks. With DEDUP_ENABLED, chunks that duplicate a stored chunk are
+    dropped before the embedding stage and recorded as references of it.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        processor: Optional[DocumentProcessor] = None,
+        generator: Optional[EmbeddingGenerator] = None,
+        vector_store: Optional[VectorStore] = None,
+        manifest: Optional[IngestManifest] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        upsert_batch_size: Optional[int] = None,
+        deduplicator: Optional[ChunkDeduplicator] = None
+    ):
+        """Initialize the pipeline.
+
+        Args:
+            processor: Document processor (created if omitted)
+            generator: Embedding generator (created if omitted)
+            vector_store: Vector store (created if omitted)
+            manifest: Ingestion manifest (loaded from settings if omitted)
+            workers: Read/chunk processes (defaults to settings.INGEST_WORKERS)
+            queue_size: Capacity of the queues between stages
+                (defaults to settings.INGEST_QUEUE_SIZE)
+            upsert_batch_size: Chunks per bulk upsert
+                (defaults to settings.INGEST_UPSERT_BATCH_SIZE)
+            deduplicator: Near-duplicate index (created if omitted and
+                settings.DEDUP_ENABLED is on)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.processor = processor or DocumentProcessor()
+        self.generator = generator or get_embedding_generator()
+        self.vector_store = vector_store or VectorStore()
+        self.manifest = manifest or IngestManifest()
+        self.workers = workers or settings.INGEST_WORKERS or os.cpu_count() or 1
+        self.queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.upsert_batch_size = upsert_batch_size or settings.INGEST_UPSERT_BATCH_SIZE
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        if deduplicator is None and settings.DEDUP_ENABLED:
+            deduplicator = ChunkDeduplicator()
+        self.deduplicator = deduplicator
+
+    def run(self, incremental: bool = True, progress: bool = True) -> Dict[str, Any]:
+        """Ingest the data directory.
+
+        Args:
+            incremental: Skip files and chunks recorded in the manifest
+            progress: Log progress after every bulk upsert
+
+        Returns:
+            Dict[str, Any]: File and chunk counts plus per-stage throughput
+        """
+        self._incremental = incremental
+        self._progress = progress
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._seen: set = set()
+        self._counts_lock = threading.Lock()
+        stages = ["chunk", "embed", "upsert"]
+        if self.deduplicator is not None:
+            stages.insert(1, "dedup")
+        self._stages = {name: _StageStats() for name in stages}
+        self._counts = {
+            "discovered_files": 0, "changed_files": 0, "unchanged_files": 0, "removed_files": 0,
+            "embedded_chunks": 0, "duplicate_chunks": 0, "deleted_chunks": 0,
+        }
+        self._started = time.perf_counter()
+        if self.deduplicator is not None and not self.manifest.files:
+            # Nothing is recorded as stored, so neither are the chunks the index knows
+            self.deduplicator.reset()
+
+        chunked: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        embedded: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                threads = [
+                    threading.Thread(target=self._guard, args=(self._discover, pool, chunked), daemon=True),
+                    threading.Thread(target=self._guard, args=(self._embed, chunked, embedded), daemon=True),
+                ]
+                for thread in threads:
+                    thread.start()
+                self._guard(self._write, embedded)
+                for thread in threads:
+                    thread.join()
+            if self._error is not None:
+                raise self._error
+
+            self._remove_missing()
+            if self.deduplicator is not None:
+                self.vector_store.set_references(self.deduplicator.pop_changed_references())
+            self.vector_store.flush()
+            self.manifest.save()
+            if self.deduplicator is not None:
+                self.deduplicator.commit()
+            stats = self._report()
+            self.logger.info(f"Ingestion finished: {stats}")
+            return stats
+        except Exception as e:
+            self._stop.set()
+            if self.deduplicator is not None:
+                self.deduplicator.rollback()
+            self.logger.error(f"Error during ingestion: {e}")
+            raise
+
+    def _guard(self, stage, *args) -> None:
+        """Run a stage, recording its exception and stopping the others."""
+        try:
+            stage(*args)
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._stop.set()
+
+    def _count(self, name: str) -> None:
+        """Increment a counter shared between stage threads."""
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    def _put(self, q: "queue.Queue[Any]", item: Any) -> None:
+        """Put an item on a bounded queue, giving up if the pipeline stopped."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: "queue.Queue[Any]") -> Any:
+        """Take an item from a queue, returning _DONE if the pipeline stopped."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return self._DONE
+
+    def _discover(self, pool: ProcessPoolExecutor, out: "queue.Queue[Any]") -> None:
+        """Stage 1: find files and submit the changed ones for chunking."""
+        try:
+            for file_path in self.processor.iter_files():
+                file_name = self.processor.doc_name(file_path)
+                self._seen.add(file_name)
+                self._count("discovered_files")
+                if self._incremental and self.manifest.is_unchanged(file_name, file_path.stat()):
+                    self._count("unchanged_files")
+                    continue
+                entry = self.manifest.get(file_name)
+                if file_path.suffix == ".txt" and file_path.stat().st_size >= settings.STREAMING_THRESHOLD_BYTES:
+                    self._put(out, {"stream": file_path, "entry": entry})
+                    continue
+                # The queue bound also bounds the number of in-flight files
+                self._put(out, pool.submit(_process_path, file_path, entry, not self._incremental))
+        finally:
+            self._put(out, self._DONE)
+
+    def _embed(self, inp: "queue.Queue[Any]", out: "queue.Queue[Any]") -> None:
+        """Stage 2: embed changed chunks in batches that span documents."""
+        pending: List[Dict[str, Any]] = []
+        pending_chunks = 0
+        try:
+            while True:
+                item = self._get(inp)
+                if item is self._DONE:
+                    break
+                if isinstance(item, dict) and "stream" in item:
+                    if pending:
+                        self._embed_batch(pending, out)
+                        pending, pending_chunks = [], 0
+                    self._embed_streamed(item["stream"], item["entry"], out)
+                    continue
+                doc = item.result() if isinstance(item, Future) else item
+                self._stages["chunk"].items += 1
+                self._stages["chunk"].seconds += doc.pop("chunk_seconds", 0.0)
+                if doc.get("unchanged"):
+                    self._put(out, doc)
+                    continue
+
+                pending.append(doc)
+                pending_chunks += len(doc["changed_chunks"])
+                if pending_chunks >= self.batch_size:
+                    self._embed_batch(pending, out)
+                    pending, pending_chunks = [], 0
+            if pending and not self._stop.is_set():
+                self._embed_batch(pending, out)
+        finally:
+            self._put(out, self._DONE)
+
+    def _embed_batch(self, docs: List[Dict[str, Any]], out: "queue.Queue[Any]") -> None:
+        """Encode the changed chunks of several documents in one call."""
+        if self.deduplicator is not None:
+            for doc in docs:
+                self._deduplicate(doc)
+        texts = [doc["chunks"][i] for doc in docs for i in doc["changed_chunks"]]
+        start = time.perf_counter()
+        embeddings = self.generator.generate_embeddings(texts) if texts else []
+        self._stages["embed"].seconds += time.perf_counter() - start
+        self._stages["embed"].items += len(texts)
+
+        offset = 0
+        for doc in docs:
+            n_chunks = len(doc["changed_chunks"])
+            doc["embeddings"] = embeddings[offset:offset + n_chunks]
+            offset += n_chunks
+            self._put(out, doc)
+
+    def _deduplicate(self, doc: Dict[str, Any]) -> None:
+        """Move chunks that duplicate a stored chunk from "changed_chunks" to "duplicate_chunks".
+
+        The old versions of the changed and stale chunks are released first;
+        canonical chunks they leave behind are listed in "promoted_chunks"
+        for the writer to move.
+        """
+        start = time.perf_counter()
+        file_name = doc["file_name"]
+        doc["promoted_chunks"] = self.deduplicator.release(
+            chunk_id(file_name, i) for i in [*doc["changed_chunks"], *doc["stale_chunks"]]
+        )
+        duplicates: Dict[int, str] = {}
+        for i in doc["changed_chunks"]:
+            canonical = self.deduplicator.assign(
+                chunk_id(file_name, i), doc["chunks"][i], file_name, i, doc["file_path"]
+            )
+            if canonical is not None:
+                duplicates[i] = canonical
+        doc["changed_chunks"] = [i for i in doc["changed_chunks"] if i not in duplicates]
+        doc["duplicate_chunks"] = duplicates
+        self._stages["dedup"].seconds += time.perf_counter() - start
+        self._stages["dedup"].items += len(doc["changed_chunks"]) + len(duplicates)
+
+    def _embed_streamed(self, file_path: Path, entry: Optional[Dict[str, Any]], out: "queue.Queue[Any]") -> None:
+        """Chunk and embed a large file lazily, emitting it in partial documents.
+
+        Every full embedding batch is sent on as a ``partial`` document; the
+        final document carries the hashes and stat the manifest needs, so a
+        file is only recorded once all its chunks were written.
+        """
+        start = time.perf_counter()
+        embed_seconds = self._stages["embed"].seconds
+        stat = file_path.stat()
+        file_hash = hash_file(file_path)
+        base = {"file_name": self.processor.doc_name(file_path), "file_path": str(file_path)}
+        if self._incremental and entry is not None and entry["file_hash"] == file_hash:
+            self._put(out, {**base, "stat": stat, "file_hash": file_hash, "unchanged": True})
+            return
+
+        old_hashes = entry["chunk_hashes"] if entry else []
+        chunk_hashes: List[str] = []
+        changed: Dict[int, str] = {}
+        for i, chunk in enumerate(self.processor.iter_file_chunks(file_path)):
+            chunk_hash = hash_text(chunk)
+            chunk_hashes.append(chunk_hash)
+            if not self._incremental or i >= len(old_hashes) or old_hashes[i] != chunk_hash:
+                changed[i] = chunk
+            if len(changed) >= self.batch_size:
+                self._embed_batch([{**base, "chunks": changed, "changed_chunks": list(changed),
+                                    "stale_chunks": [], "partial": True}], out)
+                changed = {}
+            if self._stop.is_set():
+                return
+
+        self._stages["chunk"].items += 1
+        self._stages["chunk"].seconds += time.perf_counter() - start - (self._stages["embed"].seconds - embed_seconds)
+        self._embed_batch([{
+            **base,
+            "chunks": changed,
+            "changed_chunks": list(changed),
+            "stale_chunks": list(range(len(chunk_hashes), len(old_hashes))),
+            "stat": stat,
+            "file_hash": file_hash,
+            "chunk_hashes": chunk_hashes,
+            "streamed": True,
+        }], out)
+
+    def _write(self, inp: "queue.Queue[Any]") -> None:
+        """Stage 3: upsert finished documents in bulk and record them."""
+        batch: List[Dict[str, Any]] = []
+        batch_chunks = 0
+        while True:
+            doc = self._get(inp)
+            if doc is self._DONE:
+                break
+            if doc.get("unchanged"):
+                self.manifest.update(doc["file_name"], doc["stat"], doc["file_hash"])
+                self._count("unchanged_files")
+                continue
+
+            batch.append(doc)
+            batch_chunks += len(doc["changed_chunks"]) + len(doc["stale_chunks"])
+            if batch_chunks >= self.upsert_batch_size:
+                self._flush(batch)
+                batch, batch_chunks = [], 0
+        if batch and not self._stop.is_set():
+            self._flush(batch)
+
+    def _flush(self, docs: List[Dict[str, Any]]) -> None:
+        """Upsert a batch of documents and update the manifest."""
+        start = time.perf_counter()
+        self._resolve_promotions(docs)
+        # Canonical chunks must move before their old ids are reused or deleted
+        for doc in docs:
+            self.vector_store.promote_chunks(doc.get("promoted_chunks", {}))
+        upserted = self.vector_store.add_documents(docs)
+        self._stages["upsert"].seconds += time.perf_counter() - start
+        self._stages["upsert"].items += upserted
+
+        # Streamed files are never held whole, so have no matrix to save
+        saved = [doc for doc in docs if not doc.get("partial") and not doc.get("streamed")]
+        canonical_vectors = self._canonical_vectors(saved)
+        for doc in docs:
+            self._counts["duplicate_chunks"] += len(doc.get("duplicate_chunks", {}))
+            if doc.get("partial"):
+                self._counts["embedded_chunks"] += len(doc["changed_chunks"])
+                continue
+            if not doc.get("streamed"):
+                self.generator.save_embeddings(self._with_duplicate_rows(doc, canonical_vectors))
+            self.manifest.update(doc["file_name"], doc["stat"], doc["file_hash"], doc["chunk_hashes"])
+            self._counts["changed_files"] += 1
+            self._counts["embedded_chunks"] += len(doc["changed_chunks"])
+            self._counts["deleted_chunks"] += len(doc["stale_chunks"])
+
+        if self._progress:
+            elapsed = time.perf_counter() - self._started
+            self.logger.info(
+                f"Ingested {self._counts['changed_files']} changed files, "
+                f"{self._counts['embedded_chunks']} chunks in {elapsed:.1f}s "
+                f"({self._counts['embedded_chunks'] / elapsed:.1f} chunks/s)"
+            )
+
+    @staticmethod
+    def _resolve_promotions(docs: List[Dict[str, Any]]) -> None:
+        """Point duplicates at where their canonical chunk ends up after the batch's promotions.
+
+        A document's duplicates were assigned after the promotions of every
+        earlier document but before those of later ones, so only the latter
+        apply. A duplicate promoted onto its own id is canonical itself and
+        must be kept, not deleted.
+        """
+        later: Dict[str, str] = {}
+        for doc in reversed(docs):
+            duplicates = doc.get("duplicate_chunks", {})
+            for i, canonical in duplicates.items():
+                duplicates[i] = later.get(canonical, canonical)
+            for old, new in doc.get("promoted_chunks", {}).items():
+                later[old] = later.get(new["id"], new["id"])
+
+    def _canonical_vectors(self, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stored vectors of the canonical chunks the duplicates of documents point to."""
+        ids = list({canonical for doc in docs for canonical in doc.get("duplicate_chunks", {}).values()})
+        vectors: Dict[str, Any] = {}
+        backend = self.vector_store.backend
+        for start in range(0, len(ids), backend.max_batch_size):
+            records = backend.get(ids=ids[start:start + backend.max_batch_size], include_embeddings=True)
+            vectors.update(zip(records["ids"], records["embeddings"]))
+        return vectors
+
+    @staticmethod
+    def _with_duplicate_rows(doc: Dict[str, Any], canonical_vectors: Dict[str, Any]) -> Dict[str, Any]:
+        """Give duplicate chunks the vector of their canonical chunk, so the saved matrix is complete."""
+        duplicates = [(i, canonical) for i, canonical in doc.get("duplicate_chunks", {}).items()
+                      if canonical in canonical_vectors]
+        if not duplicates:
+            return doc
+        return {
+            **doc,
+            "changed_chunks": [*doc["changed_chunks"], *(i for i, _ in duplicates)],
+            "embeddings": [*doc["embeddings"], *(canonical_vectors[canonical] for _, canonical in duplicates)],
+        }
+
+    def _remove_missing(self) -> None:
+        """Delete documents whose files disappeared from the data directory."""
+        for file_name in [name for name in self.manifest.files if name not in self._seen]:
+            entry = self.manifest.get(file_name)
+            if self.deduplicator is not None:
+                self.vector_store.promote_chunks(
+                    self.deduplicator.release(self.deduplicator.chunk_ids(file_name))
+                )
+            self.vector_store.delete_document(file_name)
+            remove_embedding_matrix(self.generator.embeddings_dir / file_name)
+            self.manifest.remove(file_name)
+            self._counts["removed_files"] += 1
+            self._counts["deleted_chunks"] += len(entry["chunk_hashes"])
+
+    def _report(self) -> Dict[str, Any]:
+        """Assemble the final statistics."""
+        stats = {
+            **self._counts,
+            "workers": self.workers,
+            "elapsed_seconds": round(time.perf_counter() - self._started, 3),
+            "stages": {name: stage.as_dict() for name, stage in self._stages.items()},
+        }
+        if self.deduplicator is not None:
+            avoided = self._counts["duplicate_chunks"]
+            stats["dedup"] = {
+                **self.deduplicator.stats(),
+                "embeddings_avoided": avoided,
+                "vector_bytes_avoided": avoided * settings.EMBEDDING_DIMENSION * 4,
+            }
+        return stats
+
+
+def ingest(
+    workers: Optional[int] = None,
+    incremental: bool = True,
+    progress: bool = True,
+    vector_store: Optional[VectorStore] = None,
+    generator: Optional[EmbeddingGenerator] = None
+) -> Dict[str, Any]:
+    """Ingest the data directory with the streaming pipeline.
+
+    Args:
+        workers: Read/chunk processes (defaults to settings.INGEST_WORKERS)
+        incremental: Skip files and chunks that are already ingested
+        progress: Log progress after every bulk upsert
+        vector_store: Vector store to write to (created if omitted)
+        generator: Embedding generator to use (created if omitted)
+
+    Returns:
+        Dict[str, Any]: File and chunk counts plus per-stage throughput
+    """
+    pipeline = IngestPipeline(generator=generator, vector_store=vector_store, workers=workers)
+    return pipeline.run(incremental=incremental, progress=progress)
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Bring the vector store up to date with the data directory
+    print(ingest())
@@ -0,0 +1,284 @@
+"""
+BM25 inverted index over chunk texts for lexical and hybrid retrieval.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Collection, List, Dict, Optional, Tuple
+
+import numpy as np
+
+from config.config import settings
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List[str]: Tokens in order
+    """
+    return _TOKEN.findall(text.lower())
+
+
+class LexicalIndex:
+    """Incrementally updated BM25 index keyed by chunk id.
+
+    Every term maps to two compact arrays, the numbers of the chunks that
+    contain it (uint32) and its frequency in each (uint16). Adding a chunk
+    appends to the postings of its terms; removing one only marks its number
+    dead, and the postings are rewritten without dead chunks once they make
+    up half of the index. Scoring a query touches just the postings of its
+    terms.
+    """
+
+    def __init__(self, path: Optional[Path] = None, k1: Optional[float] = None, b: Optional[float] = None):
+        """Initialize the index, loading it from disk if it exists.
+
+        Args:
+            path: File the index is saved to (.npz); None keeps it in memory only
+            k1: BM25 term-frequency saturation (defaults to settings.BM25_K1)
+            b: BM25 length normalization (defaults to settings.BM25_B)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path) if path is not None else None
+        self.k1 = k1 if k1 is not None else settings.BM25_K1
+        self.b = b if b is not None else settings.BM25_B
+        self._lock = threading.RLock()
+        self._loaded_mtime: Optional[int] = None
+        self._saved_at = 0.0
+        self._reset()
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    def _reset(self) -> None:
+        self._ids: List[Optional[str]] = []
+        self._numbers: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._alive = array("b")
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._live_length = 0
+        self._norm: Optional[np.ndarray] = None
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._numbers
+
+    # Updates
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """Index chunks, replacing chunks with the same id.
+
+        Args:
+            ids: Chunk ids
+            texts: Chunk texts
+        """
+        with self._lock:
+            self._remove([chunk_id for chunk_id in ids if chunk_id in self._numbers])
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id in self._numbers:
+                    self._remove([chunk_id])  # repeated within the batch
+                number = len(self._ids)
+                tokens = tokenize(text)
+                for term, tf in Counter(tokens).items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(number)
+                    postings[1].append(min(tf, 65535))
+                self._ids.append(chunk_id)
+                self._numbers[chunk_id] = number
+                self._lengths.append(len(tokens))
+                self._alive.append(1)
+                self._live_length += len(tokens)
+            self._changed()
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove chunks from the index.
+
+        Args:
+            ids: Chunk ids; unknown ids are ignored
+        """
+        with self._lock:
+            self._remove(ids)
+            if len(self._ids) > 2 * max(len(self._numbers), 512):
+                self._compact()
+            self._changed()
+
+    def _remove(self, ids: List[str]) -> None:
+        for chunk_id in ids:
+            number = self._numbers.pop(chunk_id, None)
+            if number is not None:
+                self._alive[number] = 0
+                self._ids[number] = None
+                self._live_length -= self._lengths[number]
+
+    def _changed(self) -> None:
+        self._norm = None
+        self.dirty = True
+
+    def _compact(self) -> None:
+        """Renumber the live chunks and drop dead ones from the postings."""
+        alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+        renumber = np.cumsum(alive) - 1
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (docs, tfs) in self._postings.items():
+            docs_np = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[docs_np]
+            if keep.any():
+                postings[term] = (
+                    array("I", renumber[docs_np[keep]].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+                )
+        self._postings = postings
+        self._ids = [chunk_id for chunk_id in self._ids if chunk_id is not None]
+        self._numbers = {chunk_id: number for number, chunk_id in enumerate(self._ids)}
+        self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[alive].tobytes())
+        self._alive = array("b", [1]) * len(self._ids)
+
+    # Search
+
+    def search(
+        self,
+        query: str,
+        n_results: int,
+        ids: Optional[Collection[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Rank chunks by BM25 score.
+
+        Args:
+            query: Query text
+            n_results: Maximum number of chunks to return
+            ids: Only rank these chunks (term statistics still cover the
+                whole index)
+
+        Returns:
+            List[Tuple[str, float]]: (chunk id, score) pairs, best first;
+            chunks sharing no term with the query are omitted
+        """
+        with self._lock:
+            n_live = len(self._numbers)
+            if not n_live or n_results <= 0:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+            if self._norm is None:
+                lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+                average = self._live_length / n_live or 1.0
+                self._norm = self.k1 * (1 - self.b + self.b * lengths / average)
+
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                df = int(alive[docs].sum())
+                if not df:
+                    continue
+                idf = math.log(1 + (n_live - df + 0.5) / (df + 0.5))
+                tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+            scores[~alive] = 0
+            if ids is not None:
+                allowed = np.zeros(len(self._ids), dtype=bool)
+                allowed[[self._numbers[chunk_id] for chunk_id in ids if chunk_id in self._numbers]] = True
+                scores[~allowed] = 0
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > n_results:
+                candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._ids[number], float(scores[number])) for number in candidates]
+
+    # Persistence
+
+    def save(self, min_interval: float = 0.0) -> bool:
+        """Write the index to its file if it changed.
+
+        Args:
+            min_interval: Skip the write if the last one was less than this
+                many seconds ago
+
+        Returns:
+            bool: Whether the index was written
+        """
+        with self._lock:
+            if self.path is None or not self.dirty or time.monotonic() - self._saved_at < min_interval:
+                return False
+            if len(self._ids) != len(self._numbers):
+                self._compact()
+            terms = list(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(self._postings[term][0]) for term in terms])
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    ids=np.array(self._ids, dtype=str),
+                    lengths=np.frombuffer(self._lengths, dtype=np.uint32),
+                    terms=np.array(terms, dtype=str),
+                    offsets=offsets,
+                    docs=np.concatenate([np.frombuffer(self._postings[t][0], dtype=np.uint32) for t in terms])
+                    if terms else np.zeros(0, dtype=np.uint32),
+                    tfs=np.concatenate([np.frombuffer(self._postings[t][1], dtype=np.uint16) for t in terms])
+                    if terms else np.zeros(0, dtype=np.uint16),
+                )
+            os.replace(tmp, self.path)
+            self._loaded_mtime = self.path.stat().st_mtime_ns
+            self._saved_at = time.monotonic()
+            self.dirty = False
+            return True
+
+    def load(self) -> None:
+        """Replace the in-memory index with the saved one."""
+        with self._lock:
+            mtime = self.path.stat().st_mtime_ns
+            with np.load(self.path) as data:
+                ids, lengths, terms = data["ids"].tolist(), data["lengths"], data["terms"].tolist()
+                offsets, docs, tfs = data["offsets"], data["docs"], data["tfs"]
+            self._reset()
+            self._ids = ids
+            self._numbers = {chunk_id: number for number, chunk_id in enumerate(ids)}
+            self._lengths = array("I", lengths.astype(np.uint32).tobytes())
+            self._alive = array("b", [1]) * len(ids)
+            self._live_length = int(lengths.sum())
+            for i, term in enumerate(terms):
+                start, end = offsets[i], offsets[i + 1]
+                self._postings[term] = (array("I", docs[start:end].tobytes()), array("H", tfs[start:end].tobytes()))
+            self._loaded_mtime = mtime
+
+    def refresh(self) -> bool:
+        """Reload the index if another process saved a newer version.
+
+        Returns:
+            bool: Whether the index was reloaded
+        """
+        with self._lock:
+            if self.path is None or self.dirty:
+                return False
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._loaded_mtime:
+                return False
+            self.load()
+            return True
@@ -0,0 +1,196 @@
+"""
+Document loaders for the RAG system.
+
+A loader turns one file into a stream of ``(text, metadata)`` sections.
+Loaders are registered per file extension with ``register_loader``; the
+document processor picks one by suffix and chunks each section separately,
+attaching the section's metadata to its chunks. Metadata values must be
+str, int, float or bool so they can be stored alongside the vectors.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config.config import settings
+
+
+Section = Tuple[str, Dict[str, Any]]
+Loader = Callable[[Path], Iterator[Section]]
+
+LOADERS: Dict[str, Loader] = {}
+
+
+def register_loader(*extensions: str) -> Callable[[Loader], Loader]:
+    """Register a loader for one or more file extensions.
+
+    Args:
+        extensions: Suffixes including the dot, e.g. ".md"
+
+    Returns:
+        Callable[[Loader], Loader]: Decorator registering the function
+    """
+    def decorator(loader: Loader) -> Loader:
+        for extension in extensions:
+            LOADERS[extension.lower()] = loader
+        return loader
+    return decorator
+
+
+def get_loader(file_path: Path) -> Optional[Loader]:
+    """Return the loader registered for a file's extension, if any."""
+    return LOADERS.get(Path(file_path).suffix.lower())
+
+
+def load_document(file_path: Path) -> Iterator[Section]:
+    """Extract the sections of a file with its registered loader.
+
+    Args:
+        file_path: Path to the file
+
+    Yields:
+        Section: (text, metadata) pairs in document order
+    """
+    loader = get_loader(file_path)
+    if loader is None:
+        raise ValueError(f"No loader registered for {Path(file_path).suffix!r} files")
+    yield from loader(Path(file_path))
+
+
+def _read(file_path: Path) -> str:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@register_loader(".txt")
+def load_text(file_path: Path) -> Iterator[Section]:
+    """Plain text: the whole file is one section."""
+    yield _read(file_path), {}
+
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_MD_FRONT_MATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+_MD_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MD_EMPHASIS = re.compile(r"(\*{1,3}|_{1,3}|`+)(?=\S)(.+?)(?<=\S)\1")
+_MD_LINE_PREFIX = re.compile(r"^\s*(?:>\s*|[-*+]\s+|\d+[.)]\s+)", re.MULTILINE)
+
+
+def _markdown_to_text(markdown: str) -> str:
+    text = _MD_IMAGE.sub(r"\1", markdown)
+    text = _MD_LINK.sub(r"\1", text)
+    text = _MD_EMPHASIS.sub(r"\2", text)
+    return _MD_LINE_PREFIX.sub("", text)
+
+
+@register_loader(".md", ".markdown")
+def load_markdown(file_path: Path) -> Iterator[Section]:
+    """Markdown: one section per heading, with markup stripped.
+
+    Front matter is dropped and fenced code blocks are kept verbatim.
+    Each section's metadata holds its heading.
+    """
+    text = _MD_FRONT_MATTER.sub("", _read(file_path))
+    heading = ""
+    lines: List[str] = []
+    in_fence = False
+
+    def section() -> Iterator[Section]:
+        body = _markdown_to_text("\n".join(lines)).strip()
+        if body:
+            yield body, {"section": heading} if heading else {}
+
+    for line in text.splitlines():
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else _MD_HEADING.match(line)
+        if match:
+            yield from section()
+            heading, lines = match.group(2), []
+        else:
+            lines.append(line)
+    yield from section()
+
+
+class _HTMLText(HTMLParser):
+    """Collect the visible text and title of an HTML page."""
+
+    SKIP = {"script", "style", "noscript", "template", "svg"}
+    BLOCK = {
+        "p", "div", "br", "li", "ul", "ol", "section", "article", "header", "footer",
+        "h1", "h2", "h3", "h4", "h5", "h6", "tr", "table", "blockquote", "pre",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title = ""
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in_title:
+            self.title += data
+        else:
+            self.parts.append(data)
+
+
+@register_loader(".html", ".htm")
+def load_html(file_path: Path) -> Iterator[Section]:
+    """HTML: the visible text, without scripts and styles, as one section."""
+    parser = _HTMLText()
+    parser.feed(_read(file_path))
+    parser.close()
+    text = "\n".join(" ".join(line.split()) for line in "".join(parser.parts).splitlines())
+    text = re.sub(r"\n{2,}", "\n", text).strip()
+    title = " ".join(parser.title.split())
+    if text:
+        yield text, {"title": title} if title else {}
+
+
+@register_loader(".jsonl")
+def load_jsonl(file_path: Path) -> Iterator[Section]:
+    """JSON Lines: one section per record, read line by line.
+
+    The text is taken from the first of ``JSONL_TEXT_FIELDS`` a record has;
+    its other scalar fields become metadata along with the line number.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                continue
+            field = next((name for name in settings.JSONL_TEXT_FIELDS if isinstance(record.get(name), str)), None)
+            if field is None:
+                continue
+            metadata = {
+                key: value for key, value in record.items()
+                if key != field and isinstance(value, (str, int, float, bool))
+            }
+            metadata["record"] = line_number
+            yield record[field], metadata
@@ -0,0 +1,180 @@
+"""
+Manifest of ingested files and chunk hashes for incremental ingestion.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import hashlib
+import json
+import logging
+import os
+from typing import List, Dict, Any, Optional
+
+from config.config import settings
+
+
+MANIFEST_VERSION = 1
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a piece of text.
+
+    Args:
+        text: Text to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(file_name: str, chunk_index: int) -> str:
+    """Return the id of a chunk in the vector store.
+
+    Args:
+        file_name: Source file name of the chunk
+        chunk_index: Position of the chunk in its file
+
+    Returns:
+        str: Chunk id
+    """
+    return f"{file_name}_{chunk_index}"
+
+
+def hash_file(file_path: Path, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's contents.
+
+    Args:
+        file_path: Path to the file
+        block_size: Number of bytes to read at a time
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """Record of ingested files used to skip unchanged work.
+
+    Each file entry stores its mtime, size and content hash plus the hash of
+    every chunk produced from it, so a re-run can tell which files need to be
+    re-chunked and which chunks need to be re-embedded.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """Initialize the manifest.
+
+        Args:
+            path: Manifest location (defaults to settings.INGEST_MANIFEST_PATH)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path or settings.INGEST_MANIFEST_PATH)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def _fingerprint(self) -> Dict[str, Any]:
+        """Settings that invalidate every entry when they change.
+
+        Besides chunking and embedding, this covers where the chunks are
+        stored and whether duplicates were dropped: a new backend, index
+        or collection starts empty, and turning deduplication off must
+        store the duplicates it skipped.
+        """
+        if settings.VECTOR_BACKEND == "chroma":
+            location = f"{settings.CHROMA_PERSIST_DIR}/{settings.CHROMA_COLLECTION_NAME}"
+        else:
+            location = str(settings.VECTOR_INDEX_DIR)
+        return {
+            "version": MANIFEST_VERSION,
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+            "chunk_tokenizer": settings.CHUNK_TOKENIZER,
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "vector_backend": settings.VECTOR_BACKEND,
+            "vector_location": location,
+            "dedup_enabled": settings.DEDUP_ENABLED,
+        }
+
+    def load(self) -> None:
+        """Load the manifest from disk, discarding it if the settings changed."""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return
+
+        fingerprint = self._fingerprint()
+        if any(data.get(key) != value for key, value in fingerprint.items()):
+            self.logger.info("Chunking, embedding or storage settings changed, starting a fresh manifest")
+            return
+        self.files = data.get("files", {})
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**self._fingerprint(), "files": self.files}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.error(f"Error saving manifest {self.path}: {e}")
+            raise
+
+    def get(self, file_name: str) -> Optional[Dict[str, Any]]:
+        """Return the entry for a file, if it has been ingested."""
+        return self.files.get(file_name)
+
+    def is_unchanged(self, file_name: str, stat: os.stat_result) -> bool:
+        """Cheap check whether a file's mtime and size match its entry.
+
+        Args:
+            file_name: Key of the file in the manifest
+            stat: Current stat of the file
+
+        Returns:
+            bool: True if the file can be skipped without reading it
+        """
+        entry = self.files.get(file_name)
+        return (
+            entry is not None
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        )
+
+    def update(
+        self,
+        file_name: str,
+        stat: os.stat_result,
+        file_hash: str,
+        chunk_hashes: Optional[List[str]] = None
+    ) -> None:
+        """Record the current state of a file.
+
+        Args:
+            file_name: Key of the file in the manifest
+            stat: Current stat of the file
+            file_hash: Hash of the file's contents
+            chunk_hashes: Hashes of the file's chunks (kept as-is if omitted)
+        """
+        if chunk_hashes is None:
+            chunk_hashes = self.files.get(file_name, {}).get("chunk_hashes", [])
+        self.files[file_name] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "file_hash": file_hash,
+            "chunk_hashes": chunk_hashes,
+        }
+
+    def remove(self, file_name: str) -> None:
+        """Forget a file."""
+        self.files.pop(file_name, None)
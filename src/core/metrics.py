@@ -0,0 +1,273 @@
+"""
+Timing spans, latency histograms and per-request traces.
+
+``span(name)`` times a block of code. With METRICS_ENABLED the duration is
+added to the ``rag_span_seconds`` histogram, exported in the Prometheus
+text format by ``render_metrics`` (served at ``/metrics`` by the API).
+Inside ``trace()`` the span is also recorded in the trace of the current
+request. When neither applies, ``span`` returns a shared no-op context
+manager, so instrumented code pays one settings lookup.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+from config.config import settings
+
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow generations
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Histograms and counters keyed by metric name and label values."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """Register the type ("histogram" or "counter") and help text of a metric."""
+        self._help[name] = (kind, help_text)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add a value to a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Increase a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def clear(self) -> None:
+        """Drop every recorded value."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Count, total and mean of every histogram series, for JSON reports."""
+        with self._lock:
+            return {
+                name: {
+                    ",".join(f"{k}={v}" for k, v in key) or "all": {
+                        "count": h.count, "sum": round(h.sum, 6), "mean": round(h.sum / h.count, 6) if h.count else 0.0
+                    }
+                    for key, h in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        def labels_text(key: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                kind, help_text = self._help.get(name, ("histogram", name))
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{labels_text(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{labels_text(key)} {h.sum}")
+                    lines.append(f"{name}_count{labels_text(key)} {h.count}")
+            for name, series in sorted(self._counters.items()):
+                kind, help_text = self._help.get(name, ("counter", name))
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{labels_text(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("rag_span_seconds", "histogram", "Duration of instrumented pipeline stages")
+REGISTRY.describe("rag_ollama_seconds", "histogram", "Ollama-reported generation time by phase")
+REGISTRY.describe("rag_ollama_tokens_total", "counter", "Tokens processed by Ollama")
+
+# Spans of the request being traced, if any
+_trace: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar("rag_trace", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "labels", "spans", "start")
+
+    def __init__(self, name: str, labels: Dict[str, str], spans: Optional[List[Dict[str, Any]]]):
+        self.name = name
+        self.labels = labels
+        self.spans = spans
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _record(self.spans, self.name, time.perf_counter() - self.start, self.labels)
+
+
+def _record(spans: Optional[List[Dict[str, Any]]], name: str, seconds: float, labels: Dict[str, str]) -> None:
+    if settings.METRICS_ENABLED:
+        REGISTRY.observe("rag_span_seconds", seconds, span=name, **labels)
+    if spans is not None:
+        spans.append({"span": name, **labels, "ms": round(seconds * 1000, 3)})
+
+
+def span(name: str, **labels: str):
+    """Time a block of code.
+
+    Args:
+        name: Span name, the "span" label of rag_span_seconds
+        **labels: Extra labels, e.g. mode="hybrid"
+
+    Returns:
+        Context manager timing the block
+    """
+    spans = _trace.get()
+    if spans is None and not settings.METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _Span(name, labels, spans)
+
+
+def timed(name: str, **labels: str) -> Callable:
+    """Decorator timing every call of a function as a span.
+
+    Args:
+        name: Span name
+        **labels: Extra labels
+
+    Returns:
+        Callable: Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, seconds: float, **labels: str) -> None:
+    """Record a span whose duration was measured elsewhere.
+
+    Args:
+        name: Span name
+        seconds: Duration
+        **labels: Extra labels
+    """
+    spans = _trace.get()
+    if spans is not None or settings.METRICS_ENABLED:
+        _record(spans, name, seconds, labels)
+
+
+class trace:
+    """Collect the spans of one request.
+
+    Usage: ``with trace() as spans: ...``; ``spans`` is then a list of
+    {"span", labels..., "ms"} dicts in completion order. Spans in threads
+    started with asyncio.to_thread (which copies the context) are included.
+    Pass the list of an earlier trace to continue it.
+    """
+
+    def __init__(self, spans: Optional[List[Dict[str, Any]]] = None):
+        self.spans: List[Dict[str, Any]] = [] if spans is None else spans
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> List[Dict[str, Any]]:
+        self._token = _trace.set(self.spans)
+        return self.spans
+
+    def __exit__(self, *exc) -> None:
+        try:
+            _trace.reset(self._token)
+        except ValueError:
+            # Exited in another context, e.g. an async generator closed elsewhere
+            _trace.set(None)
+
+
+def current_trace() -> Optional[List[Dict[str, Any]]]:
+    """Spans of the request being traced, or None."""
+    return _trace.get()
+
+
+def record_ollama_stats(stats: Dict[str, Any]) -> None:
+    """Record the timing counters Ollama returns with a finished generation.
+
+    Args:
+        stats: Final Ollama response, with durations in nanoseconds
+    """
+    spans = _trace.get()
+    if spans is None and not settings.METRICS_ENABLED:
+        return
+    for field, phase in (("load_duration", "load"), ("prompt_eval_duration", "prefill"),
+                         ("eval_duration", "decode"), ("total_duration", "total")):
+        if stats.get(field) is not None:
+            seconds = stats[field] / 1e9
+            if settings.METRICS_ENABLED:
+                REGISTRY.observe("rag_ollama_seconds", seconds, phase=phase)
+            if spans is not None:
+                spans.append({"span": f"ollama_{phase}", "ms": round(seconds * 1000, 3)})
+    if settings.METRICS_ENABLED:
+        for field, kind in (("prompt_eval_count", "prompt"), ("eval_count", "completion")):
+            if stats.get(field) is not None:
+                REGISTRY.inc("rag_ollama_tokens_total", stats[field], kind=kind)
+
+
+def render_metrics() -> str:
+    """Render the process-wide metrics in the Prometheus text format."""
+    return REGISTRY.render()
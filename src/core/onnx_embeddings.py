@@ -0,0 +1,287 @@
+"""
+ONNX Runtime embedding backend.
+
+Runs the transformer of EMBEDDING_MODEL as an exported ONNX graph, with
+pooling and normalization done in NumPy, so embedding on CPU needs neither
+PyTorch nor sentence-transformers at run time. The graph is exported once
+(optionally int8-quantized) and checked against the PyTorch model before
+it is used.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import json
+import logging
+import os
+from typing import List, Dict, Any, Iterator, Optional, Union
+
+import numpy as np
+
+from config.config import settings
+
+
+# Sentences the exported graph is checked on
+VERIFY_SENTENCES = [
+    "Retrieval-augmented generation grounds answers in retrieved documents.",
+    "Vector databases index embeddings for approximate nearest neighbour search.",
+    "BM25 ranks documents by term frequency and inverse document frequency.",
+    "Attention lets every token weigh every other token of the sequence.",
+    "Short query",
+    "A considerably longer passage that keeps going, covering evaluation metrics such as recall at k, "
+    "mean reciprocal rank and normalized discounted cumulative gain, so that padding is exercised too.",
+]
+
+
+def onnx_model_dir(model_name: Optional[str] = None) -> Path:
+    """Directory of the exported graph of an embedding model.
+
+    Args:
+        model_name: Embedding model (defaults to settings.EMBEDDING_MODEL)
+
+    Returns:
+        Path: Export directory under settings.ONNX_MODEL_DIR
+    """
+    model_name = model_name or settings.EMBEDDING_MODEL
+    return settings.ONNX_MODEL_DIR / model_name.replace("/", "--")
+
+
+def _graph_name(quantize: bool) -> str:
+    return "model-int8.onnx" if quantize else "model.onnx"
+
+
+def export_onnx_model(
+    model_name: Optional[str] = None,
+    output_dir: Optional[Path] = None,
+    quantize: Optional[bool] = None,
+    min_cosine: Optional[float] = None
+) -> Path:
+    """Export the transformer of a sentence-transformers model to ONNX.
+
+    Writes ``model.onnx`` (and ``model-int8.onnx`` with dynamic int8
+    weights when quantizing), ``tokenizer.json`` and ``embedding.json``
+    describing pooling, normalization and the maximum sequence length. The
+    graph is then verified with verify_onnx_model.
+
+    Args:
+        model_name: Embedding model (defaults to settings.EMBEDDING_MODEL)
+        output_dir: Export directory (defaults to onnx_model_dir(model_name))
+        quantize: Also write the int8 graph (defaults to settings.ONNX_QUANTIZE)
+        min_cosine: Minimum agreement with PyTorch (defaults to settings.ONNX_MIN_COSINE)
+
+    Returns:
+        Path: The exported graph that will be used
+
+    Raises:
+        ValueError: If the graph's embeddings disagree with PyTorch's
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger = logging.getLogger(__name__)
+    model_name = model_name or settings.EMBEDDING_MODEL
+    output_dir = Path(output_dir or onnx_model_dir(model_name))
+    quantize = settings.ONNX_QUANTIZE if quantize is None else quantize
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, tokenizer = model[0].auto_model.eval(), model.tokenizer
+    pooling = model[1].get_config_dict() if len(model) > 1 else {}
+    config = {
+        "model": model_name,
+        "pooling": "cls" if pooling.get("pooling_mode_cls_token") else "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "max_seq_length": model.max_seq_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+    }
+
+    sample = tokenizer(["export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(output_dir / "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=17,
+            dynamo=False,
+        )
+    tokenizer.save_pretrained(str(output_dir))
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(output_dir / "model.onnx"), str(output_dir / "model-int8.onnx"), weight_type=QuantType.QInt8)
+
+    (output_dir / "embedding.json").write_text(json.dumps(config, indent=2))
+    reference = model.encode(VERIFY_SENTENCES, normalize_embeddings=False)
+    config["min_cosine"] = verify_onnx_model(output_dir, quantize, reference, min_cosine)
+    (output_dir / "embedding.json").write_text(json.dumps(config, indent=2))
+    logger.info(f"Exported {model_name} to {output_dir / _graph_name(quantize)} (min cosine {config['min_cosine']:.5f})")
+    return output_dir / _graph_name(quantize)
+
+
+def verify_onnx_model(
+    model_dir: Path,
+    quantize: bool,
+    reference: np.ndarray,
+    min_cosine: Optional[float] = None
+) -> float:
+    """Check that an exported graph reproduces the PyTorch embeddings.
+
+    Args:
+        model_dir: Export directory
+        quantize: Check the int8 graph instead of the float one
+        reference: PyTorch embeddings of VERIFY_SENTENCES
+        min_cosine: Minimum cosine similarity of every sentence's two
+            embeddings (defaults to settings.ONNX_MIN_COSINE)
+
+    Returns:
+        float: Lowest cosine similarity found
+
+    Raises:
+        ValueError: If any sentence falls below min_cosine
+    """
+    min_cosine = settings.ONNX_MIN_COSINE if min_cosine is None else min_cosine
+    onnx_vectors = OnnxEmbeddingModel(model_dir, quantize=quantize).encode(VERIFY_SENTENCES)
+    reference = np.asarray(reference, dtype=np.float32)
+    cosine = (onnx_vectors * reference).sum(axis=1) / (
+        np.linalg.norm(onnx_vectors, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+    lowest = float(cosine.min())
+    if lowest < min_cosine:
+        raise ValueError(
+            f"ONNX embeddings of {model_dir} deviate from PyTorch: cosine {lowest:.5f} < {min_cosine}"
+        )
+    return lowest
+
+
+class OnnxEmbeddingModel:
+    """Drop-in for SentenceTransformer.encode backed by ONNX Runtime.
+
+    Sentences are tokenized in one call, sorted by length and grouped into
+    batches of at most ``batch_size`` sentences and ``batch_tokens`` padded
+    tokens, so each batch is padded only to its own longest sentence.
+    Results are returned in input order.
+    """
+
+    def __init__(
+        self,
+        model_dir: Optional[Path] = None,
+        quantize: Optional[bool] = None,
+        threads: Optional[int] = None,
+        batch_tokens: Optional[int] = None
+    ):
+        """Load an exported graph, exporting it first if it does not exist.
+
+        Args:
+            model_dir: Export directory (defaults to onnx_model_dir())
+            quantize: Use the int8 graph (defaults to settings.ONNX_QUANTIZE)
+            threads: Intra-op threads (defaults to settings.ONNX_INTRA_OP_THREADS,
+                or the number of CPUs)
+            batch_tokens: Maximum padded tokens per batch (defaults to settings.ONNX_BATCH_TOKENS)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.logger = logging.getLogger(__name__)
+        self.model_dir = Path(model_dir or onnx_model_dir())
+        quantize = settings.ONNX_QUANTIZE if quantize is None else quantize
+        graph = self.model_dir / _graph_name(quantize)
+        if not graph.exists():
+            self.logger.info(f"No exported graph at {graph}, exporting {settings.EMBEDDING_MODEL}")
+            export_onnx_model(output_dir=self.model_dir, quantize=quantize)
+        self.config: Dict[str, Any] = json.loads((self.model_dir / "embedding.json").read_text())
+        self.batch_tokens = batch_tokens or settings.ONNX_BATCH_TOKENS
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or settings.ONNX_INTRA_OP_THREADS or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(graph), options, providers=["CPUExecutionProvider"])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(self.config["max_seq_length"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Return the embedding dimension."""
+        return self.config["dimension"]
+
+    def _batches(self, lengths: np.ndarray, batch_size: int) -> Iterator[np.ndarray]:
+        """Group sentence positions, shortest first, into padding-friendly batches."""
+        order = np.argsort(lengths, kind="stable")
+        start = 0
+        for end in range(1, len(order) + 1):
+            # Sorted ascending, so the batch is padded to its last sentence
+            full = end - start == batch_size or (
+                end < len(order) and (end - start + 1) * lengths[order[end]] > self.batch_tokens
+            )
+            if full or end == len(order):
+                yield order[start:end]
+                start = end
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: Optional[bool] = None,
+        **kwargs
+    ) -> np.ndarray:
+        """Embed sentences.
+
+        Args:
+            sentences: Sentence or list of sentences
+            batch_size: Maximum sentences per forward pass
+            normalize_embeddings: L2-normalize the output (defaults to the
+                exported model's own setting)
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per sentence
+        """
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        embeddings = np.empty((len(sentences), self.config["dimension"]), dtype=np.float32)
+        if not sentences:
+            return embeddings
+
+        encodings = self.tokenizer.encode_batch(sentences)
+        lengths = np.array([len(encoding.ids) for encoding in encodings])
+        for batch in self._batches(lengths, batch_size):
+            width = int(lengths[batch].max())
+            arrays = {name: np.zeros((len(batch), width), dtype=np.int64) for name in self.input_names}
+            for row, position in enumerate(batch):
+                encoding = encodings[position]
+                n = len(encoding.ids)
+                arrays["input_ids"][row, :n] = encoding.ids
+                if "attention_mask" in arrays:
+                    arrays["attention_mask"][row, :n] = encoding.attention_mask
+                if "token_type_ids" in arrays:
+                    arrays["token_type_ids"][row, :n] = encoding.type_ids
+            hidden = self.session.run(None, arrays)[0]
+            if self.config["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = (np.arange(width)[None, :] < lengths[batch][:, None]).astype(np.float32)[:, :, None]
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            embeddings[batch] = pooled
+
+        normalize = self.config["normalize"] if normalize_embeddings is None else normalize_embeddings
+        if normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Export (if needed) and embed a test sentence
+    model = OnnxEmbeddingModel()
+    vector = model.encode("What is RAG architecture?")[0]
+    print(f"Embedding dimension: {len(vector)}, norm: {np.linalg.norm(vector):.4f}")
@@ -0,0 +1,197 @@
+"""
+Vector quantizers for compressed similarity search.
+
+A quantizer turns normalized float vectors into compact codes and scores
+query vectors against codes directly. Codes are stored as one or more
+row-aligned arrays, described by ``arrays``, so a backend can keep them in
+memory-mapped files next to the full-precision matrix.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class ScalarQuantizer:
+    """int8 codes with one float32 scale per vector.
+
+    Each vector is scaled so its largest component maps to 127, giving four
+    times smaller storage than float32 with no training step.
+    """
+
+    kind = "int8"
+
+    def __init__(self, dimension: int):
+        """Initialize the quantizer.
+
+        Args:
+            dimension: Vector dimension
+        """
+        self.dimension = dimension
+
+    def arrays(self) -> List[Tuple[str, str, int]]:
+        """Return (name, dtype, width) of the code arrays."""
+        return [("codes", "int8", self.dimension), ("scales", "float32", 1)]
+
+    def encode(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        """Encode float32 vectors.
+
+        Args:
+            vectors: Matrix of vectors, one per row
+
+        Returns:
+            Dict[str, np.ndarray]: Code arrays by name
+        """
+        peak = np.abs(vectors).max(axis=1, keepdims=True)
+        scales = np.where(peak == 0, 1.0, peak / 127.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return {"codes": codes, "scales": scales}
+
+    def score(self, queries: np.ndarray, arrays: Dict[str, np.ndarray]) -> np.ndarray:
+        """Approximate inner products of queries with encoded vectors.
+
+        Args:
+            queries: Matrix of float32 queries
+            arrays: Code arrays of the rows to score
+
+        Returns:
+            np.ndarray: Scores of shape (queries, rows)
+        """
+        return (queries @ arrays["codes"].astype(np.float32).T) * arrays["scales"].T
+
+
+class ProductQuantizer:
+    """Product quantization with 256 centroids per subspace.
+
+    Vectors are split into ``subvectors`` equal slices, each replaced by the
+    index of its nearest centroid (one byte), e.g. 48 bytes instead of 1536
+    for 384 float32 dimensions. Queries are scored with per-subspace lookup
+    tables (asymmetric distance computation).
+    """
+
+    kind = "pq"
+
+    def __init__(self, codebooks: np.ndarray):
+        """Initialize the quantizer from trained codebooks.
+
+        Args:
+            codebooks: Centroids of shape (subvectors, centroids, dimension / subvectors)
+        """
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.subvectors, self.n_centroids, self.sub_dimension = self.codebooks.shape
+        self.dimension = self.subvectors * self.sub_dimension
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        subvectors: int,
+        iterations: int = 20,
+        seed: int = 0
+    ) -> "ProductQuantizer":
+        """Train codebooks with k-means in every subspace.
+
+        Args:
+            vectors: Training vectors, one per row
+            subvectors: Number of subspaces; must divide the dimension
+            iterations: k-means iterations
+            seed: Random seed of the centroid initialization
+
+        Returns:
+            ProductQuantizer: Trained quantizer
+        """
+        n_vectors, dimension = vectors.shape
+        if dimension % subvectors:
+            raise ValueError(f"PQ subvectors ({subvectors}) must divide the dimension ({dimension})")
+        sub_dimension = dimension // subvectors
+        n_centroids = min(256, n_vectors)
+        rng = np.random.default_rng(seed)
+        codebooks = np.empty((subvectors, n_centroids, sub_dimension), dtype=np.float32)
+        for j in range(subvectors):
+            data = np.ascontiguousarray(vectors[:, j * sub_dimension:(j + 1) * sub_dimension], dtype=np.float32)
+            centroids = data[rng.choice(n_vectors, n_centroids, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = _nearest(data, centroids)
+                counts = np.bincount(assignment, minlength=n_centroids)
+                sums = np.stack([
+                    np.bincount(assignment, weights=data[:, d], minlength=n_centroids)
+                    for d in range(sub_dimension)
+                ], axis=1)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[j] = centroids
+        logging.getLogger(__name__).info(
+            f"Trained product quantizer: {subvectors} x {n_centroids} centroids on {n_vectors} vectors"
+        )
+        return cls(codebooks)
+
+    def arrays(self) -> List[Tuple[str, str, int]]:
+        """Return (name, dtype, width) of the code arrays."""
+        return [("codes", "uint8", self.subvectors)]
+
+    def encode(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        """Encode float32 vectors.
+
+        Args:
+            vectors: Matrix of vectors, one per row
+
+        Returns:
+            Dict[str, np.ndarray]: Code arrays by name
+        """
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for j in range(self.subvectors):
+            sub = vectors[:, j * self.sub_dimension:(j + 1) * self.sub_dimension]
+            codes[:, j] = _nearest(np.asarray(sub, dtype=np.float32), self.codebooks[j])
+        return {"codes": codes}
+
+    def score(self, queries: np.ndarray, arrays: Dict[str, np.ndarray]) -> np.ndarray:
+        """Approximate inner products of queries with encoded vectors.
+
+        Args:
+            queries: Matrix of float32 queries
+            arrays: Code arrays of the rows to score
+
+        Returns:
+            np.ndarray: Scores of shape (queries, rows)
+        """
+        codes = np.asarray(arrays["codes"])
+        # Lookup tables: inner product of each query slice with each centroid
+        tables = np.einsum(
+            "qjd,jcd->qjc",
+            queries.reshape(len(queries), self.subvectors, self.sub_dimension),
+            self.codebooks
+        )
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for j in range(self.subvectors):
+            scores += tables[:, j, codes[:, j]]
+        return scores
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared Euclidean) of every row."""
+    distances = (centroids ** 2).sum(axis=1) - 2 * data @ centroids.T
+    return distances.argmin(axis=1)
+
+
+def load_quantizer(kind: str, dimension: int, codebook_path: Optional[Path] = None):
+    """Create the quantizer of a stored index.
+
+    Args:
+        kind: "int8" or "pq"
+        dimension: Vector dimension
+        codebook_path: Saved PQ codebooks (.npy)
+
+    Returns:
+        The quantizer, or None if a PQ index has no trained codebooks yet
+    """
+    if kind == "int8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        if codebook_path is None or not Path(codebook_path).exists():
+            return None
+        return ProductQuantizer(np.load(codebook_path))
+    raise ValueError(f"Unknown vector quantization {kind!r}, expected 'none', 'int8' or 'pq'")
@@ -0,0 +1,200 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from sentence_transformers import CrossEncoder
+from config.config import settings
+from src.core.cache import TTLCache
+from src.core.manifest import hash_text
+
+
+class Reranker:
+    """Re-score (query, chunk) pairs with a cross-encoder.
+
+    The bi-encoder ranks chunks by comparing independently computed
+    embeddings; a cross-encoder reads query and chunk together and ranks
+    far more precisely, at the cost of one forward pass per pair. Pairs are
+    scored in CPU batches and their scores cached, so repeated queries over
+    the same chunks cost nothing.
+
+    Reranking is bounded by ``latency_budget_ms``: the cost of the pending
+    pairs is predicted from the measured time per pair, and if it would
+    exceed the budget (or scoring overruns it) the affected queries keep the
+    bi-encoder order instead.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        latency_budget_ms: Optional[float] = None,
+        cache_size: Optional[int] = None
+    ):
+        """Initialize the reranker; the model is loaded on first use.
+
+        Args:
+            model_name: Cross-encoder model (defaults to settings.RERANK_MODEL)
+            batch_size: Pairs per forward pass (defaults to settings.RERANK_BATCH_SIZE)
+            latency_budget_ms: Maximum scoring time per call, 0 for no limit
+                (defaults to settings.RERANK_LATENCY_BUDGET_MS)
+            cache_size: Cached pair scores (defaults to settings.RERANK_CACHE_SIZE)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name or settings.RERANK_MODEL
+        self.batch_size = batch_size or settings.RERANK_BATCH_SIZE
+        budget_ms = latency_budget_ms if latency_budget_ms is not None else settings.RERANK_LATENCY_BUDGET_MS
+        self.latency_budget = budget_ms / 1000
+        self.pair_cache = TTLCache(
+            cache_size if cache_size is not None else settings.RERANK_CACHE_SIZE, settings.QUERY_CACHE_TTL
+        )
+        self._model: Optional[CrossEncoder] = None
+        self._model_lock = threading.Lock()
+        # Moving average of the scoring time per pair, learned from every batch
+        self.seconds_per_pair: Optional[float] = None
+        self.fallbacks = 0
+
+    @property
+    def model(self) -> CrossEncoder:
+        """The cross-encoder, loaded once."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def _pair_key(self, query: str, doc: Dict[str, Any]) -> Tuple[str, str, str]:
+        """Key a pair score by model, normalized query and chunk text."""
+        return (self.model_name, " ".join(query.split()).lower(), hash_text(doc["text"]))
+
+    def _over_budget(self, start: float, pending: int) -> bool:
+        """Whether scoring ``pending`` more pairs would exceed the budget."""
+        if not self.latency_budget:
+            return False
+        predicted = pending * (self.seconds_per_pair or 0.0)
+        return time.perf_counter() - start + predicted > self.latency_budget
+
+    def rerank(self, query: str, docs: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        """Rerank the candidates of one query.
+
+        Args:
+            query: Query text
+            docs: Candidates, best first by the bi-encoder
+            n_results: Number of results to keep
+
+        Returns:
+            List[Dict[str, Any]]: The best candidates; see rerank_batch
+        """
+        return self.rerank_batch([query], [docs], n_results)[0]
+
+    def rerank_batch(
+        self,
+        queries: List[str],
+        candidates: List[List[Dict[str, Any]]],
+        n_results: int
+    ) -> List[List[Dict[str, Any]]]:
+        """Rerank the candidates of several queries in shared batches.
+
+        Args:
+            queries: Query texts
+            candidates: Candidates of each query, best first by the bi-encoder
+            n_results: Number of results to keep per query
+
+        Returns:
+            List[List[Dict[str, Any]]]: The n_results best candidates per
+            query, each with its "rerank_score"; queries that could not be
+            scored within the latency budget keep their first n_results
+            candidates, without "rerank_score"
+        """
+        try:
+            model = self.model
+            start = time.perf_counter()
+            keys = [[self._pair_key(query, doc) for doc in docs] for query, docs in zip(queries, candidates)]
+            scores: Dict[Tuple[str, str, str], float] = {}
+            pending: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+            for query, docs, doc_keys in zip(queries, candidates, keys):
+                for doc, key in zip(docs, doc_keys):
+                    cached = self.pair_cache.get(key)
+                    if cached is not None:
+                        scores[key] = cached
+                    elif key not in scores:
+                        pending[key] = (query, doc["text"])
+
+            pending_keys = list(pending)
+            for offset in range(0, len(pending_keys), self.batch_size):
+                if self._over_budget(start, len(pending_keys) - offset):
+                    self.logger.warning(
+                        f"Reranking {len(pending_keys) - offset} more pairs would exceed the "
+                        f"{self.latency_budget * 1000:.0f} ms budget, keeping bi-encoder order"
+                    )
+                    break
+                batch = pending_keys[offset:offset + self.batch_size]
+                batch_start = time.perf_counter()
+                batch_scores = model.predict([pending[key] for key in batch], batch_size=self.batch_size)
+                per_pair = (time.perf_counter() - batch_start) / len(batch)
+                self.seconds_per_pair = (
+                    per_pair if self.seconds_per_pair is None else 0.8 * self.seconds_per_pair + 0.2 * per_pair
+                )
+                for key, score in zip(batch, batch_scores):
+                    scores[key] = float(score)
+                    self.pair_cache.set(key, float(score))
+
+            results = []
+            for docs, doc_keys in zip(candidates, keys):
+                if all(key in scores for key in doc_keys):
+                    scored = [{**doc, "rerank_score": scores[key]} for doc, key in zip(docs, doc_keys)]
+                    results.append(sorted(scored, key=lambda doc: -doc["rerank_score"])[:n_results])
+                else:
+                    self.fallbacks += 1
+                    results.append(docs[:n_results])
+            return results
+        except Exception as e:
+            self.logger.error(f"Error reranking candidates: {e}")
+            raise
+
+
+_shared_reranker: Optional[Reranker] = None
+_shared_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Return the process-wide reranker, loading the model once.
+
+    Returns:
+        Reranker: Shared reranker
+    """
+    global _shared_reranker
+    if _shared_reranker is None:
+        with _shared_reranker_lock:
+            if _shared_reranker is None:
+                _shared_reranker = Reranker()
+    return _shared_reranker
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Compare bi-encoder and cross-encoder order for a test query
+    from vector_store import VectorStore
+
+    test_query = "What is RAG architecture?"
+    candidates = VectorStore().search(test_query, n_results=settings.RERANK_CANDIDATES, rerank=False)
+    reranked = Reranker().rerank(test_query, candidates, settings.TOP_K_RESULTS)
+
+    print(f"\nReranked results for: {test_query}")
+    ranks = {candidate["id"]: rank for rank, candidate in enumerate(candidates, 1)}
+    for i, result in enumerate(reranked, 1):
+        print(f"\n{i}. From: {result['metadata']['source']} (bi-encoder rank {ranks[result['id']]})")
+        print(f"Text: {result['text'][:200]}...")
+        print(f"Score: {result.get('rerank_score')}")
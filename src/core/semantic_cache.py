@@ -0,0 +1,137 @@
+"""
+Semantic cache of generated answers keyed by query embedding similarity.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from config.config import settings
+
+
+class SemanticAnswerCache:
+    """Reuse answers for paraphrased questions.
+
+    Entries hold a normalized query embedding, the keys (id and text hash)
+    of the chunks that were retrieved for it and the generated answer. A
+    new query hits when its embedding is within the cosine threshold of a
+    cached one *and* the same chunks were retrieved with the same text, so
+    the answer was produced from the same context; editing and
+    re-ingesting a file changes its chunk keys. Embeddings live in a
+    contiguous matrix searched with a single matrix-vector product; the
+    least recently used entry is evicted when the cache is full, and
+    entries expire after a TTL like the response cache.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        threshold: Optional[float] = None,
+        dimension: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        """Initialize the semantic cache.
+
+        Args:
+            max_size: Maximum number of answers (defaults to settings.SEMANTIC_CACHE_SIZE)
+            threshold: Minimum cosine similarity for a hit
+                (defaults to settings.SEMANTIC_CACHE_THRESHOLD)
+            dimension: Embedding dimension (defaults to settings.EMBEDDING_DIMENSION)
+            ttl: Seconds an answer stays valid, 0 or less for no expiry
+                (defaults to settings.SEMANTIC_CACHE_TTL)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_size = max_size or settings.SEMANTIC_CACHE_SIZE
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.dimension = dimension or settings.EMBEDDING_DIMENSION
+        self.ttl = ttl if ttl is not None else settings.SEMANTIC_CACHE_TTL
+
+        self._embeddings = np.zeros((self.max_size, self.dimension), dtype=np.float32)
+        self._chunk_ids: List[Optional[frozenset]] = [None] * self.max_size
+        self._answers: List[Optional[str]] = [None] * self.max_size
+        self._seconds = np.zeros(self.max_size, dtype=np.float64)
+        self._expires_at = np.full(self.max_size, np.inf, dtype=np.float64)
+        self._last_used = np.zeros(self.max_size, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query_embedding: Any, chunk_keys: List[str]) -> Optional[str]:
+        """Return a cached answer for a similar query over the same chunks.
+
+        Args:
+            query_embedding: Embedding of the new query
+            chunk_keys: Keys (id and text hash) of the chunks retrieved for the new query
+
+        Returns:
+            Optional[str]: Cached answer, or None on a miss
+        """
+        query = self._normalize(query_embedding)
+        wanted = frozenset(chunk_keys)
+        with self._lock:
+            if self._size:
+                similarities = self._embeddings[:self._size] @ query
+                live = self._expires_at[:self._size] > time.monotonic()
+                candidates = np.flatnonzero((similarities >= self.threshold) & live)
+                for row in candidates[np.argsort(-similarities[candidates])]:
+                    if self._chunk_ids[row] == wanted:
+                        self._clock += 1
+                        self._last_used[row] = self._clock
+                        self.hits += 1
+                        self.saved_seconds += self._seconds[row]
+                        return self._answers[row]
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding: Any, chunk_keys: List[str], answer: str, generation_seconds: float) -> None:
+        """Cache an answer.
+
+        Args:
+            query_embedding: Embedding of the query
+            chunk_keys: Keys (id and text hash) of the chunks the answer was generated from
+            answer: Generated answer
+            generation_seconds: How long generating the answer took
+        """
+        with self._lock:
+            if self._size < self.max_size:
+                row = self._size
+                self._size += 1
+            else:
+                row = int(np.argmin(self._last_used))
+            self._clock += 1
+            self._embeddings[row] = self._normalize(query_embedding)
+            self._chunk_ids[row] = frozenset(chunk_keys)
+            self._expires_at[row] = time.monotonic() + self.ttl if self.ttl > 0 else np.inf
+            self._answers[row] = answer
+            self._seconds[row] = generation_seconds
+            self._last_used[row] = self._clock
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counts and the generation time saved by hits."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": self._size,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
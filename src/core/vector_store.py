@@ -1,95 +1,538 @@
 """
-Vector store for document embeddings using ChromaDB.
+Vector store for document embeddings.
 """
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
+import copy
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 from config.config import settings
+from src.core.backends import create_backend
+from src.core.backends.base import VectorBackend
+from src.core.cache import TTLCache
+from src.core.embeddings import EmbeddingGenerator, get_embedding_generator
+from src.core.lexical_index import LexicalIndex
+from src.core.manifest import chunk_id
+from src.core.metrics import span, timed
+
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
 
 
 class VectorStore:
-    """Vector store for document embeddings."""
+    """Vector store for document embeddings.
+
+    Besides the vectors, a BM25 lexical index of the chunk texts is kept
+    up to date on every write (unless LEXICAL_INDEX_ENABLED is off), so
+    searches can run in "vector", "lexical" or "hybrid" mode; hybrid fuses
+    the two rankings with weighted reciprocal rank fusion.
+    """
 
-    def __init__(self):
-        """Initialize the vector store."""
+    def __init__(
+        self,
+        embedding_generator: Optional[EmbeddingGenerator] = None,
+        backend: Optional[VectorBackend] = None,
+        reranker: Optional[Any] = None
+    ):
+        """Initialize the vector store.
+
+        Args:
+            embedding_generator: Generator used to embed queries (defaults to
+                the shared generator, loaded on first search)
+            backend: Storage backend (defaults to the one named by
+                settings.VECTOR_BACKEND)
+            reranker: Cross-encoder reranker (defaults to the shared one,
+                loaded on the first reranked search)
+        """
         self.logger = logging.getLogger(__name__)
-        self.client = chromadb.PersistentClient(
-            path=str(settings.CHROMA_PERSIST_DIR),
-            settings=ChromaSettings(
-                anonymized_telemetry=False
-            )
-        )
-        self.collection = self.client.get_or_create_collection(
-            name=settings.CHROMA_COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}
-        )
+        self._embedding_generator = embedding_generator
+        self._reranker = reranker
+        self.backend = backend or create_backend()
+
+        # Query caches; results are keyed by collection version so writes
+        # from this or any other process invalidate them
+        self.query_embedding_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL)
+        self.result_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL)
+        self._version_file = self.backend.path / f"{self.backend.name}.version"
+        self._writes = 0
+        self._lexical_index: Optional[LexicalIndex] = None
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normalize a query for cache lookups."""
+        return " ".join(query.split()).lower()
+
+    def collection_version(self) -> Tuple[int, int]:
+        """Return a token that changes whenever the collection is written.
+
+        Returns:
+            Tuple[int, int]: Writes made by this instance and the mtime of
+            the shared version file touched on every write
+        """
+        try:
+            return self._writes, self._version_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self._writes, 0
+
+    def _bump_version(self) -> None:
+        """Record a write to the collection."""
+        self._writes += 1
+        self._version_file.parent.mkdir(parents=True, exist_ok=True)
+        self._version_file.write_text(str(self._writes))
+
+    def count(self) -> int:
+        """Return the number of chunks in the store."""
+        return self.backend.count()
+
+    @property
+    def lexical_index(self) -> LexicalIndex:
+        """BM25 index of the stored chunks, rebuilt from the backend if missing or stale."""
+        if self._lexical_index is None:
+            index = LexicalIndex(self.backend.path / f"{self.backend.name}.lexical.npz")
+            if len(index) != self.backend.count():
+                self._rebuild_lexical_index(index)
+            self._lexical_index = index
+        return self._lexical_index
+
+    def _rebuild_lexical_index(self, index: LexicalIndex) -> None:
+        """Re-index every chunk of the backend."""
+        start = time.perf_counter()
+        index._reset()
+        page = self.backend.max_batch_size
+        offset = 0
+        while True:
+            records = self.backend.get(limit=page, offset=offset)
+            if not records["ids"]:
+                break
+            index.add(records["ids"], records["documents"])
+            offset += len(records["ids"])
+        index.dirty = True
+        index.save()
+        self.logger.info(f"Rebuilt lexical index of {len(index)} chunks in {time.perf_counter() - start:.2f}s")
+
+    def flush(self) -> None:
+        """Persist pending lexical index updates."""
+        if self._lexical_index is not None:
+            self._lexical_index.save()
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return hit-rate statistics of the query caches."""
+        return {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
 
     def add_document(self, doc: Dict[str, Any]) -> None:
         """Add a document and its embeddings to the vector store.
 
+        Chunks are upserted, so re-adding a document replaces its chunks
+        instead of failing on duplicate ids. Documents produced by
+        incremental ingestion only carry embeddings for "changed_chunks";
+        ids listed in "stale_chunks" are deleted, as are the ids of
+        "duplicate_chunks", which are represented by their canonical chunk
+        (unless that canonical chunk was promoted onto the duplicate's id).
+
         Args:
             doc: Document with chunks and embeddings
         """
         try:
-            # Prepare metadata for each chunk
-            metadatas = [
-                {
-                    "source": doc["file_name"],
-                    "chunk_index": i,
-                    "file_path": doc["file_path"]
-                }
-                for i in range(len(doc["chunks"]))
-            ]
-
-            # Add documents to collection
-            self.collection.add(
-                embeddings=doc["embeddings"],
-                documents=doc["chunks"],
-                metadatas=metadatas,
-                ids=[f"{doc['file_name']}_{i}" for i in range(len(doc["chunks"]))]
-            )
+            self.add_documents([doc])
             self.logger.info(f"Added document {doc['file_name']} to vector store")
         except Exception as e:
             self.logger.error(f"Error adding document {doc['file_name']} to vector store: {e}")
             raise
 
-    def search(self, query: str, n_results: Optional[int] = None) -> List[Dict[str, Any]]:
+    def add_documents(self, docs: List[Dict[str, Any]]) -> int:
+        """Add several documents to the vector store in bulk.
+
+        Chunks of all documents are combined into as few upsert calls as the
+        collection allows. See add_document for how incremental documents
+        are handled.
+
+        Args:
+            docs: Documents with chunks and embeddings
+
+        Returns:
+            int: Number of chunks upserted
+        """
+        try:
+            ids, embeddings, documents, metadatas, stale_ids = [], [], [], [], []
+            for doc in docs:
+                indices = doc.get("changed_chunks", range(len(doc["chunks"])))
+                chunk_metadata = doc.get("chunk_metadata")
+                for i, embedding in zip(indices, doc["embeddings"]):
+                    ids.append(chunk_id(doc["file_name"], i))
+                    embeddings.append(embedding)
+                    documents.append(doc["chunks"][i])
+                    metadatas.append({
+                        **(chunk_metadata[i] if chunk_metadata else {}),
+                        "source": doc["file_name"],
+                        "chunk_index": i,
+                        "file_path": doc["file_path"]
+                    })
+                stale_ids.extend(chunk_id(doc["file_name"], i) for i in doc.get("stale_chunks", []))
+                stale_ids.extend(
+                    chunk_id(doc["file_name"], i) for i, canonical in doc.get("duplicate_chunks", {}).items()
+                    if canonical != chunk_id(doc["file_name"], i)
+                )
+
+            batch_size = self.backend.max_batch_size
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                self.backend.upsert(
+                    embeddings=embeddings[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
+                )
+            for start in range(0, len(stale_ids), batch_size):
+                self.backend.delete(ids=stale_ids[start:start + batch_size])
+            if ids or stale_ids:
+                if settings.LEXICAL_INDEX_ENABLED:
+                    lexical_index = self.lexical_index
+                    lexical_index.remove(stale_ids)
+                    lexical_index.add(ids, documents)
+                    lexical_index.save(min_interval=settings.LEXICAL_SAVE_INTERVAL)
+                self._bump_version()
+            return len(ids)
+        except Exception as e:
+            self.logger.error(f"Error adding documents to vector store: {e}")
+            raise
+
+    def delete_document(self, file_name: str) -> None:
+        """Delete every chunk of a document from the vector store.
+
+        Args:
+            file_name: Source file name of the document
+        """
+        try:
+            if settings.LEXICAL_INDEX_ENABLED:
+                ids = self.backend.get_ids({"source": file_name})
+                self.lexical_index.remove(ids)
+                self.lexical_index.save(min_interval=settings.LEXICAL_SAVE_INTERVAL)
+            self.backend.delete(where={"source": file_name})
+            self._bump_version()
+            self.logger.info(f"Deleted document {file_name} from vector store")
+        except Exception as e:
+            self.logger.error(f"Error deleting document {file_name} from vector store: {e}")
+            raise
+
+    def promote_chunks(self, promotions: Dict[str, Dict[str, Any]]) -> None:
+        """Move canonical chunks to the ids of the duplicates replacing them.
+
+        The stored text and vector are kept; the record takes the id,
+        source, chunk index and file path of its successor.
+
+        Args:
+            promotions: New "id", "source", "chunk_index" and "file_path"
+                per stored chunk id, as returned by ChunkDeduplicator.release
+        """
+        try:
+            old_ids = list(promotions)
+            for start in range(0, len(old_ids), self.backend.max_batch_size):
+                records = self.backend.get(
+                    ids=old_ids[start:start + self.backend.max_batch_size], include_embeddings=True
+                )
+                if not records["ids"]:
+                    continue
+                new_ids = [promotions[old]["id"] for old in records["ids"]]
+                self.backend.upsert(
+                    ids=new_ids,
+                    embeddings=list(records["embeddings"]),
+                    documents=records["documents"],
+                    metadatas=[
+                        {**metadata, **{key: promotions[old][key] for key in ("source", "chunk_index", "file_path")}}
+                        for old, metadata in zip(records["ids"], records["metadatas"])
+                    ]
+                )
+                self.backend.delete(ids=records["ids"])
+                if settings.LEXICAL_INDEX_ENABLED:
+                    self.lexical_index.remove(records["ids"])
+                    self.lexical_index.add(new_ids, records["documents"])
+            if promotions:
+                if settings.LEXICAL_INDEX_ENABLED:
+                    self.lexical_index.save(min_interval=settings.LEXICAL_SAVE_INTERVAL)
+                self._bump_version()
+        except Exception as e:
+            self.logger.error(f"Error promoting duplicate chunks: {e}")
+            raise
+
+    def set_references(self, references: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Record the duplicates of stored chunks in their metadata.
+
+        "references" holds the duplicates as a JSON list of {"source",
+        "chunk_index"} objects and "duplicates" their number. Ids that are
+        not stored are skipped.
+
+        Args:
+            references: Duplicates per stored chunk id, as returned by
+                ChunkDeduplicator.references
+        """
+        try:
+            ids = list(references)
+            for start in range(0, len(ids), self.backend.max_batch_size):
+                records = self.backend.get(
+                    ids=ids[start:start + self.backend.max_batch_size], include_embeddings=True
+                )
+                if not records["ids"]:
+                    continue
+                self.backend.upsert(
+                    ids=records["ids"],
+                    embeddings=list(records["embeddings"]),
+                    documents=records["documents"],
+                    metadatas=[
+                        {**metadata, "references": json.dumps(references[id_]), "duplicates": len(references[id_])}
+                        for id_, metadata in zip(records["ids"], records["metadatas"])
+                    ]
+                )
+            if references:
+                self._bump_version()
+        except Exception as e:
+            self.logger.error(f"Error recording duplicate references: {e}")
+            raise
+
+    @property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        """Generator used to embed queries, the same model as at ingest."""
+        if self._embedding_generator is None:
+            self._embedding_generator = get_embedding_generator()
+        return self._embedding_generator
+
+    @property
+    def reranker(self) -> Any:
+        """Cross-encoder reranker, imported only when a search reranks."""
+        if self._reranker is None:
+            from src.core.reranker import get_reranker
+            self._reranker = get_reranker()
+        return self._reranker
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries, reusing cached query embeddings."""
+        normalized = [self._normalize_query(query) for query in queries]
+        embeddings = [self.query_embedding_cache.get(key) for key in normalized]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.embedding_generator.embed_queries([queries[i] for i in missing])
+            for i, embedding in zip(missing, encoded.tolist()):
+                embeddings[i] = embedding
+                self.query_embedding_cache.set(normalized[i], embedding)
+        return embeddings
+
+    def search(
+        self,
+        query: str,
+        n_results: Optional[int] = None,
+        mode: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        threshold: Optional[float] = None,
+        max_drop: Optional[float] = None,
+        rerank: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
         """Search for similar documents.
 
         Args:
             query: Query text
             n_results: Number of results to return (defaults to settings.TOP_K_RESULTS)
+            mode: "vector", "lexical" or "hybrid" (defaults to settings.SEARCH_MODE)
+            where: Metadata filter, e.g. {"source": "notes.md"}
+            threshold: Minimum similarity (defaults to settings.SIMILARITY_THRESHOLD)
+            max_drop: Largest similarity drop from the best result (defaults
+                to settings.ADAPTIVE_TOP_K_DROP)
+            rerank: Rerank candidates with the cross-encoder (defaults to
+                settings.RERANK_ENABLED)
 
         Returns:
             List[Dict[str, Any]]: List of similar documents with their metadata
         """
+        return self.search_batch([query], n_results, mode, where, threshold, max_drop, rerank)[0]
+
+    @timed("search")
+    def search_batch(
+        self,
+        queries: List[str],
+        n_results: Optional[int] = None,
+        mode: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        threshold: Optional[float] = None,
+        max_drop: Optional[float] = None,
+        rerank: Optional[bool] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for similar documents for several queries at once.
+
+        All queries are embedded in one batched forward pass with the
+        ingest embedding model and sent to the backend in one query.
+        Results and query embeddings are cached; cached results are only
+        reused while the collection is unchanged.
+
+        n_results is an upper bound: embedding matches whose similarity
+        (1 - distance) is below the threshold are dropped by the backend,
+        and the list is cut where similarity falls more than max_drop below
+        the best match, so weak matches never pad the prompt. The ``where``
+        filter (Chroma syntax, on "source", "file_path", "chunk_index" or
+        any loader metadata) is applied by the backend during the search,
+        so n_results matching chunks are returned when they exist.
+
+        In hybrid mode both rankings are cut at HYBRID_CANDIDATE_FACTOR
+        times n_results and fused; each result then also carries its fused
+        "score", and chunks found only lexically have no "distance". BM25
+        scores are not similarities, so the cutoffs only apply to the
+        embedding ranking.
+
+        With rerank, RERANK_CANDIDATES chunks are retrieved per query and
+        the cross-encoder keeps the n_results best, adding "rerank_score";
+        the adaptive cut is skipped so it does not shrink the candidates.
+        Results that fell back to retrieval order because reranking ran out
+        of its latency budget are not cached.
+
+        Args:
+            queries: Query texts
+            n_results: Number of results per query (defaults to settings.TOP_K_RESULTS)
+            mode: "vector", "lexical" or "hybrid" (defaults to settings.SEARCH_MODE)
+            where: Metadata filter, e.g. {"source": "notes.md"}
+            threshold: Minimum similarity (defaults to settings.SIMILARITY_THRESHOLD)
+            max_drop: Largest similarity drop from the best result (defaults
+                to settings.ADAPTIVE_TOP_K_DROP); 0 disables the cut
+            rerank: Rerank candidates with the cross-encoder (defaults to
+                settings.RERANK_ENABLED)
+
+        Returns:
+            List[List[Dict[str, Any]]]: Similar documents for each query
+        """
         try:
+            if not queries:
+                return []
             n_results = n_results or settings.TOP_K_RESULTS
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
-            
-            # Format results
-            formatted_results = []
-            for i in range(len(results["documents"][0])):
-                formatted_results.append({
-                    "text": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if "distances" in results else None
-                })
-            
-            return formatted_results
+            mode = mode or settings.SEARCH_MODE
+            if mode not in SEARCH_MODES:
+                raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+            threshold = settings.SIMILARITY_THRESHOLD if threshold is None else threshold
+            max_drop = settings.ADAPTIVE_TOP_K_DROP if max_drop is None else max_drop
+            rerank = settings.RERANK_ENABLED if rerank is None else rerank
+            where = where or None
+            options = (n_results, mode, json.dumps(where, sort_keys=True), threshold, max_drop, rerank)
+            version = self.collection_version()
+            keys = [(self._normalize_query(query), options, version) for query in queries]
+            formatted_results: List[Optional[List[Dict[str, Any]]]] = [
+                self.result_cache.get(key) for key in keys
+            ]
+            misses = [q for q, cached in enumerate(formatted_results) if cached is None]
+
+            if misses:
+                missed_queries = [queries[q] for q in misses]
+                n_retrieve = max(n_results, settings.RERANK_CANDIDATES) if rerank else n_results
+                if rerank:
+                    max_drop = 0.0
+                n_candidates = n_retrieve if mode == "vector" else n_retrieve * settings.HYBRID_CANDIDATE_FACTOR
+                if mode == "vector":
+                    found = self._vector_search(missed_queries, n_retrieve, where, threshold, max_drop)
+                elif mode == "lexical":
+                    found = self._lexical_search(missed_queries, n_retrieve, where)
+                else:
+                    found = [
+                        self._fuse(vector_hits, lexical_hits, n_retrieve)
+                        for vector_hits, lexical_hits in zip(
+                            self._vector_search(missed_queries, n_candidates, where, threshold, max_drop),
+                            self._lexical_search(missed_queries, n_candidates, where)
+                        )
+                    ]
+                if rerank:
+                    with span("rerank"):
+                        found = self.reranker.rerank_batch(missed_queries, found, n_results)
+                for q, results in zip(misses, found):
+                    formatted_results[q] = results
+                    if not rerank or not results or "rerank_score" in results[0]:
+                        self.result_cache.set(keys[q], results)
+
+            # Callers may modify results, so never hand out cached objects
+            return [copy.deepcopy(results) for results in formatted_results]
         except Exception as e:
             self.logger.error(f"Error searching vector store: {e}")
             raise
 
+    def _vector_search(
+        self,
+        queries: List[str],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        threshold: float = 0.0,
+        max_drop: float = 0.0
+    ) -> List[List[Dict[str, Any]]]:
+        """Rank chunks by embedding similarity."""
+        embeddings = self._embed_queries(queries)
+        with span("vector_query"):
+            results = self.backend.query(
+                query_embeddings=embeddings,
+                n_results=n_results,
+                where=where,
+                max_distance=1.0 - threshold if threshold > 0 else None
+            )
+        found = []
+        for row in range(len(queries)):
+            distances = results["distances"][row]
+            keep = len(distances)
+            if max_drop > 0 and distances:
+                # Nearest first: stop at the first match too far behind the best
+                keep = next((i for i, distance in enumerate(distances) if distance - distances[0] > max_drop), keep)
+            found.append([
+                {
+                    "id": results["ids"][row][i],
+                    "text": results["documents"][row][i],
+                    "metadata": results["metadatas"][row][i],
+                    "distance": distances[i]
+                }
+                for i in range(keep)
+            ])
+        return found
+
+    def _lexical_search(
+        self,
+        queries: List[str],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Rank chunks by BM25 score."""
+        with span("lexical_query"):
+            index = self.lexical_index
+            index.refresh()
+            # The filter selects the chunks BM25 may rank, like the backend does for vectors
+            allowed = set(self.backend.get_ids(where)) if where else None
+            ranked = [index.search(query, n_results, allowed) for query in queries]
+        wanted = list({chunk_id for hits in ranked for chunk_id, _ in hits})
+        records = self.backend.get(ids=wanted) if wanted else {"ids": [], "documents": [], "metadatas": []}
+        by_id = {
+            chunk_id: (text, metadata)
+            for chunk_id, text, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+        }
+        return [
+            [
+                {"id": chunk_id, "text": by_id[chunk_id][0], "metadata": by_id[chunk_id][1],
+                 "distance": None, "bm25": score}
+                for chunk_id, score in hits if chunk_id in by_id
+            ]
+            for hits in ranked
+        ]
+
+    @staticmethod
+    def _fuse(
+        vector_hits: List[Dict[str, Any]],
+        lexical_hits: List[Dict[str, Any]],
+        n_results: int
+    ) -> List[Dict[str, Any]]:
+        """Combine two rankings with weighted reciprocal rank fusion."""
+        fused: Dict[str, Dict[str, Any]] = {}
+        for hits, weight in ((vector_hits, settings.HYBRID_VECTOR_WEIGHT), (lexical_hits, settings.HYBRID_LEXICAL_WEIGHT)):
+            for rank, hit in enumerate(hits):
+                entry = fused.setdefault(hit["id"], {**hit, "score": 0.0})
+                if hit.get("bm25") is not None:
+                    entry["bm25"] = hit["bm25"]
+                entry["score"] += weight / (settings.HYBRID_RRF_K + rank + 1)
+        return sorted(fused.values(), key=lambda hit: -hit["score"])[:n_results]
+
 
 if __name__ == "__main__":
     # Set up logging
@@ -108,7 +551,7 @@ if __name__ == "__main__":
     documents = processor.process_all_documents()
     
     # Initialize vector store
-    vector_store = VectorStore()
+    vector_store = VectorStore(generator)
     
     # Add documents to vector store
     for doc in documents:
@@ -0,0 +1,134 @@
+"""
+Benchmark the token-aware chunker against the original word-count chunker.
+
+Reports chunks/sec for each implementation on the bundled corpus and, when
+the embedding model is available, retrieval recall@k: every sentence of the
+corpus is used as a query and counts as a hit if a retrieved chunk contains
+it within the part of the chunk the model actually embeds.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import json
+import re
+import time
+from typing import Callable, List, Dict, Any
+
+import numpy as np
+
+from config.config import settings
+from src.core.chunker import TextChunker, split_sentences
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 1000) -> List[str]:
+    """The original chunker: whitespace words, no overlap, no hard split."""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in sentences:
+        sentence_length = len(sentence.split())
+        if current_length + sentence_length > chunk_size:
+            if current_chunk:
+                chunks.append(" ".join(current_chunk))
+            current_chunk = [sentence]
+            current_length = sentence_length
+        else:
+            current_chunk.append(sentence)
+            current_length += sentence_length
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def load_corpus(data_dir: Path) -> List[str]:
+    """Read every text file of the corpus."""
+    return [path.read_text(encoding="utf-8") for path in sorted(data_dir.glob("*.txt"))]
+
+
+def measure_throughput(chunk: Callable[[str], List[str]], texts: List[str], repeat: int) -> Dict[str, float]:
+    """Time a chunker over the corpus repeated several times."""
+    start = time.perf_counter()
+    n_chunks = 0
+    for _ in range(repeat):
+        for text in texts:
+            n_chunks += len(chunk(text))
+    elapsed = time.perf_counter() - start
+    return {
+        "chunks": n_chunks // repeat,
+        "seconds": round(elapsed, 4),
+        "chunks_per_second": round(n_chunks / elapsed, 1),
+        "mb_per_second": round(sum(len(t) for t in texts) * repeat / elapsed / 1e6, 2),
+    }
+
+
+def measure_recall(chunks: List[str], queries: List[str], model: Any, k: int) -> float:
+    """Recall@k of sentence queries against the embedded part of each chunk."""
+    tokenizer = model.tokenizer
+    max_tokens = model.max_seq_length - 2
+    embedded_text = [
+        tokenizer.decode(tokenizer(chunk, add_special_tokens=False)["input_ids"][:max_tokens])
+        for chunk in chunks
+    ]
+    chunk_vectors = model.encode(chunks, batch_size=settings.EMBEDDING_BATCH_SIZE, normalize_embeddings=True)
+    query_vectors = model.encode(queries, batch_size=settings.EMBEDDING_BATCH_SIZE, normalize_embeddings=True)
+    top_k = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+
+    def normalize(text: str) -> str:
+        return " ".join(tokenizer.decode(tokenizer(text, add_special_tokens=False)["input_ids"]).split())
+
+    hits = 0
+    for query, candidates in zip(queries, top_k):
+        needle = normalize(query)
+        hits += any(needle in " ".join(embedded_text[c].split()) for c in candidates)
+    return hits / len(queries)
+
+
+def run_benchmark(repeat: int = 50, k: int = 3, recall: bool = True) -> Dict[str, Any]:
+    """Run the chunker benchmark on the bundled corpus.
+
+    Args:
+        repeat: Passes over the corpus for the throughput measurement
+        k: Cut-off of the recall measurement
+        recall: Measure recall (requires the embedding model)
+
+    Returns:
+        Dict[str, Any]: Throughput and recall per implementation
+    """
+    texts = load_corpus(settings.DATA_DIR)
+    implementations: Dict[str, Callable[[str], List[str]]] = {
+        "legacy_words_1000": legacy_chunk_text,
+        "tokens_approx": TextChunker(tokenizer="approx").chunk,
+    }
+    try:
+        implementations["tokens_model"] = TextChunker(tokenizer="model").chunk
+    except Exception as e:
+        print(f"Skipping model tokenizer: {e}", file=sys.stderr)
+
+    results: Dict[str, Any] = {
+        "chunk_size": settings.CHUNK_SIZE,
+        "chunk_overlap": settings.CHUNK_OVERLAP,
+        "implementations": {name: measure_throughput(chunk, texts, repeat) for name, chunk in implementations.items()},
+    }
+
+    if recall:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        queries = [s.strip() for text in texts for s in split_sentences(text) if len(s.split()) >= 4]
+        for name, chunk in implementations.items():
+            chunks = [c for text in texts for c in chunk(text)]
+            results["implementations"][name][f"recall_at_{k}"] = round(measure_recall(chunks, queries, model, k), 4)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark text chunkers")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--k", type=int, default=settings.TOP_K_RESULTS)
+    parser.add_argument("--no-recall", action="store_true", help="Skip the recall measurement")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.repeat, args.k, not args.no_recall), indent=2))
@@ -0,0 +1,130 @@
+"""
+Benchmark the PyTorch and ONNX embedding backends.
+
+Embeds every sentence of the bundled corpus (DATA_DIR, repeated to the
+requested number of sentences) with each backend in a fresh process, so
+model load time includes the imports each backend needs. Reports load
+time, sentences per second and, for the ONNX backends, the lowest and
+mean cosine similarity to the PyTorch embeddings.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from config.config import settings
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def corpus_sentences(n_sentences: int) -> List[str]:
+    """Sentences of the bundled corpus, repeated up to n_sentences.
+
+    Args:
+        n_sentences: Number of sentences, 0 for the corpus once
+
+    Returns:
+        List[str]: Sentences
+    """
+    from src.core.chunker import split_sentences
+    from src.core.loaders import get_loader, load_document
+
+    sentences = [
+        sentence.strip()
+        for path in sorted(settings.DATA_DIR.rglob("*")) if path.is_file() and get_loader(path)
+        for text, _ in load_document(path)
+        for sentence in split_sentences(text)
+    ]
+    if n_sentences and sentences:
+        sentences = (sentences * (n_sentences // len(sentences) + 1))[:n_sentences]
+    return sentences
+
+
+def run_backend(backend: str, n_sentences: int, output: Path) -> Dict[str, Any]:
+    """Embed the corpus with one backend in this process.
+
+    Args:
+        backend: "torch", "onnx" or "onnx-int8"
+        n_sentences: Number of sentences
+        output: File the embeddings are saved to (.npy)
+
+    Returns:
+        Dict[str, Any]: Load time and throughput
+    """
+    sentences = corpus_sentences(n_sentences)
+    start = time.perf_counter()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu")
+    else:
+        from src.core.onnx_embeddings import OnnxEmbeddingModel
+        model = OnnxEmbeddingModel(quantize=backend == "onnx-int8")
+    load_seconds = time.perf_counter() - start
+
+    model.encode(sentences[:settings.EMBEDDING_BATCH_SIZE], batch_size=settings.EMBEDDING_BATCH_SIZE)
+    start = time.perf_counter()
+    embeddings = model.encode(sentences, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    np.save(output, np.asarray(embeddings, dtype=np.float32))
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "sentences": len(sentences),
+        "sentences_per_second": round(len(sentences) / elapsed, 1),
+    }
+
+
+def run_benchmark(n_sentences: int = 0, backends: List[str] = BACKENDS) -> Dict[str, Any]:
+    """Benchmark each backend in its own process and compare the vectors.
+
+    Args:
+        n_sentences: Number of sentences, 0 for the corpus once
+        backends: Backends to run; "torch" is the reference for agreement
+
+    Returns:
+        Dict[str, Any]: Results per backend
+    """
+    results: Dict[str, Any] = {"model": settings.EMBEDDING_MODEL, "backends": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            output = Path(tmp) / f"{backend}.npy"
+            completed = subprocess.run(
+                [sys.executable, __file__, "--backend", backend, "--sentences", str(n_sentences),
+                 "--output", str(output)],
+                capture_output=True, text=True, check=True
+            )
+            results["backends"][backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        if "torch" in backends:
+            reference = np.load(Path(tmp) / "torch.npy")
+            for backend in backends:
+                if backend == "torch":
+                    continue
+                vectors = np.load(Path(tmp) / f"{backend}.npy")
+                cosine = (vectors * reference).sum(axis=1) / (
+                    np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+                )
+                results["backends"][backend]["min_cosine"] = round(float(cosine.min()), 5)
+                results["backends"][backend]["mean_cosine"] = round(float(cosine.mean()), 5)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--sentences", type=int, default=0, help="Sentences to embed (default: the corpus once)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.sentences, args.output)))
+    else:
+        print(json.dumps(run_benchmark(args.sentences, args.backends), indent=2))
@@ -0,0 +1,92 @@
+"""
+Benchmark peak memory of whole-file versus streaming chunking.
+
+Builds a synthetic text file of the requested size from the bundled corpus
+and chunks it twice, once by reading it whole (DocumentProcessor.process_file)
+and once through the block-wise streaming reader (iter_file_chunks), tracing
+Python allocations with tracemalloc. Peak memory of the streaming path stays
+at a few read blocks plus one chunk window, independent of the file size.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from config.config import settings
+from src.core.document_processor import DocumentProcessor
+
+
+def build_corpus_file(path: Path, size_mb: int) -> int:
+    """Write a file of about size_mb megabytes by repeating the corpus.
+
+    Args:
+        path: File to create
+        size_mb: Target size in megabytes
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    seed = "\n".join(p.read_text(encoding="utf-8") for p in sorted(settings.DATA_DIR.glob("*.txt")))
+    seed = (seed or "Retrieval-Augmented Generation combines retrieval with generation. ") + "\n"
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            f.write(seed)
+            written += len(seed.encode("utf-8"))
+    return path.stat().st_size
+
+
+def measure(run: Callable[[], int]) -> Dict[str, float]:
+    """Measure time and traced peak memory of a chunking run."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_chunks = run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "chunks": n_chunks,
+        "seconds": round(elapsed, 2),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def run_benchmark(size_mb: int = 256, whole: bool = True) -> Dict[str, Any]:
+    """Compare whole-file and streaming chunking on a synthetic file.
+
+    Args:
+        size_mb: Size of the synthetic file in megabytes
+        whole: Also measure the whole-file path (needs several times size_mb of RAM)
+
+    Returns:
+        Dict[str, Any]: Chunk count, time and peak memory per mode
+    """
+    processor = DocumentProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "large.txt"
+        file_size = build_corpus_file(path, size_mb)
+        results: Dict[str, Any] = {
+            "file_mb": round(file_size / 1024 / 1024, 1),
+            "read_block_size": settings.READ_BLOCK_SIZE,
+            "chunk_tokenizer": settings.CHUNK_TOKENIZER,
+        }
+        results["streaming"] = measure(lambda: sum(1 for _ in processor.iter_file_chunks(path)))
+        if whole:
+            results["whole_file"] = measure(lambda: len(processor.process_file(path)["chunks"]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chunking memory on a large file")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--streaming-only", action="store_true", help="Skip the whole-file measurement")
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.size_mb, not args.streaming_only), indent=2))
@@ -0,0 +1,114 @@
+"""
+Benchmark quantized vector storage against the uncompressed numpy index.
+
+Builds numpy indexes without quantization, with int8 codes and with
+product quantization over the same synthetic clustered embeddings, then
+runs the same queries through ``VectorStore.search``. For each mode it
+reports the memory searched per query (the matrix, or the codes),
+queries per second and recall@k against the exact results.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from config.config import settings
+from src.core.backends.numpy_backend import NumpyBackend
+from src.core.vector_store import VectorStore
+
+
+class PrecomputedQueries:
+    """Stand-in embedding generator serving precomputed query vectors.
+
+    Queries are named "q<index>", so the benchmark measures the vector
+    store rather than the embedding model.
+    """
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return self.vectors[[int(query[1:]) for query in queries]]
+
+
+def synthetic_embeddings(n: int, dimension: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Draw clustered unit vectors resembling sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def code_bytes(backend: NumpyBackend) -> int:
+    """Bytes scanned per query: the codes, or the full matrix without quantization."""
+    n = backend.count()
+    if backend.quantizer is None:
+        return n * backend.dimension * np.dtype(backend.dtype).itemsize
+    return sum(n * width * np.dtype(dtype).itemsize for _, dtype, width in backend.quantizer.arrays())
+
+
+def run_benchmark(n: int = 100_000, n_queries: int = 200, k: int = 5, clusters: int = 256) -> Dict[str, Any]:
+    """Compare quantization modes on synthetic data.
+
+    Args:
+        n: Indexed vectors
+        n_queries: Queries to run
+        k: Results per query
+        clusters: Clusters of the synthetic data
+
+    Returns:
+        Dict[str, Any]: Build time, memory, QPS and recall@k per mode
+    """
+    dimension = settings.EMBEDDING_DIMENSION
+    vectors = synthetic_embeddings(n, dimension, clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, n_queries, replace=False)] + 0.05 * rng.normal(size=(n_queries, dimension))
+    generator = PrecomputedQueries(queries.astype(np.float32))
+    names = [f"q{i}" for i in range(n_queries)]
+    ids = [str(i) for i in range(n)]
+
+    results: Dict[str, Any] = {"vectors": n, "dimension": dimension, "queries": n_queries, "k": k, "modes": {}}
+    baseline: List[List[str]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("none", "int8", "pq"):
+            backend = NumpyBackend(path=Path(tmp), name=f"bench-{mode}", quantization=mode)
+            start = time.perf_counter()
+            for offset in range(0, n, backend.max_batch_size):
+                end = offset + backend.max_batch_size
+                backend.upsert(ids[offset:end], vectors[offset:end], ids[offset:end], [{}] * len(ids[offset:end]))
+            build_seconds = time.perf_counter() - start
+
+            store = VectorStore(embedding_generator=generator, backend=backend)
+            store.search(names[0], k)
+            start = time.perf_counter()
+            found = [[doc["id"] for doc in store.search(name, k)] for name in names]
+            elapsed = time.perf_counter() - start
+            if mode == "none":
+                baseline = found
+
+            results["modes"][mode] = {
+                "build_seconds": round(build_seconds, 2),
+                "searched_mb": round(code_bytes(backend) / 1024 / 1024, 1),
+                "qps": round(n_queries / elapsed, 1),
+                f"recall_at_{k}": round(float(np.mean([
+                    len(set(got) & set(want)) / k for got, want in zip(found, baseline)
+                ])), 4),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark quantized vector storage")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=settings.TOP_K_RESULTS)
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args.vectors, args.queries, args.k), indent=2))
@@ -0,0 +1,286 @@
+"""
+Reproducible end-to-end benchmark of the RAG pipeline.
+
+For each corpus size, generates a synthetic corpus from the bundled notes
+(DATA_DIR) in a temporary directory, then measures:
+
+- ingestion throughput (files/s, chunks/s, embeddings/s) of the streaming
+  pipeline into a fresh vector store;
+- ``VectorStore.search`` latency percentiles and QPS over distinct queries,
+  so the result cache never answers;
+- end-to-end ``/ask`` latency through the HTTP service against a local fake
+  Ollama server emitting tokens at a configurable rate.
+
+Everything runs with a fixed seed and the output is one JSON document
+tagged with the git commit, so runs can be diffed across commits. With
+``--fake-embeddings`` a deterministic hash-based encoder replaces the
+embedding model and chunks are sized with the approximate tokenizer, which
+needs no download and isolates everything but the model.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from config.config import settings
+from src.core.chunker import split_sentences
+from src.utils.load_test import summarize
+
+
+class HashEmbeddingModel:
+    """Deterministic stand-in for SentenceTransformer that needs no download."""
+
+    def __init__(self, model_name: str = "", *args, **kwargs):
+        self.model_name = model_name
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        vectors = np.empty((len(sentences), settings.EMBEDDING_DIMENSION), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            seed = int.from_bytes(hashlib.sha256(sentence.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(settings.EMBEDDING_DIMENSION)
+            vectors[i] = vector / np.linalg.norm(vector)
+        return vectors
+
+
+def seed_sentences() -> List[str]:
+    """Sentences of the bundled notes."""
+    sentences = [
+        " ".join(sentence.split())
+        for path in sorted(settings.DATA_DIR.glob("*.txt"))
+        for sentence in split_sentences(path.read_text(encoding="utf-8"))
+    ]
+    return sentences or ["Retrieval-Augmented Generation combines retrieval with generation."]
+
+
+def build_corpus(
+    directory: Path,
+    n_files: int,
+    pool: List[str],
+    sentences_per_file: int = 40,
+    seed: int = 0
+) -> List[str]:
+    """Write a synthetic corpus of shuffled, uniquely tagged note sentences.
+
+    Every sentence is tagged with its file and position, so no two chunks
+    are identical and the embedding cache cannot short-circuit ingestion.
+
+    Args:
+        directory: Directory to write the files to
+        n_files: Number of files
+        pool: Sentences to draw from
+        sentences_per_file: Sentences per file
+        seed: Random seed
+
+    Returns:
+        List[str]: All written sentences, usable as queries
+    """
+    rng = random.Random(seed)
+    written = []
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(n_files):
+        sentences = [
+            f"{rng.choice(pool).rstrip('.!?')} (note {i}, item {j})."
+            for j in range(sentences_per_file)
+        ]
+        (directory / f"note_{i:05d}.txt").write_text(" ".join(sentences), encoding="utf-8")
+        written.extend(sentences)
+    return written
+
+
+@contextmanager
+def isolated_settings(root: Path) -> Iterator[None]:
+    """Point every on-disk location at a scratch directory, restoring it afterwards."""
+    overrides = {
+        "DATA_DIR": root / "data",
+        "EMBEDDINGS_DIR": root / "embeddings",
+        "EMBEDDING_CACHE_DIR": root / "embeddings" / "cache",
+        "INGEST_MANIFEST_PATH": root / "embeddings" / "ingest_manifest.json",
+        "DEDUP_INDEX_PATH": root / "embeddings" / "dedup_index.sqlite",
+        "CHROMA_PERSIST_DIR": root / "chroma_db",
+        "VECTOR_INDEX_DIR": root / "vector_index",
+    }
+    saved = {name: getattr(settings, name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+def bench_ingest(workers: Optional[int]) -> Dict[str, Any]:
+    """Ingest DATA_DIR into a fresh vector store and report throughput."""
+    from src.core.embeddings import EmbeddingGenerator
+    from src.core.ingest import ingest
+    from src.core.vector_store import VectorStore
+
+    generator = EmbeddingGenerator()
+    store = VectorStore(generator)
+    start = time.perf_counter()
+    stats = ingest(workers=workers, incremental=False, progress=False, vector_store=store, generator=generator)
+    elapsed = time.perf_counter() - start
+    return {
+        "files": stats["changed_files"],
+        "chunks": stats["embedded_chunks"],
+        "duplicate_chunks": stats["duplicate_chunks"],
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(stats["changed_files"] / elapsed, 1),
+        "chunks_per_second": round(stats["embedded_chunks"] / elapsed, 1),
+        "embeddings_per_second": stats["stages"]["embed"]["per_second"],
+        "stages": stats["stages"],
+    }
+
+
+def bench_search(queries: List[str], n_results: int) -> Dict[str, Any]:
+    """Time VectorStore.search on distinct queries."""
+    from src.core.vector_store import VectorStore
+
+    store = VectorStore()
+    store.search("warm up", n_results)
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        store.search(query, n_results)
+        latencies.append(time.perf_counter() - query_start)
+    return {"collection_size": store.count(), **summarize(latencies, 0, time.perf_counter() - start)}
+
+
+def bench_ask(queries: List[str], tokens_per_second: float, prefill_seconds: float) -> Dict[str, Any]:
+    """Time /ask requests through the HTTP service against a fake Ollama."""
+    from fastapi.testclient import TestClient
+
+    from src.api.app import create_app
+    from src.core.async_generator import AsyncGenerator
+    from src.core.vector_store import VectorStore
+    from src.utils.fake_ollama import FakeOllamaServer
+
+    saved_url = settings.OLLAMA_BASE_URL
+    with FakeOllamaServer(tokens_per_second=tokens_per_second, prefill_seconds=prefill_seconds) as server:
+        settings.OLLAMA_BASE_URL = server.url
+        try:
+            with TestClient(create_app(VectorStore(), AsyncGenerator())) as client:
+                while client.get("/ready").status_code != 200:
+                    time.sleep(0.05)
+                latencies, errors = [], 0
+                start = time.perf_counter()
+                for query in queries:
+                    query_start = time.perf_counter()
+                    if client.post("/ask", json={"query": query}).status_code == 200:
+                        latencies.append(time.perf_counter() - query_start)
+                    else:
+                        errors += 1
+                elapsed = time.perf_counter() - start
+                prompt_chars = [len(request["prompt"]) for request in server.requests]
+        finally:
+            settings.OLLAMA_BASE_URL = saved_url
+    return {
+        "tokens_per_second": tokens_per_second,
+        "prefill_seconds": prefill_seconds,
+        "mean_prompt_chars": round(float(np.mean(prompt_chars)), 1) if prompt_chars else 0.0,
+        **summarize(latencies, errors, elapsed),
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit of the working tree, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    sizes: List[int] = (50, 200, 1000),
+    n_queries: int = 200,
+    n_ask: int = 20,
+    tokens_per_second: float = 200.0,
+    prefill_seconds: float = 0.05,
+    workers: Optional[int] = None,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Run the ingest, search and /ask benchmarks at every corpus size.
+
+    Args:
+        sizes: Corpus sizes in files
+        n_queries: Search queries per size
+        n_ask: /ask requests per size, 0 to skip
+        tokens_per_second: Token rate of the fake Ollama server
+        prefill_seconds: Delay of the fake Ollama server before the first token
+        workers: Ingestion worker processes (defaults to settings.INGEST_WORKERS)
+        seed: Random seed of corpus and query generation
+
+    Returns:
+        Dict[str, Any]: Environment and results per corpus size
+    """
+    results: Dict[str, Any] = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {
+            name: getattr(settings, name)
+            for name in ("EMBEDDING_MODEL", "EMBEDDING_BACKEND", "VECTOR_BACKEND", "VECTOR_QUANTIZATION",
+                         "SEARCH_MODE", "TOP_K_RESULTS", "CHUNK_SIZE", "CHUNK_OVERLAP")
+        },
+        "sizes": {},
+    }
+    pool = seed_sentences()
+    for n_files in sizes:
+        with tempfile.TemporaryDirectory() as tmp, isolated_settings(Path(tmp)):
+            sentences = build_corpus(settings.DATA_DIR, n_files, pool, seed=seed)
+            rng = random.Random(seed)
+            queries = rng.sample(sentences, min(n_queries + n_ask, len(sentences)))
+            size_results = {"ingest": bench_ingest(workers)}
+            size_results["search"] = bench_search(queries[:n_queries], settings.TOP_K_RESULTS)
+            if n_ask:
+                size_results["ask"] = bench_ask(queries[n_queries:], tokens_per_second, prefill_seconds)
+            results["sizes"][str(n_files)] = size_results
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, search and /ask end to end")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="Corpus sizes in files")
+    parser.add_argument("--queries", type=int, default=200, help="Search queries per size")
+    parser.add_argument("--ask", type=int, default=20, help="/ask requests per size, 0 to skip")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Token rate of the fake Ollama")
+    parser.add_argument("--prefill-seconds", type=float, default=0.05, help="Fake Ollama delay before the first token")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use a hash-based encoder instead of the model")
+    parser.add_argument("--output", type=Path, help="Also write the JSON to this file")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        import src.core.embeddings
+        src.core.embeddings._load_sentence_transformer = HashEmbeddingModel
+        settings.EMBEDDING_BACKEND = "torch"
+        settings.CHUNK_TOKENIZER = "approx"
+        # Hash vectors carry no meaning, so similarity cutoffs would drop every result
+        settings.SIMILARITY_THRESHOLD = 0.0
+        settings.ADAPTIVE_TOP_K_DROP = 0.0
+
+    report = json.dumps(run_benchmark(
+        args.sizes, args.queries, args.ask, args.tokens_per_second, args.prefill_seconds, args.workers, args.seed
+    ), indent=2, default=str)
+    if args.output:
+        args.output.write_text(report + "\n")
+    print(report)
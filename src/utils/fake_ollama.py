@@ -0,0 +1,205 @@
+"""
+Local fake Ollama server for tests and benchmarks.
+
+Implements the subset of the Ollama HTTP API the generator uses
+(``POST /api/generate`` streaming and non-streaming, ``GET /api/tags``) and
+emits tokens at a configurable rate, so latency and streaming behaviour
+can be measured without a model.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from config.config import settings
+
+
+DEFAULT_RESPONSE = "Retrieval-Augmented Generation combines a retriever with a generator."
+
+
+class FakeOllamaServer:
+    """Threaded HTTP server imitating Ollama's generate API."""
+
+    def __init__(
+        self,
+        response_text: str = DEFAULT_RESPONSE,
+        tokens_per_second: float = 0.0,
+        prefill_seconds: float = 0.0,
+        fail_first: int = 0,
+        truncate_streams: bool = False,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """Initialize the fake server.
+
+        Args:
+            response_text: Text every completion returns, split into word tokens
+            tokens_per_second: Token emission rate (0 for no delay)
+            prefill_seconds: Delay before the first token
+            fail_first: Number of initial requests answered with HTTP 503
+            truncate_streams: End streams without the final "done" chunk,
+                like a dropped connection
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.response_text = response_text
+        self.tokens_per_second = tokens_per_second
+        self.prefill_seconds = prefill_seconds
+        self.fail_first = fail_first
+        self.truncate_streams = truncate_streams
+        self.requests: List[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def tokens(self) -> List[str]:
+        """Split the response text into the tokens that will be streamed."""
+        words = self.response_text.split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def start(self) -> "FakeOllamaServer":
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return True
+            return False
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                fake.logger.debug(format % args)
+
+            def _send_json(self, status: int, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": settings.OLLAMA_MODEL}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path != "/api/generate":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                with fake._lock:
+                    fake.requests.append(request)
+                if fake._should_fail():
+                    self._send_json(503, {"error": "server busy"})
+                    return
+
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    self._generate(request)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _generate(self, request: dict) -> None:
+                started = time.perf_counter()
+                time.sleep(fake.prefill_seconds)
+                prompt_eval_ns = int((time.perf_counter() - started) * 1e9)
+                tokens = fake.tokens()
+                delay = 1.0 / fake.tokens_per_second if fake.tokens_per_second else 0.0
+                model = request.get("model", settings.OLLAMA_MODEL)
+
+                def final(eval_start: float) -> dict:
+                    return {
+                        "model": model,
+                        "done": True,
+                        "total_duration": int((time.perf_counter() - started) * 1e9),
+                        "load_duration": 0,
+                        "prompt_eval_count": len(request.get("prompt", "").split()),
+                        "prompt_eval_duration": prompt_eval_ns,
+                        "eval_count": len(tokens),
+                        "eval_duration": int((time.perf_counter() - eval_start) * 1e9),
+                    }
+
+                if not request.get("stream", True):
+                    eval_start = time.perf_counter()
+                    time.sleep(delay * len(tokens))
+                    self._send_json(200, {**final(eval_start), "response": "".join(tokens)})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write_chunk(payload: dict) -> None:
+                    data = json.dumps(payload).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+
+                eval_start = time.perf_counter()
+                for token in tokens:
+                    time.sleep(delay)
+                    write_chunk({"model": model, "response": token, "done": False})
+                if not fake.truncate_streams:
+                    write_chunk({**final(eval_start), "response": ""})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Serve on Ollama's default port until interrupted
+    server = FakeOllamaServer(tokens_per_second=20.0, port=11434)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,116 +1,364 @@
 """
-Utility script to inspect ChromaDB collection contents and vectors.
+Utility script to inspect the vector store's contents and vectors.
+
+The collection is scanned in pages of ``limit``/``offset`` records, so
+memory is bounded by the page size rather than the collection: per-source
+and global embedding statistics are merged page by page, and only a
+64-bit SimHash signature and a 64-bit text hash per chunk are kept for
+duplicate detection at the end.
 """
 import sys
 from pathlib import Path
-sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
+import argparse
+import json
 import logging
-from typing import Dict, Any, List
+import time
+from typing import List, Dict, Any, Optional
+
 import numpy as np
-from pprint import pprint
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 from config.config import settings
+from src.core.backends import create_backend
+from src.core.backends.base import VectorBackend
+from src.core.manifest import hash_text
 
 
-def inspect_collection() -> None:
-    """Inspect the contents of the ChromaDB collection."""
-    # Initialize ChromaDB client
-    client = chromadb.PersistentClient(
-        path=str(settings.CHROMA_PERSIST_DIR),
-        settings=ChromaSettings(anonymized_telemetry=False)
-    )
-    
-    # Get collection
-    collection = client.get_collection(settings.CHROMA_COLLECTION_NAME)
-    
-    # Get collection info
-    print("\n=== Collection Info ===")
-    print(f"Name: {collection.name}")
-    print(f"Count: {collection.count()} documents")
-    
-    # Get all documents with their metadata and embeddings
-    results = collection.get(include=['embeddings', 'documents', 'metadatas'])
-    
-    # Group documents by source file
-    documents_by_source: Dict[str, List[Dict[str, Any]]] = {}
-    for i in range(len(results["ids"])):
-        metadata = results["metadatas"][i]
-        source = metadata["source"]
-        if source not in documents_by_source:
-            documents_by_source[source] = []
-        
-        documents_by_source[source].append({
-            "chunk_index": metadata["chunk_index"],
-            "text": results["documents"][i],
-            "id": results["ids"][i],
-            "embedding": results["embeddings"][i]
-        })
-    
-    # Print documents grouped by source
-    print("\n=== Documents by Source ===")
-    for source, chunks in documents_by_source.items():
-        print(f"\n{source} ({len(chunks)} chunks):")
-        for chunk in sorted(chunks, key=lambda x: x["chunk_index"]):
-            print(f"\nChunk {chunk['chunk_index']}:")
-            print(f"ID: {chunk['id']}")
-            print(f"Text: {chunk['text'][:200]}...")
-            print(f"Embedding shape: {len(chunk['embedding'])}")
-            print(f"Embedding (first 5 values): {chunk['embedding'][:5]}")
-            print(f"Embedding stats:")
-            print(f"  - Mean: {np.mean(chunk['embedding']):.4f}")
-            print(f"  - Std: {np.std(chunk['embedding']):.4f}")
-            print(f"  - Min: {np.min(chunk['embedding']):.4f}")
-            print(f"  - Max: {np.max(chunk['embedding']):.4f}")
+# Random hyperplanes per SimHash signature
+SIGNATURE_BITS = 64
+# Neighbours compared per record in each sorted band
+DUPLICATE_WINDOW = 32
+
+
+class RunningMoments:
+    """Count, mean, variance, minimum and maximum of rows, merged batch by batch.
+
+    Batches are combined with the parallel form of Welford's algorithm
+    (Chan et al.), which stays numerically stable over millions of rows.
+    """
+
+    def __init__(self, width: int):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    def update(self, rows: np.ndarray) -> None:
+        """Merge a batch of rows (n x width)."""
+        if not len(rows):
+            return
+        rows = np.asarray(rows, dtype=np.float64)
+        n = len(rows)
+        batch_mean = rows.mean(axis=0)
+        batch_m2 = ((rows - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = np.minimum(self.min, rows.min(axis=0))
+        self.max = np.maximum(self.max, rows.max(axis=0))
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / self.count if self.count else self.m2
+
+
+def _round(value: float) -> float:
+    return round(float(value), 6)
+
+
+def simhash(embeddings: np.ndarray, hyperplanes: np.ndarray) -> np.ndarray:
+    """64-bit SimHash signatures of embeddings.
+
+    Each bit is the side of a random hyperplane the vector falls on, so two
+    vectors at angle θ differ in each bit with probability θ/π.
+
+    Args:
+        embeddings: Vectors (n x dimension)
+        hyperplanes: Random normals (dimension x 64)
+
+    Returns:
+        np.ndarray: uint64 signature per vector
+    """
+    bits = (embeddings @ hyperplanes) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view(np.uint64).ravel()
+
+
+def _text_hashes(texts: List[str]) -> np.ndarray:
+    return np.array([int(hash_text(text or "")[:16], 16) for text in texts], dtype=np.uint64)
+
+
+def _groups(pairs: List[np.ndarray]) -> List[np.ndarray]:
+    """Connected components of positions linked by (i, j) pair arrays, largest first."""
+    if not pairs:
+        return []
+    edges = np.concatenate(pairs).tolist()
+    # Union-find over the linked positions only
+    parent: Dict[int, int] = {}
+
+    def find(i: int) -> int:
+        parent.setdefault(i, i)
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in edges:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    linked = np.array(sorted(parent))
+    roots = np.array([find(i) for i in linked.tolist()])
+    order = np.argsort(roots, kind="stable")
+    groups = np.split(linked[order], np.flatnonzero(np.diff(roots[order])) + 1)
+    return sorted(groups, key=len, reverse=True)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits of each uint64 value."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # NumPy < 2 has no popcount ufunc; count the bits of the 8 bytes instead
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1, dtype=np.uint8)
+
+
+def exact_duplicate_pairs(values: np.ndarray) -> List[np.ndarray]:
+    """Pairs of positions with equal values, chaining each group in sorted order."""
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    same = ordered[1:] == ordered[:-1]
+    if not same.any():
+        return []
+    return [np.stack([order[:-1][same], order[1:][same]], axis=1)]
+
+
+def near_duplicate_pairs(signatures: np.ndarray, max_bits: int, window: int = DUPLICATE_WINDOW) -> List[np.ndarray]:
+    """Pairs of signatures within max_bits Hamming distance.
+
+    The signature is cut into max_bits + 1 bands; by the pigeonhole
+    principle, two signatures that close agree exactly on at least one band.
+    Per band, signatures are sorted by the band and each is compared with
+    its next ``window`` neighbours while they share it, so the cost is
+    O(n log n) per band instead of O(n²). Pairs in buckets larger than the
+    window can be missed.
+
+    Args:
+        signatures: uint64 SimHash signatures
+        max_bits: Largest Hamming distance of a near-duplicate
+        window: Neighbours compared per signature and band
+
+    Returns:
+        List[np.ndarray]: Arrays of (i, j) position pairs
+    """
+    bounds = np.linspace(0, SIGNATURE_BITS, max_bits + 2).astype(int).tolist()
+    pairs = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        keys = (signatures >> np.uint64(low)) & np.uint64((1 << (high - low)) - 1)
+        order = np.argsort(keys, kind="stable")
+        ordered_keys, ordered = keys[order], signatures[order]
+        for step in range(1, min(window, len(order) - 1) + 1):
+            same = ordered_keys[step:] == ordered_keys[:-step]
+            if not same.any():
+                break
+            close = same & (popcount(ordered[step:] ^ ordered[:-step]) <= max_bits)
+            if close.any():
+                pairs.append(np.stack([order[:-step][close], order[step:][close]], axis=1))
+    return pairs
+
+
+def inspect_collection(
+    backend: Optional[VectorBackend] = None,
+    page_size: Optional[int] = None,
+    near_duplicate_bits: Optional[int] = None,
+    examples: int = 5,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Scan the collection page by page and summarize it.
+
+    Args:
+        backend: Storage backend (defaults to create_backend())
+        page_size: Records per page (defaults to settings.INSPECT_PAGE_SIZE)
+        near_duplicate_bits: Largest SimHash Hamming distance counted as a
+            near-duplicate (defaults to settings.INSPECT_NEAR_DUPLICATE_BITS);
+            3 of 64 bits corresponds to a cosine similarity of about 0.99
+        examples: Largest duplicate groups to list with their ids
+        seed: Seed of the SimHash hyperplanes
+
+    Returns:
+        Dict[str, Any]: Collection size, global and per-source embedding
+        statistics, and exact and near-duplicate counts
+    """
+    logger = logging.getLogger(__name__)
+    backend = backend or create_backend()
+    page_size = page_size or settings.INSPECT_PAGE_SIZE
+    near_duplicate_bits = settings.INSPECT_NEAR_DUPLICATE_BITS if near_duplicate_bits is None else near_duplicate_bits
+    start = time.perf_counter()
+
+    dimension_moments: Optional[RunningMoments] = None
+    norm_moments = RunningMoments(1)
+    hyperplanes: Optional[np.ndarray] = None
+    # Per source: chunks, characters, sum, minimum and maximum of the norms
+    sources: Dict[str, List[float]] = {}
+    signatures, text_hashes = [], []
+    zero_vectors = pages = 0
+
+    offset = 0
+    while True:
+        page = backend.get(limit=page_size, offset=offset, include_embeddings=True)
+        n = len(page["ids"])
+        if not n:
+            break
+        pages += 1
+        offset += n
+        embeddings = page["embeddings"]
+        if dimension_moments is None:
+            dimension_moments = RunningMoments(embeddings.shape[1])
+            hyperplanes = np.random.default_rng(seed).standard_normal((embeddings.shape[1], SIGNATURE_BITS))
+
+        norms = np.linalg.norm(embeddings, axis=1)
+        dimension_moments.update(embeddings)
+        norm_moments.update(norms[:, None])
+        zero_vectors += int((norms == 0).sum())
+        signatures.append(simhash(embeddings, hyperplanes))
+        text_hashes.append(_text_hashes(page["documents"]))
+
+        labels = np.array([metadata.get("source", "") for metadata in page["metadatas"]])
+        chars = np.array([len(text or "") for text in page["documents"]])
+        names, inverse = np.unique(labels, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(names))
+        char_sums = np.bincount(inverse, weights=chars, minlength=len(names))
+        norm_sums = np.bincount(inverse, weights=norms, minlength=len(names))
+        norm_mins = np.full(len(names), np.inf)
+        norm_maxs = np.full(len(names), -np.inf)
+        np.minimum.at(norm_mins, inverse, norms)
+        np.maximum.at(norm_maxs, inverse, norms)
+        for k, name in enumerate(names.tolist()):
+            entry = sources.setdefault(name, [0, 0, 0.0, np.inf, -np.inf])
+            entry[0] += int(counts[k])
+            entry[1] += int(char_sums[k])
+            entry[2] += float(norm_sums[k])
+            entry[3] = min(entry[3], float(norm_mins[k]))
+            entry[4] = max(entry[4], float(norm_maxs[k]))
+        logger.debug(f"Inspected {offset} records")
+
+    total = norm_moments.count
+    report: Dict[str, Any] = {
+        "backend": type(backend).__name__,
+        "path": str(backend.path),
+        "collection": backend.name,
+        "chunks": total,
+        "page_size": page_size,
+        "pages": pages,
+    }
+    if not total:
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return report
+
+    dimension_std = np.sqrt(dimension_moments.variance)
+    report["embeddings"] = {
+        "dimension": int(len(dimension_std)),
+        "norm": {
+            "mean": _round(norm_moments.mean[0]),
+            "std": _round(np.sqrt(norm_moments.variance[0])),
+            "min": _round(norm_moments.min[0]),
+            "max": _round(norm_moments.max[0]),
+        },
+        "zero_vectors": zero_vectors,
+        # Length of the mean vector; near 0 for well-spread embeddings
+        "centroid_norm": _round(np.linalg.norm(dimension_moments.mean)),
+        "dimension_std": {
+            "mean": _round(dimension_std.mean()),
+            "min": _round(dimension_std.min()),
+            "max": _round(dimension_std.max()),
+        },
+    }
+    report["sources"] = {
+        name: {
+            "chunks": chunks,
+            "chars": chars,
+            "mean_norm": _round(norm_sum / chunks),
+            "min_norm": _round(norm_min),
+            "max_norm": _round(norm_max),
+        }
+        for name, (chunks, chars, norm_sum, norm_min, norm_max) in sorted(sources.items())
+    }
+
+    signatures = np.concatenate(signatures)
+    text_hashes = np.concatenate(text_hashes)
+    exact_groups = _groups(exact_duplicate_pairs(text_hashes))
+    near_groups = _groups(near_duplicate_pairs(signatures, near_duplicate_bits))
+    report["duplicates"] = {
+        "exact_text_groups": len(exact_groups),
+        "exact_text_chunks": int(sum(len(group) - 1 for group in exact_groups)),
+        "near_duplicate_bits": near_duplicate_bits,
+        "near_duplicate_groups": len(near_groups),
+        "near_duplicate_chunks": int(sum(len(group) - 1 for group in near_groups)),
+        "examples": [_describe_group(backend, group) for group in near_groups[:examples]],
+    }
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def _describe_group(backend: VectorBackend, positions: np.ndarray) -> List[Dict[str, Any]]:
+    """Look up the ids and sources of a few records of a duplicate group by scan position."""
+    described = []
+    for position in positions[:5].tolist():
+        record = backend.get(limit=1, offset=position)
+        if record["ids"]:
+            described.append({"id": record["ids"][0], "source": record["metadatas"][0].get("source")})
+    return described
 
 
 def search_example(query: str, n_results: int = 3) -> None:
     """Perform a search and show results with vector similarities.
-    
+
     Args:
         query: Search query
         n_results: Number of results to show
     """
-    # Initialize ChromaDB client
-    client = chromadb.PersistentClient(
-        path=str(settings.CHROMA_PERSIST_DIR),
-        settings=ChromaSettings(anonymized_telemetry=False)
-    )
-    
-    # Get collection
-    collection = client.get_collection(settings.CHROMA_COLLECTION_NAME)
-    
-    # Perform search
-    results = collection.query(
-        query_texts=[query],
-        n_results=n_results,
-        include=['distances', 'documents', 'metadatas']
-    )
-    
+    from src.core.vector_store import VectorStore
+
+    results = VectorStore().search(query, n_results=n_results, mode="vector")
+
     # Print results
     print(f"\n=== Search Results for: {query} ===")
-    for i in range(len(results["documents"][0])):
+    for i, result in enumerate(results):
         print(f"\nResult {i + 1}:")
-        print(f"Source: {results['metadatas'][0][i]['source']}")
-        print(f"Chunk Index: {results['metadatas'][0][i]['chunk_index']}")
-        print(f"Similarity: {1 - results['distances'][0][i]:.4f}")
-        print(f"Text: {results['documents'][0][i][:200]}...")
+        print(f"Source: {result['metadata']['source']}")
+        print(f"Chunk Index: {result['metadata']['chunk_index']}")
+        print(f"Similarity: {1 - result['distance']:.4f}")
+        print(f"Text: {result['text'][:200]}...")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the vector store page by page")
+    parser.add_argument("--page-size", type=int, default=None, help="Records read per page")
+    parser.add_argument("--near-duplicate-bits", type=int, default=None, help="SimHash distance of near-duplicates")
+    parser.add_argument("--output", type=Path, help="Also write the JSON report to this file")
+    parser.add_argument("--examples", action="store_true", help="Also run example searches")
+    args = parser.parse_args()
+
     # Set up logging
     logging.basicConfig(
         level=settings.LOG_LEVEL,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
-    
+
     # Inspect collection
-    inspect_collection()
-    
+    report = json.dumps(
+        inspect_collection(page_size=args.page_size, near_duplicate_bits=args.near_duplicate_bits), indent=2
+    )
+    if args.output:
+        args.output.write_text(report + "\n")
+    print(report)
+
     # Example searches
-    print("\n=== Example Searches ===")
-    search_example("What is RAG architecture?")
-    search_example("How do vector databases work?")
-    search_example("What are the evaluation metrics for RAG?") 
\ No newline at end of file
+    if args.examples:
+        print("\n=== Example Searches ===")
+        search_example("What is RAG architecture?")
+        search_example("How do vector databases work?")
+        search_example("What are the evaluation metrics for RAG?")
@@ -0,0 +1,107 @@
+"""
+Load test for the HTTP query service.
+
+Sends requests to a running service from a fixed number of concurrent
+clients and reports latency percentiles and throughput as JSON.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Dict, Any
+
+import httpx
+import numpy as np
+
+from config.config import settings
+
+
+DEFAULT_QUERIES = [
+    "What is RAG architecture?",
+    "How do attention mechanisms work?",
+    "What are the key components of a vector database?",
+    "How are embeddings generated?",
+    "What metrics are used to evaluate RAG systems?",
+]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Summarize request latencies.
+
+    Args:
+        latencies: Latency of each successful request in seconds
+        errors: Number of failed requests
+        elapsed: Wall-clock duration of the run in seconds
+
+    Returns:
+        Dict[str, Any]: Request counts, QPS and latency percentiles in ms
+    """
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "qps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p90_ms": round(float(np.percentile(values, 90)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+async def run_load_test(
+    base_url: str,
+    endpoint: str = "/search",
+    concurrency: int = 8,
+    requests: int = 200,
+    queries: List[str] = DEFAULT_QUERIES
+) -> Dict[str, Any]:
+    """Run a closed-loop load test against the service.
+
+    Args:
+        base_url: Base URL of the service
+        endpoint: Endpoint to exercise (/search or /ask)
+        concurrency: Number of concurrent clients
+        requests: Total number of requests
+        queries: Queries to cycle through
+
+    Returns:
+        Dict[str, Any]: Summary from summarize()
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=settings.OLLAMA_TIMEOUT) as client:
+        async def worker() -> None:
+            nonlocal errors
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(endpoint, json={"query": queries[i % len(queries)]})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {"endpoint": endpoint, "concurrency": concurrency, **summarize(latencies, errors, elapsed)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the RAG query service")
+    parser.add_argument("--url", default=f"http://{settings.API_HOST}:{settings.API_PORT}")
+    parser.add_argument("--endpoint", default="/search", choices=["/search", "/ask"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load_test(args.url, args.endpoint, args.concurrency, args.requests))
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,64 @@
+"""
+Shared fixtures for the RAG tests.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from config.config import settings
+
+
+class FakeSentenceTransformer:
+    """Deterministic stand-in for SentenceTransformer that needs no download."""
+
+    def __init__(self, model_name: str = "", *args, **kwargs):
+        self.model_name = model_name
+        self.encoded = []
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        self.encoded.extend(sentences)
+        vectors = np.empty((len(sentences), settings.EMBEDDING_DIMENSION), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            seed = int.from_bytes(hashlib.sha256(sentence.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(settings.EMBEDDING_DIMENSION)
+            vectors[i] = vector / np.linalg.norm(vector)
+        return vectors
+
+
+@pytest.fixture
+def tmp_settings(tmp_path, monkeypatch):
+    """Point every on-disk location at a temporary directory."""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    embeddings_dir = tmp_path / "embeddings"
+    monkeypatch.setattr(settings, "DATA_DIR", data_dir)
+    monkeypatch.setattr(settings, "CHUNK_TOKENIZER", "approx")
+    monkeypatch.setattr(settings, "EMBEDDINGS_DIR", embeddings_dir)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_DIR", embeddings_dir / "cache")
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 64)
+    monkeypatch.setattr(settings, "INGEST_MANIFEST_PATH", embeddings_dir / "ingest_manifest.json")
+    monkeypatch.setattr(settings, "DEDUP_INDEX_PATH", embeddings_dir / "dedup_index.sqlite")
+    monkeypatch.setattr(settings, "CHROMA_PERSIST_DIR", tmp_path / "chroma_db")
+    monkeypatch.setattr(settings, "VECTOR_INDEX_DIR", tmp_path / "vector_index")
+    # Fake embeddings carry no meaning, so similarity cutoffs are opt-in per test
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.0)
+    monkeypatch.setattr(settings, "ADAPTIVE_TOP_K_DROP", 0.0)
+    return settings
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Replace the sentence-transformers model with a deterministic fake."""
+    from src.core import embeddings
+
+    monkeypatch.setattr(embeddings, "_load_sentence_transformer", FakeSentenceTransformer)
+    # The shared generator may hold another test's model and cache directory
+    monkeypatch.setattr(embeddings, "_shared_generator", None)
+    return FakeSentenceTransformer
@@ -0,0 +1,123 @@
+"""
+Tests for the HTTP query service.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.app import SearchBatcher, create_app
+from src.core.async_generator import AsyncGenerator
+from src.core.embeddings import EmbeddingGenerator
+from src.core.vector_store import VectorStore
+from src.utils.fake_ollama import FakeOllamaServer
+
+
+def test_service_search_ask_and_ingest(tmp_settings, fake_model, monkeypatch):
+    (tmp_settings.DATA_DIR / "rag.txt").write_text("RAG combines retrieval with generation.", encoding="utf-8")
+    (tmp_settings.DATA_DIR / "bm25.txt").write_text("BM25 ranks documents by term frequency.", encoding="utf-8")
+    vector_store = VectorStore(EmbeddingGenerator())
+
+    with FakeOllamaServer(response_text="RAG retrieves then generates.") as server:
+        monkeypatch.setattr(tmp_settings, "OLLAMA_BASE_URL", server.url)
+        with TestClient(create_app(vector_store, AsyncGenerator())) as client:
+            for _ in range(100):
+                if client.get("/ready").status_code == 200:
+                    break
+                time.sleep(0.05)
+            assert client.get("/ready").json()["ready"]
+
+            assert client.post("/ingest", json={"workers": 1}).json()["changed_files"] == 2
+
+            results = client.post("/search", json={"query": "RAG combines retrieval with generation."}).json()
+            assert [result["id"] for result in results["results"]][:1] == ["rag.txt_0"]
+            assert len(results["results"]) == 2
+            # The exact match is far ahead, so the adaptive cut keeps only it
+            cut = client.post("/search", json={"query": "RAG combines retrieval with generation.", "max_drop": 0.5})
+            assert [result["id"] for result in cut.json()["results"]] == ["rag.txt_0"]
+
+            answer = client.post("/ask", json={"query": "What is RAG?"}).json()
+            assert answer["response"] == "RAG retrieves then generates."
+
+            with client.stream("POST", "/ask", json={"query": "Explain RAG", "stream": True}) as response:
+                body = "".join(response.iter_text())
+            assert 'data: " generates."' in body
+            assert "event: done" in body
+
+
+def test_rag_benchmark_reports_every_stage(tmp_settings, fake_model):
+    from src.utils.bench_rag import run_benchmark
+
+    report = run_benchmark(sizes=[3], n_queries=4, n_ask=2, tokens_per_second=0.0, prefill_seconds=0.0, workers=1)
+    size = report["sizes"]["3"]
+    assert size["ingest"]["files"] == 3 and size["ingest"]["chunks_per_second"] > 0
+    assert size["search"]["requests"] == 4 and size["search"]["collection_size"] == size["ingest"]["chunks"]
+    assert size["ask"]["requests"] == 2 and size["ask"]["errors"] == 0
+    # Scratch locations are restored afterwards
+    assert not (tmp_settings.DATA_DIR / "note_00000.txt").exists()
+
+
+def test_metrics_endpoint_and_request_traces(tmp_settings, fake_model, monkeypatch):
+    from src.core.metrics import REGISTRY, span
+
+    (tmp_settings.DATA_DIR / "rag.txt").write_text("RAG combines retrieval with generation.", encoding="utf-8")
+    vector_store = VectorStore(EmbeddingGenerator())
+    REGISTRY.clear()
+
+    with FakeOllamaServer(response_text="RAG retrieves then generates.") as server:
+        monkeypatch.setattr(tmp_settings, "OLLAMA_BASE_URL", server.url)
+        with TestClient(create_app(vector_store, AsyncGenerator())) as client:
+            client.post("/ingest", json={"workers": 1})
+            traced = client.post("/search", json={"query": "What is RAG?", "trace": True}).json()
+            assert {"search", "embed_queries", "vector_query", "request"} <= {s["span"] for s in traced["trace"]}
+            assert "trace" not in client.post("/search", json={"query": "RAG?"}).json()
+
+            answer = client.post("/ask", json={"query": "Explain RAG", "trace": True}).json()
+            assert {"format_prompt", "ollama_generate", "ollama_prefill", "ollama_decode"} <= {
+                s["span"] for s in answer["trace"]
+            }
+
+            metrics = client.get("/metrics").text
+    assert 'rag_span_seconds_count{span="embed_chunks"} 1' in metrics
+    assert 'rag_span_seconds_bucket{span="search",le="+Inf"}' in metrics
+    assert 'rag_ollama_seconds_count{phase="decode"} 1' in metrics
+    assert 'rag_ollama_tokens_total{kind="completion"}' in metrics
+
+    # Disabled and untraced, spans record nothing
+    monkeypatch.setattr(tmp_settings, "METRICS_ENABLED", False)
+    REGISTRY.clear()
+    with span("idle"):
+        pass
+    assert REGISTRY.render() == "\n"
+
+
+def test_search_batcher_survives_a_failing_batch():
+    class FlakyVectorStore:
+        calls = 0
+
+        def search_batch(self, queries, *args, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("backend unavailable")
+            if self.calls == 2:
+                return None  # malformed results fail outside search_batch
+            return [[{"id": query}] for query in queries]
+
+    async def run():
+        batcher = SearchBatcher(FlakyVectorStore(), max_wait_ms=0)
+        batcher.start()
+        try:
+            with pytest.raises(RuntimeError, match="unavailable"):
+                await asyncio.wait_for(batcher.search("first"), timeout=5)
+            with pytest.raises(TypeError):
+                await asyncio.wait_for(batcher.search("second"), timeout=5)
+            return await asyncio.wait_for(batcher.search("third"), timeout=5)
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == [{"id": "third"}]
@@ -0,0 +1,30 @@
+"""
+Tests for the command line interface.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import json
+
+from src.cli.main import main, measure_startup
+
+
+def test_cli_ingests_inspects_and_starts_without_torch(tmp_settings, fake_model, monkeypatch, capsys):
+    monkeypatch.setattr(tmp_settings, "VECTOR_BACKEND", "numpy")
+    (tmp_settings.DATA_DIR / "rag.txt").write_text("RAG combines retrieval with generation.", encoding="utf-8")
+
+    assert main(["ingest", "--workers", "1"]) == 0
+    assert json.loads(capsys.readouterr().out)["changed_files"] == 1
+
+    assert main(["search", "RAG combines retrieval with generation.", "--json"]) == 0
+    assert json.loads(capsys.readouterr().out)[0]["id"] == "rag.txt_0"
+
+    assert main(["inspect"]) == 0
+    assert json.loads(capsys.readouterr().out)["sources"]["rag.txt"]["chunks"] == 1
+
+    # Fresh interpreters read the same store through the environment
+    monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+    monkeypatch.setenv("VECTOR_INDEX_DIR", str(tmp_settings.VECTOR_INDEX_DIR))
+    startup = measure_startup(repeats=1)
+    assert all(command["heavy_imports"] == [] for command in startup["commands"].values())
@@ -0,0 +1,171 @@
+"""
+Tests for the Ollama generator against a local fake Ollama server.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import os
+
+import pytest
+
+from src.core.async_generator import AsyncGenerator
+from src.core.chunker import TextChunker
+from src.core.context_packer import ContextPacker
+from src.core.generator import Generator
+from src.core.ingest import ingest
+from src.core.vector_store import VectorStore
+from src.utils.fake_ollama import FakeOllamaServer
+
+
+RETRIEVED_DOCS = [
+    {"id": "rag.txt_0", "text": "RAG combines retrieval with generation.", "metadata": {"source": "rag.txt"}},
+]
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    with FakeOllamaServer(response_text="RAG pairs a retriever with a generator.") as server:
+        monkeypatch.setattr("config.config.settings.OLLAMA_BASE_URL", server.url)
+        yield server
+
+
+def test_generate_stream_yields_tokens_and_stats(fake_ollama):
+    generator = Generator()
+    stats = {}
+    tokens = list(generator.generate_stream("What is RAG?", RETRIEVED_DOCS, stats))
+
+    assert len(tokens) == len(fake_ollama.tokens())
+    assert "".join(tokens) == "RAG pairs a retriever with a generator."
+    assert stats["eval_count"] == len(tokens)
+    assert "prompt_eval_duration" in stats
+    assert fake_ollama.requests[-1]["stream"] is True
+
+    # The streamed answer is cached for the non-streaming path
+    assert generator.generate_response("What is RAG?", RETRIEVED_DOCS) == "".join(tokens)
+    assert len(fake_ollama.requests) == 1
+
+
+def test_agenerate_stream(fake_ollama):
+    generator = AsyncGenerator()
+
+    async def collect():
+        return [token async for token in generator.agenerate_stream("What is RAG?", RETRIEVED_DOCS)]
+
+    tokens = asyncio.run(collect())
+    assert "".join(tokens) == "RAG pairs a retriever with a generator."
+    assert generator.last_stats["eval_count"] == len(tokens)
+
+
+def test_semantic_cache_misses_after_reingest(tmp_settings, fake_model, fake_ollama, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "SEMANTIC_CACHE_ENABLED", True)
+    note = tmp_settings.DATA_DIR / "rag.txt"
+    note.write_text("RAG combines retrieval with generation.", encoding="utf-8")
+    vector_store = VectorStore()
+    ingest(workers=1, vector_store=vector_store)
+    generator = Generator()
+
+    generator.generate_response("What is RAG?", vector_store.search("What is RAG?"))
+    assert generator.semantic_cache.stats()["size"] == 1
+
+    # Same chunk id, new text: the answer built from the old text must not be reused
+    note.write_text("RAG grounds answers in retrieved notes.", encoding="utf-8")
+    os.utime(note, ns=(note.stat().st_atime_ns, note.stat().st_mtime_ns + 1_000_000_000))
+    ingest(workers=1, vector_store=vector_store)
+    retrieved = vector_store.search("What is RAG?")
+    assert retrieved[0]["id"] == "rag.txt_0"
+    generator.generate_response("What is RAG?", retrieved)
+    assert generator.semantic_cache.stats()["hits"] == 0
+    assert len(fake_ollama.requests) == 2
+
+
+def test_truncated_stream_is_not_cached(monkeypatch):
+    with FakeOllamaServer(truncate_streams=True) as server:
+        monkeypatch.setattr("config.config.settings.OLLAMA_BASE_URL", server.url)
+        generator = AsyncGenerator()
+        with pytest.raises(Exception, match="final chunk"):
+            list(generator.generate_stream("What is RAG?", RETRIEVED_DOCS))
+
+        async def collect():
+            return [token async for token in generator.agenerate_stream("What is RAG?", RETRIEVED_DOCS)]
+
+        with pytest.raises(Exception, match="final chunk"):
+            asyncio.run(collect())
+        # Neither partial answer was cached, so the full answer is generated
+        server.truncate_streams = False
+        assert generator.generate_response("What is RAG?", RETRIEVED_DOCS) == "".join(server.tokens())
+        assert len(server.requests) == 3
+
+
+def test_generate_response_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr("config.config.settings.OLLAMA_RETRY_BACKOFF", 0.01)
+    with FakeOllamaServer(fail_first=2) as server:
+        monkeypatch.setattr("config.config.settings.OLLAMA_BASE_URL", server.url)
+        assert Generator().generate_response("What is RAG?", RETRIEVED_DOCS)
+        assert len(server.requests) == 3
+
+        server.fail_first = 2
+        answer = asyncio.run(AsyncGenerator().agenerate_response("Explain RAG", RETRIEVED_DOCS))
+        assert answer
+        assert len(server.requests) == 6
+
+
+def test_async_client_is_closed_with_its_event_loop(fake_ollama):
+    generator = AsyncGenerator()
+    assert asyncio.run(generator.agenerate_response("What is RAG?", RETRIEVED_DOCS))
+    first = generator._client
+    assert first.is_closed
+
+    async def run_twice():
+        await generator.agenerate_response("Explain RAG", RETRIEVED_DOCS)
+        client = generator._client
+        await generator.aclose()
+        return client
+
+    second = asyncio.run(run_twice())
+    assert second is not first and second.is_closed
+    assert len(fake_ollama.requests) == 2
+
+def test_generate_many_caps_concurrency(monkeypatch):
+    class FakeVectorStore:
+        def search_batch(self, queries, n_results=None):
+            return [[{**RETRIEVED_DOCS[0], "text": query}] for query in queries]
+
+    queries = [f"Question {i}?" for i in range(8)]
+    with FakeOllamaServer(tokens_per_second=200.0) as server:
+        monkeypatch.setattr("config.config.settings.OLLAMA_BASE_URL", server.url)
+
+        async def run():
+            async with AsyncGenerator(max_concurrency=3) as generator:
+                return await generator.generate_many(queries, FakeVectorStore(), retrieval_batch_size=3)
+
+        results = asyncio.run(run())
+        assert [result["query"] for result in results] == queries
+        assert all(result["response"] for result in results)
+        assert 1 < server.max_in_flight <= 3
+
+
+def test_context_packer_dedupes_merges_and_fits_budget(tmp_settings):
+    text = " ".join(f"Sentence number {i} explains one more detail of retrieval." for i in range(12))
+    chunks = TextChunker(chunk_size=40, chunk_overlap=12, tokenizer="approx").chunk(text)
+    docs = [
+        {"id": f"a.txt_{i}", "text": chunks[i], "metadata": {"source": "a.txt", "chunk_index": i},
+         "distance": distance}
+        for i, distance in ((1, 0.2), (0, 0.1))
+    ]
+    docs.append({"id": "copy.txt_0", "text": chunks[0] + " ", "metadata": {"source": "copy.txt", "chunk_index": 0},
+                 "distance": 0.15})
+    docs.append({"id": "b.txt_3", "text": "An unrelated passage. It is ranked last.",
+                 "metadata": {"source": "b.txt", "chunk_index": 3}, "distance": 0.3})
+
+    passages, stats = ContextPacker(token_budget=0).pack(docs)
+    # The copy is dropped, the neighbours are merged with their overlap written once
+    assert [p.get("merged_ids") or [p["id"]] for p in passages] == [["a.txt_0", "a.txt_1"], ["b.txt_3"]]
+    assert chunks[1].startswith(chunks[0].split(". ")[-1])
+    assert passages[0]["text"] == text[:text.index(chunks[1]) + len(chunks[1])]
+    assert stats["duplicates"] == 1 and stats["merged"] == 1 and stats["tokens_saved"] > 0
+
+    passages, budgeted = ContextPacker(token_budget=30).pack(docs)
+    assert len(passages) == 1 and passages[0]["truncated"]
+    assert budgeted["context_tokens"] <= 30 and budgeted["dropped"] == 1
@@ -0,0 +1,443 @@
+"""
+Tests for document ingestion.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import json
+import os
+
+import numpy as np
+
+from src.core.chunker import TextChunker, split_sentences
+from src.core.document_processor import DocumentProcessor
+from src.core.embedding_cache import EmbeddingCache
+from src.core.embedding_io import convert_text_dump, convert_text_dumps, load_embedding_matrix
+from src.core.embeddings import EmbeddingGenerator
+from src.core.ingest import IngestPipeline, ingest
+from src.core.loaders import load_document
+from src.core.manifest import IngestManifest
+from src.core.onnx_embeddings import OnnxEmbeddingModel
+from src.core.vector_store import VectorStore
+
+
+def _write(path: Path, sentences: int, word: str = "alpha") -> None:
+    path.write_text(" ".join(f"{word} sentence number {i}." for i in range(sentences)), encoding="utf-8")
+    # Make sure the manifest sees a new mtime even on coarse filesystems
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_incremental_ingest_only_embeds_changes(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "CHUNK_SIZE", 5)
+    monkeypatch.setattr(tmp_settings, "CHUNK_OVERLAP", 0)
+    _write(tmp_settings.DATA_DIR / "a.txt", 10)
+    _write(tmp_settings.DATA_DIR / "b.txt", 10, word="beta")
+
+    generator = EmbeddingGenerator()
+    vector_store = VectorStore()
+
+    def ingest():
+        return IngestPipeline(DocumentProcessor(), generator, vector_store, IngestManifest(), workers=1).run()
+
+    stats = ingest()
+    assert stats["changed_files"] == 2
+    assert vector_store.count() == 20
+
+    # Re-running without changes touches nothing
+    generator.model.encoded.clear()
+    stats = ingest()
+    assert stats["unchanged_files"] == 2
+    assert generator.model.encoded == []
+
+    # Shrinking a file re-embeds nothing and deletes its stale chunks
+    _write(tmp_settings.DATA_DIR / "a.txt", 6)
+    stats = ingest()
+    assert stats["embedded_chunks"] == 0
+    assert stats["deleted_chunks"] == 4
+    assert vector_store.count() == 16
+
+    # Removing a file deletes all of its chunks
+    (tmp_settings.DATA_DIR / "b.txt").unlink()
+    stats = ingest()
+    assert stats["removed_files"] == 1
+    assert vector_store.count() == 6
+
+
+def test_embedding_cache_skips_known_chunks(tmp_settings, fake_model):
+    chunks = ["shared boilerplate.", "first note.", "shared boilerplate."]
+    generator = EmbeddingGenerator()
+    first = generator.generate_embeddings(chunks)
+    assert generator.model.encoded == ["shared boilerplate.", "first note."]
+
+    # A new process reuses the on-disk cache and preserves output order
+    generator = EmbeddingGenerator()
+    second = generator.generate_embeddings(["first note.", "second note.", "shared boilerplate."])
+    assert generator.model.encoded == ["second note."]
+    assert generator.cache.stats()["hits"] == 2
+    assert second[0] == first[1] and second[2] == first[0]
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_settings):
+    cache = EmbeddingCache(max_entries=2, dimension=4)
+    cache.put_many(["a", "b"], np.eye(4, dtype=np.float32)[:2])
+    cache.get_many(["a"])
+    cache.put_many(["c"], np.eye(4, dtype=np.float32)[2:3])
+    found = cache.get_many(["a", "b", "c"])
+    assert found[1] is None
+    assert found[0][0] == 1.0 and found[2][2] == 1.0
+
+    # Another model never sees these vectors
+    assert EmbeddingCache(model_name="other-model", max_entries=2, dimension=4).get_many(["a"]) == [None]
+    # Nor does another encoder of the same model
+    assert EmbeddingCache(max_entries=2, dimension=4, backend="onnx-int8").get_many(["a"]) == [None]
+
+
+def test_embedding_cache_lookups_do_not_write_the_index(tmp_settings):
+    cache = EmbeddingCache(max_entries=2, dimension=4)
+    cache.put_many(["a", "b"], np.eye(4, dtype=np.float32)[:2])
+    changes = cache.db.total_changes
+    cache.get_many(["b"])
+    cache.get_many(["a", "missing"])
+    assert cache.db.total_changes == changes
+
+    # The recorded lookups are written by the next store, before it evicts
+    cache.put_many(["c"], np.eye(4, dtype=np.float32)[2:3])
+    assert cache.get_many(["b"]) == [None]
+    cache.close()
+    reopened = EmbeddingCache(max_entries=2, dimension=4)
+    assert reopened.get_many(["a"])[0][0] == 1.0
+
+def test_embedding_cache_instances_share_rows_safely(tmp_settings):
+    # Like the ingest pool and the API, both opened before either writes
+    first = EmbeddingCache(max_entries=4, dimension=4)
+    second = EmbeddingCache(max_entries=4, dimension=4)
+    first.put_many(["a", "b"], np.eye(4, dtype=np.float32)[:2])
+    second.put_many(["c"], np.eye(4, dtype=np.float32)[2:3])
+
+    found = first.get_many(["a", "b", "c"])
+    for i, vector in enumerate(found):
+        np.testing.assert_array_equal(vector, np.eye(4, dtype=np.float32)[i])
+    assert second.stats()["entries"] == 3
+
+
+def test_binary_embeddings_round_trip(tmp_settings, fake_model):
+    generator = EmbeddingGenerator()
+    doc = {"file_name": "a.txt", "file_path": "a.txt", "chunks": ["one.", "two."]}
+    generator.save_embeddings(generator.process_document(dict(doc)))
+
+    matrix, sidecar = load_embedding_matrix(tmp_settings.EMBEDDINGS_DIR / "a.txt")
+    assert isinstance(matrix, np.memmap)
+    assert sidecar["ids"] == ["a.txt_0", "a.txt_1"]
+
+    reloaded = dict(doc)
+    assert generator.load_embeddings(reloaded)
+    np.testing.assert_allclose(reloaded["embeddings"], matrix)
+    assert not generator.load_embeddings({**doc, "chunks": ["one.", "changed."]})
+
+
+def test_convert_text_dump(tmp_path):
+    dump = tmp_path / "notes.txt.embeddings"
+    dump.write_text("Chunk 0: [0.5, -1.0, 2.0]\nChunk 1: [1e-3, 0.0, 3.25]\n")
+    base_path = convert_text_dump(dump, dtype="float16")
+
+    matrix, sidecar = load_embedding_matrix(base_path)
+    assert matrix.dtype == np.float16
+    assert sidecar["ids"] == ["notes.txt_0", "notes.txt_1"]
+    np.testing.assert_allclose(matrix, [[0.5, -1.0, 2.0], [1e-3, 0.0, 3.25]], rtol=1e-3)
+    # Without the document's chunks the dump cannot be matched to them
+    assert "chunk_hashes" not in sidecar
+
+
+def test_converted_dump_is_reused_by_load_embeddings(tmp_settings, fake_model):
+    (tmp_settings.DATA_DIR / "notes.txt").write_text("First note. Second note.", encoding="utf-8")
+    doc = DocumentProcessor().process_file(tmp_settings.DATA_DIR / "notes.txt")
+    generator = EmbeddingGenerator()
+    vectors = generator.generate_embeddings(doc["chunks"])
+    # The legacy format written by earlier versions of save_embeddings
+    (tmp_settings.EMBEDDINGS_DIR / "notes.txt.embeddings").write_text(
+        "".join(f"Chunk {i}: {vector}\n" for i, vector in enumerate(vectors))
+    )
+    (tmp_settings.EMBEDDINGS_DIR / "gone.txt.embeddings").write_text("Chunk 0: [1.0, 0.0]\n")
+    convert_text_dumps(dtype="float32")
+
+    generator.model.encoded.clear()
+    assert generator.load_embeddings(doc)
+    np.testing.assert_allclose(doc["embeddings"], vectors, rtol=1e-6)
+    assert generator.model.encoded == []
+    _, sidecar = load_embedding_matrix(tmp_settings.EMBEDDINGS_DIR / "gone.txt")
+    assert sidecar["model"] == tmp_settings.EMBEDDING_MODEL and "chunk_hashes" not in sidecar
+
+
+def test_pipeline_batches_across_documents(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "CHUNK_SIZE", 5)
+    monkeypatch.setattr(tmp_settings, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(tmp_settings, "EMBEDDING_BATCH_SIZE", 8)
+    for i in range(6):
+        _write(tmp_settings.DATA_DIR / f"{i}.txt", 3, word=f"note{i}")
+
+    generator = EmbeddingGenerator()
+    vector_store = VectorStore()
+    encode_calls = []
+    original_encode = generator.model.encode
+    monkeypatch.setattr(generator.model, "encode", lambda texts, **kw: encode_calls.append(len(texts)) or original_encode(texts, **kw))
+
+    stats = ingest(workers=2, generator=generator, vector_store=vector_store)
+    assert stats["changed_files"] == 6
+    assert stats["embedded_chunks"] == 18
+    assert vector_store.count() == 18
+    # Three-chunk documents are combined into batches of at least 8 chunks
+    assert encode_calls[:-1] and all(n >= 8 for n in encode_calls[:-1])
+
+    stats = ingest(workers=2, generator=generator, vector_store=vector_store)
+    assert stats["unchanged_files"] == 6
+    assert stats["embedded_chunks"] == 0
+    assert set(stats["stages"]) == {"chunk", "dedup", "embed", "upsert"}
+
+
+def test_pipeline_stores_copied_passages_once(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "CHUNK_SIZE", 500)
+    signals = ("relevance", "recency", "coverage", "length", "overlap", "density", "novelty", "authority")
+    passage = " ".join(
+        f"The {signal} signal in step {i} reorders candidate notes before the {i}th prompt is built."
+        for i, signal in enumerate(signals)
+    )
+    data_dir = tmp_settings.DATA_DIR
+    (data_dir / "a.txt").write_text(passage, encoding="utf-8")
+    (data_dir / "b.txt").write_text(passage, encoding="utf-8")
+    (data_dir / "c.txt").write_text(passage.replace("step 7", "stage 7"), encoding="utf-8")
+    (data_dir / "d.txt").write_text("Generation writes the answer from the retrieved context.", encoding="utf-8")
+
+    generator = EmbeddingGenerator()
+    vector_store = VectorStore()
+    stats = ingest(workers=1, generator=generator, vector_store=vector_store)
+    assert stats["embedded_chunks"] == 2
+    assert stats["duplicate_chunks"] == 2
+    assert stats["dedup"]["exact_duplicates"] == 1
+    assert stats["dedup"]["near_duplicates"] == 1
+    assert stats["dedup"]["embeddings_avoided"] == 2
+    assert stats["dedup"]["vector_bytes_avoided"] == 2 * tmp_settings.EMBEDDING_DIMENSION * 4
+    assert passage.replace("step 7", "stage 7") not in generator.model.encoded
+
+    records = vector_store.backend.get(include_embeddings=True)
+    assert sorted(records["ids"]) == ["a.txt_0", "d.txt_0"]
+    canonical = records["metadatas"][records["ids"].index("a.txt_0")]
+    assert canonical["duplicates"] == 2
+    assert json.loads(canonical["references"]) == [
+        {"source": "b.txt", "chunk_index": 0}, {"source": "c.txt", "chunk_index": 0}
+    ]
+    # Duplicates share the canonical vector in their saved matrix
+    matrix, _ = load_embedding_matrix(tmp_settings.EMBEDDINGS_DIR / "b.txt")
+    np.testing.assert_allclose(matrix[0], records["embeddings"][records["ids"].index("a.txt_0")], rtol=1e-5)
+
+    # Deleting the canonical file promotes its first duplicate
+    (data_dir / "a.txt").unlink()
+    stats = ingest(workers=1, generator=generator, vector_store=vector_store)
+    assert stats["embedded_chunks"] == 0
+    records = vector_store.backend.get(ids=["b.txt_0"])
+    assert records["documents"] == [passage]
+    assert records["metadatas"][0]["source"] == "b.txt"
+    assert json.loads(records["metadatas"][0]["references"]) == [{"source": "c.txt", "chunk_index": 0}]
+    assert vector_store.count() == 2
+
+    # A duplicate that stops matching is stored on its own
+    _write(data_dir / "c.txt", 3, word="gamma")
+    stats = ingest(workers=1, generator=generator, vector_store=vector_store)
+    assert stats["embedded_chunks"] == 1
+    assert vector_store.backend.get(ids=["b.txt_0"])["metadatas"][0]["duplicates"] == 0
+    assert sorted(vector_store.backend.get()["ids"]) == ["b.txt_0", "c.txt_0", "d.txt_0"]
+
+
+def test_pipeline_keeps_passage_moved_between_files(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "CHUNK_SIZE", 500)
+    passage = "Hybrid search fuses the lexical and vector rankings with reciprocal rank fusion."
+    data_dir = tmp_settings.DATA_DIR
+    _write(data_dir / "a.txt", 3, word="alpha")
+    (data_dir / "c.txt").write_text(passage, encoding="utf-8")
+    generator = EmbeddingGenerator()
+    vector_store = VectorStore()
+    ingest(workers=1, generator=generator, vector_store=vector_store)
+
+    # The passage moves from c.txt to a.txt: c.txt_0 is promoted onto a.txt_0 in the same batch
+    (data_dir / "a.txt").write_text(passage, encoding="utf-8")
+    _write(data_dir / "c.txt", 3, word="gamma")
+    stats = ingest(workers=1, generator=generator, vector_store=vector_store)
+    assert stats["embedded_chunks"] == 1
+
+    records = vector_store.backend.get(include_embeddings=True)
+    texts = dict(zip(records["ids"], records["documents"]))
+    assert sorted(texts) == ["a.txt_0", "c.txt_0"]
+    assert texts["a.txt_0"] == passage
+    assert vector_store.backend.get(ids=["a.txt_0"])["metadatas"][0]["source"] == "a.txt"
+    matrix, _ = load_embedding_matrix(tmp_settings.EMBEDDINGS_DIR / "a.txt")
+    np.testing.assert_allclose(matrix[0], records["embeddings"][records["ids"].index("a.txt_0")], rtol=1e-5)
+
+
+def test_switching_backend_or_dedup_reingests_everything(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "CHUNK_SIZE", 500)
+    monkeypatch.setattr(tmp_settings, "VECTOR_BACKEND", "chroma")
+    passage = "Hybrid search fuses the lexical and vector rankings with reciprocal rank fusion."
+    data_dir = tmp_settings.DATA_DIR
+    (data_dir / "a.txt").write_text(passage, encoding="utf-8")
+    (data_dir / "b.txt").write_text(passage, encoding="utf-8")
+    generator = EmbeddingGenerator()
+    stats = ingest(workers=1, generator=generator, vector_store=VectorStore())
+    assert stats["duplicate_chunks"] == 1
+
+    # A new backend starts empty, so every file is ingested into it
+    monkeypatch.setattr(tmp_settings, "VECTOR_BACKEND", "numpy")
+    vector_store = VectorStore()
+    stats = ingest(workers=1, generator=generator, vector_store=vector_store)
+    assert stats["changed_files"] == 2
+    assert vector_store.count() == 1
+
+    # Turning deduplication off stores the duplicates it skipped
+    monkeypatch.setattr(tmp_settings, "DEDUP_ENABLED", False)
+    stats = ingest(workers=1, generator=generator, vector_store=vector_store)
+    assert stats["changed_files"] == 2
+    assert sorted(vector_store.backend.get()["ids"]) == ["a.txt_0", "b.txt_0"]
+
+
+def test_chunker_applies_overlap_and_splits_long_sentences():
+    chunker = TextChunker(chunk_size=12, chunk_overlap=5, tokenizer="approx")
+    text = "One two three four. Five six seven eight. Nine ten eleven twelve. " + " ".join(["word"] * 30) + "."
+    chunks = chunker.chunk(text)
+
+    assert chunks[0] == "One two three four. Five six seven eight."
+    # The second chunk starts with the last sentence of the first
+    assert chunks[1].startswith("Five six seven eight.")
+    assert all(chunker.count_tokens(chunk) <= 12 for chunk in chunks)
+    assert " ".join(chunks).count("word") >= 30
+    assert chunker.chunk("") == []
+
+
+def test_streaming_reader_matches_whole_file_chunking(tmp_settings):
+    text = "".join(
+        f"Sentence {i} talks about retrieval{'!' if i % 3 else '.'}{' ' * (1 + i % 4)}" for i in range(200)
+    )
+    file_path = tmp_settings.DATA_DIR / "large.txt"
+    file_path.write_text(text, encoding="utf-8")
+
+    processor = DocumentProcessor()
+    expected = processor.process_file(file_path)["chunks"]
+    assert list(processor.iter_file_sentences(file_path, block_size=17)) == list(split_sentences(text))
+    assert list(processor.iter_file_chunks(file_path)) == expected
+
+
+def test_pipeline_streams_large_files(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "CHUNK_SIZE", 5)
+    monkeypatch.setattr(tmp_settings, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(tmp_settings, "EMBEDDING_BATCH_SIZE", 4)
+    monkeypatch.setattr(tmp_settings, "READ_BLOCK_SIZE", 64)
+    monkeypatch.setattr(tmp_settings, "STREAMING_THRESHOLD_BYTES", 0)
+    _write(tmp_settings.DATA_DIR / "big.txt", 10)
+
+    vector_store = VectorStore()
+    stats = ingest(workers=1, generator=EmbeddingGenerator(), vector_store=vector_store)
+    assert stats["changed_files"] == 1
+    assert stats["embedded_chunks"] == 10
+    assert vector_store.count() == 10
+
+    _write(tmp_settings.DATA_DIR / "big.txt", 7)
+    stats = ingest(workers=1, generator=EmbeddingGenerator(), vector_store=vector_store)
+    assert stats["embedded_chunks"] == 0
+    assert stats["deleted_chunks"] == 3
+    assert vector_store.count() == 7
+
+
+def test_mixed_formats_are_loaded_recursively(tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "DOCUMENT_EXCLUDE", [".*", "*/.*", "drafts/*"])
+    data_dir = tmp_settings.DATA_DIR
+    (data_dir / "notes" / "deep").mkdir(parents=True)
+    (data_dir / "drafts").mkdir()
+    (data_dir / "top.txt").write_text("Plain text note.", encoding="utf-8")
+    (data_dir / "notes" / "guide.md").write_text(
+        "---\ntitle: x\n---\n# Setup\nInstall the **tool** from [the site](http://x).\n## Usage\n- Run it.\n",
+        encoding="utf-8",
+    )
+    (data_dir / "notes" / "deep" / "page.html").write_text(
+        "<html><head><title>Page</title><script>var x;</script></head><body><p>Visible text.</p></body></html>",
+        encoding="utf-8",
+    )
+    (data_dir / "notes" / "records.jsonl").write_text(
+        '{"text": "First record.", "author": "ann"}\n\n{"content": "Second record.", "year": 2024}\n',
+        encoding="utf-8",
+    )
+    (data_dir / "drafts" / "skip.txt").write_text("Excluded.", encoding="utf-8")
+    (data_dir / ".hidden.txt").write_text("Hidden.", encoding="utf-8")
+    (data_dir / "image.png").write_bytes(b"\x89PNG")
+
+    assert list(load_document(data_dir / "notes" / "guide.md")) == [
+        ("Install the tool from the site.", {"section": "Setup"}),
+        ("Run it.", {"section": "Usage"}),
+    ]
+    assert list(load_document(data_dir / "notes" / "deep" / "page.html")) == [("Visible text.", {"title": "Page"})]
+
+    processor = DocumentProcessor()
+    docs = {doc["file_name"]: doc for doc in processor.process_all_documents(workers=2)}
+    assert set(docs) == {"top.txt", "notes/guide.md", "notes/deep/page.html", "notes/records.jsonl"}
+    assert docs["notes/records.jsonl"]["chunk_metadata"] == [{"author": "ann", "record": 1}, {"year": 2024, "record": 3}]
+
+    vector_store = VectorStore()
+    stats = ingest(workers=2, generator=EmbeddingGenerator(), vector_store=vector_store)
+    assert stats["changed_files"] == 4
+    records = vector_store.backend.get(where={"source": "notes/records.jsonl"})
+    assert sorted(m["record"] for m in records["metadatas"]) == [1, 3]
+
+
+def test_onnx_model_batches_by_length_and_pools_like_sentence_transformers(tmp_path, monkeypatch):
+    import json
+    import onnxruntime
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    words = "[UNK] rag retrieval vector index bm25 ranks chunks by term".split()
+    tokenizer = Tokenizer(models.WordLevel({word: i for i, word in enumerate(words)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    (tmp_path / "model.onnx").touch()
+    (tmp_path / "embedding.json").write_text(json.dumps(
+        {"pooling": "mean", "normalize": True, "max_seq_length": 6, "dimension": 4}
+    ))
+    table = np.random.default_rng(0).normal(size=(len(words), 4)).astype(np.float32)
+
+    class FakeSession:
+        widths = []
+
+        def __init__(self, path, options, providers):
+            pass
+
+        def get_inputs(self):
+            return [type("Input", (), {"name": name}) for name in ("input_ids", "attention_mask")]
+
+        def run(self, outputs, feed):
+            self.widths.append(feed["input_ids"].shape)
+            return [table[feed["input_ids"]]]
+
+    monkeypatch.setattr(onnxruntime, "InferenceSession", FakeSession)
+    model = OnnxEmbeddingModel(tmp_path, quantize=False, batch_tokens=8)
+    sentences = [
+        "rag ranks chunks by term", "bm25", "vector index", "retrieval", "rag retrieval vector index bm25 ranks chunks"
+    ]
+    vectors = model.encode(sentences, batch_size=2)
+
+    # Sorted by length, batches are padded only to their own longest sentence
+    assert FakeSession.widths == [(2, 1), (1, 2), (1, 5), (1, 6)]
+    for sentence, vector in zip(sentences, vectors):
+        ids = [words.index(word) for word in sentence.split()][:6]
+        expected = table[ids].mean(axis=0)
+        assert np.allclose(vector, expected / np.linalg.norm(expected), atol=1e-6)
+
+
+def test_embeddings_module_does_not_import_torch():
+    import subprocess
+
+    code = (
+        "import sys; import src.core.embeddings; "
+        "print(sorted(m for m in ('torch', 'sentence_transformers') if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True, text=True, check=True
+    )
+    assert completed.stdout.strip() == "[]"
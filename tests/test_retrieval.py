@@ -0,0 +1,284 @@
+"""
+Tests for retrieval from the vector store.
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import time
+
+import numpy as np
+import pytest
+
+from src.core.backends.numpy_backend import NumpyBackend
+from src.core.embeddings import EmbeddingGenerator
+from src.core.reranker import Reranker
+from src.core.semantic_cache import SemanticAnswerCache
+from src.core.vector_store import VectorStore
+
+
+@pytest.fixture(params=["chroma", "numpy"])
+def populated_store(request, tmp_settings, fake_model, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "VECTOR_BACKEND", request.param)
+    generator = EmbeddingGenerator()
+    vector_store = VectorStore(generator)
+    docs = [
+        {
+            "file_name": "rag.txt",
+            "file_path": "rag.txt",
+            "chunks": ["RAG combines retrieval with generation.", "Retrieval uses a vector index."],
+        },
+        {
+            "file_name": "metrics.txt",
+            "file_path": "metrics.txt",
+            "chunks": ["MRR rewards ranking the first relevant result highly.", "Recall at k counts hits."],
+        },
+    ]
+    for doc in docs:
+        vector_store.add_document(generator.process_document(doc))
+    return vector_store
+
+
+def test_search_batch_embeds_queries_with_ingest_model(populated_store):
+    generator = populated_store.embedding_generator
+    generator.model.encoded.clear()
+
+    queries = ["Recall at k counts hits.", "RAG combines retrieval with generation."]
+    results = populated_store.search_batch(queries, n_results=2)
+
+    # One batched forward pass for all queries
+    assert generator.model.encoded == queries
+    assert [r[0]["id"] for r in results] == ["metrics.txt_1", "rag.txt_0"]
+    assert results[0][0]["distance"] == pytest.approx(0.0, abs=1e-5)
+    assert populated_store.search(queries[0], n_results=1) == results[0][:1]
+
+
+def test_search_results_are_cached_until_collection_changes(populated_store):
+    generator = populated_store.embedding_generator
+    populated_store.search("What is  RAG?")
+    generator.model.encoded.clear()
+
+    populated_store.search("what is rag?")
+    assert generator.model.encoded == []
+    assert populated_store.cache_stats()["results"]["hits"] == 1
+
+    populated_store.delete_document("metrics.txt")
+    results = populated_store.search("what is rag?")
+    assert {r["metadata"]["source"] for r in results} == {"rag.txt"}
+    # The query embedding is still reused
+    assert generator.model.encoded == []
+
+
+def test_search_applies_threshold_adaptive_cut_and_filters(populated_store):
+    query = "Recall at k counts hits."
+    # Random fake embeddings of other texts are nearly orthogonal to the query
+    assert [r["id"] for r in populated_store.search(query, n_results=4, threshold=0.5)] == ["metrics.txt_1"]
+    assert [r["id"] for r in populated_store.search(query, n_results=4, max_drop=0.5)] == ["metrics.txt_1"]
+    assert len(populated_store.search(query, n_results=4)) == 4
+
+    # Filters are applied by the backend, so every requested match is found
+    filtered = populated_store.search(query, n_results=4, where={"source": "rag.txt"})
+    assert {r["metadata"]["source"] for r in filtered} == {"rag.txt"} and len(filtered) == 2
+    one = populated_store.search(query, where={"source": "rag.txt", "chunk_index": {"$gte": 1}})
+    assert [r["id"] for r in one] == ["rag.txt_1"]
+    lexical = populated_store.search("retrieval", n_results=4, mode="lexical", where={"file_path": "rag.txt"})
+    assert {r["id"] for r in lexical} == {"rag.txt_0", "rag.txt_1"}
+    assert populated_store.search("MRR", mode="lexical", where={"source": "rag.txt"}) == []
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the words query and chunk share."""
+
+    def __init__(self, model_name="", delay=0.0, **kwargs):
+        self.delay = delay
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=32):
+        self.pairs.extend(pairs)
+        time.sleep(self.delay * len(pairs))
+        return np.array([len(set(q.lower().split()) & set(t.lower().split())) for q, t in pairs], dtype=np.float32)
+
+
+def test_rerank_reorders_candidates_caches_pairs_and_respects_budget(populated_store):
+    model = FakeCrossEncoder()
+    reranker = Reranker(latency_budget_ms=0)
+    reranker._model = model
+    populated_store._reranker = reranker
+
+    results = populated_store.search("recall at k counts hits", n_results=2, rerank=True)
+    assert results[0]["id"] == "metrics.txt_1" and results[0]["rerank_score"] == 4
+    assert len(results) == 2 and len(model.pairs) == 4  # every stored chunk was a candidate
+
+    # Pair scores are cached across searches
+    populated_store.result_cache.clear()
+    populated_store.search("Recall at k  counts hits", n_results=1, rerank=True)
+    assert len(model.pairs) == 4
+
+    # Over budget, the bi-encoder order is kept and not cached
+    slow = Reranker(latency_budget_ms=5, batch_size=1)
+    slow._model = FakeCrossEncoder(delay=0.01)
+    populated_store._reranker = slow
+    fallback = populated_store.search("what is rag", n_results=2, rerank=True)
+    assert [r["id"] for r in fallback] == [r["id"] for r in populated_store.search("what is rag", n_results=2)]
+    assert "rerank_score" not in fallback[0] and slow.fallbacks == 1
+    assert len(slow._model.pairs) < 4
+
+
+def test_hybrid_search_finds_rare_exact_terms(populated_store):
+    lexical = populated_store.search("how is MRR defined", n_results=1, mode="lexical")
+    assert [r["id"] for r in lexical] == ["metrics.txt_0"]
+    assert lexical[0]["distance"] is None and lexical[0]["bm25"] > 0
+
+    hybrid = populated_store.search("how is MRR defined", n_results=4, mode="hybrid")
+    assert "metrics.txt_0" in [r["id"] for r in hybrid]
+    assert all(a["score"] >= b["score"] for a, b in zip(hybrid, hybrid[1:]))
+
+    # Postings follow deletions, and the saved index is reloaded by a new store
+    populated_store.delete_document("metrics.txt")
+    assert populated_store.search("MRR", mode="lexical") == []
+    populated_store.flush()
+    reopened = VectorStore(populated_store.embedding_generator)
+    assert len(reopened.lexical_index) == 2
+    assert reopened.search("vector index", n_results=1, mode="lexical")[0]["id"] == "rag.txt_1"
+
+
+def test_lexical_index_is_rebuilt_when_missing(populated_store):
+    populated_store.flush()
+    populated_store.lexical_index.path.unlink()
+    reopened = VectorStore(populated_store.embedding_generator)
+    assert reopened.search("recall hits", n_results=1, mode="lexical")[0]["id"] == "metrics.txt_1"
+
+
+def test_semantic_cache_requires_similar_query_and_same_chunks():
+    cache = SemanticAnswerCache(max_size=2, threshold=0.9, dimension=3)
+    cache.store([1.0, 0.0, 0.0], ["rag.txt_0", "rag.txt_1"], "RAG answer", generation_seconds=2.5)
+
+    assert cache.lookup([0.95, 0.1, 0.0], ["rag.txt_1", "rag.txt_0"]) == "RAG answer"
+    assert cache.lookup([0.95, 0.1, 0.0], ["rag.txt_0"]) is None
+    assert cache.lookup([0.0, 1.0, 0.0], ["rag.txt_0", "rag.txt_1"]) is None
+    assert cache.stats()["saved_seconds"] == 2.5
+
+    # The least recently used answer is evicted first
+    cache.store([0.0, 1.0, 0.0], ["a"], "A", 1.0)
+    cache.lookup([1.0, 0.0, 0.0], ["rag.txt_0", "rag.txt_1"])
+    cache.store([0.0, 0.0, 1.0], ["b"], "B", 1.0)
+    assert cache.lookup([0.0, 1.0, 0.0], ["a"]) is None
+    assert cache.lookup([1.0, 0.0, 0.0], ["rag.txt_0", "rag.txt_1"]) == "RAG answer"
+
+    # Answers expire like the response cache
+    expiring = SemanticAnswerCache(max_size=2, threshold=0.9, dimension=3, ttl=0.05)
+    expiring.store([1.0, 0.0, 0.0], ["a"], "A", 1.0)
+    assert expiring.lookup([1.0, 0.0, 0.0], ["a"]) == "A"
+    time.sleep(0.06)
+    assert expiring.lookup([1.0, 0.0, 0.0], ["a"]) is None
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_numpy_backend_exact_search_filters_and_persistence(tmp_settings, dtype, monkeypatch):
+    monkeypatch.setattr("src.core.backends.numpy_backend.SEARCH_BLOCK_ROWS", 7)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 16)).astype(np.float32)
+    ids = [f"doc_{i}" for i in range(50)]
+    backend = NumpyBackend(dtype=dtype)
+    backend.upsert(ids, vectors, [f"text {i}" for i in range(50)], [{"parity": i % 2, "i": i} for i in range(50)])
+
+    queries = rng.normal(size=(3, 16)).astype(np.float32)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(queries @ normalized.T), axis=1)[:, :5]
+    results = backend.query(queries, n_results=5)
+    assert results["ids"] == [[f"doc_{i}" for i in row] for row in expected]
+    assert all(d1 <= d2 for row in results["distances"] for d1, d2 in zip(row, row[1:]))
+
+    filtered = backend.query(queries, n_results=5, where={"$and": [{"parity": 1}, {"i": {"$lt": 20}}]})
+    assert all(m["parity"] == 1 and m["i"] < 20 for row in filtered["metadatas"] for m in row)
+    assert len(filtered["ids"][0]) == 5
+
+    # Another instance (e.g. another process) sees writes through the log
+    reader = NumpyBackend()
+    backend.delete(where={"parity": 0})
+    backend.upsert(["doc_1"], vectors[:1], ["replaced"], [{"parity": 1, "i": 1}])
+    assert reader.count() == 25
+    assert reader.get(ids=["doc_1"])["documents"] == ["replaced"]
+    assert reader.query(queries[:1], n_results=100)["ids"][0][0] != "doc_0"
+    assert len(reader.get(where={"parity": 1}, limit=10, offset=20)["ids"]) == 5
+    assert reader.get_ids({"parity": 1}) == reader.get(where={"parity": 1})["ids"]
+
+
+def test_numpy_backend_compacts_and_reuses_rows(tmp_settings):
+    backend = NumpyBackend()
+    vectors = np.eye(8, dtype=np.float32)
+    for round_ in range(3):
+        ids = [f"r{round_}_{i}" for i in range(2000)]
+        backend.upsert(ids, np.tile(vectors, (250, 1)), ids, [{"round": round_}] * 2000)
+        backend.delete(where={"round": round_})
+    assert backend.count() == 0
+    assert backend.generation > 0
+    assert len(list(backend.directory.glob("vectors-*.bin"))) == 1
+
+    backend.upsert(["a"], vectors[:1], ["a"], [{}])
+    assert NumpyBackend().query(vectors[:1], n_results=3)["ids"] == [["a"]]
+
+
+@pytest.mark.parametrize("quantization", ["int8", "pq"])
+def test_quantized_numpy_backend_reranks_to_exact_results(tmp_settings, quantization, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "PQ_SUBVECTORS", 8)
+    monkeypatch.setattr(tmp_settings, "PQ_TRAIN_SIZE", 300)
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 32))
+    vectors = (centers[rng.integers(0, 20, 600)] + 0.3 * rng.normal(size=(600, 32))).astype(np.float32)
+    ids = [f"v{i}" for i in range(600)]
+    exact = NumpyBackend(name="exact")
+    exact.upsert(ids, vectors, ids, [{"i": i} for i in range(600)])
+    backend = NumpyBackend(quantization=quantization)
+    for start in range(0, 600, 200):
+        backend.upsert(ids[start:start + 200], vectors[start:start + 200], ids[start:start + 200], [{}] * 200)
+    assert backend.quantizer is not None and backend.quantizer.kind == quantization
+
+    queries = vectors[:40] + 0.1 * rng.normal(size=(40, 32)).astype(np.float32)
+    expected = exact.query(queries, n_results=5)
+    results = NumpyBackend().query(queries, n_results=5)
+    recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(results["ids"], expected["ids"])])
+    assert recall >= 0.9
+    # Re-ranked distances are exact
+    assert np.allclose(results["distances"][0][0], expected["distances"][0][0], atol=1e-5) or \
+        results["ids"][0][0] != expected["ids"][0][0]
+
+
+@pytest.mark.parametrize("backend_name", ["chroma", "numpy"])
+def test_inspect_collection_pages_stats_and_duplicates(tmp_settings, backend_name):
+    from src.core.backends import create_backend
+    from src.utils.inspect_db import inspect_collection
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((40, 16)).astype(np.float32)
+    vectors[30:33] = vectors[0] + 0.001 * rng.standard_normal((3, 16))  # near-duplicates of chunk 0
+    texts = [f"chunk {i}" for i in range(40)]
+    texts[35:38] = ["copied passage"] * 3
+    backend = create_backend(backend_name)
+    backend.upsert(
+        [f"c{i}" for i in range(40)], vectors.tolist(), texts,
+        [{"source": f"doc{i % 3}.txt", "chunk_index": i} for i in range(40)]
+    )
+
+    report = inspect_collection(backend, page_size=7)
+    assert report["chunks"] == 40 and report["pages"] == 6
+    assert sum(source["chunks"] for source in report["sources"].values()) == 40
+    stored = backend.get(include_embeddings=True)["embeddings"]
+    norms = np.linalg.norm(stored, axis=1)
+    assert report["embeddings"]["norm"]["mean"] == pytest.approx(norms.mean(), abs=1e-5)
+    assert report["embeddings"]["dimension_std"]["mean"] == pytest.approx(stored.std(axis=0).mean(), abs=1e-5)
+    duplicates = report["duplicates"]
+    assert duplicates["exact_text_groups"] == 1 and duplicates["exact_text_chunks"] == 2
+    assert duplicates["near_duplicate_chunks"] == 3
+    assert {record["id"] for record in duplicates["examples"][0]} == {"c0", "c30", "c31", "c32"}
+
+
+def test_popcount_falls_back_without_bitwise_count(monkeypatch):
+    from src.utils import inspect_db
+
+    values = np.array([0, 1, 0xFF, 2**63 + 5, 2**64 - 1], dtype=np.uint64)
+    expected = [bin(int(value)).count("1") for value in values]
+    assert inspect_db.popcount(values).tolist() == expected
+    monkeypatch.delattr(np, "bitwise_count")
+    assert inspect_db.popcount(values).tolist() == expected
+    assert inspect_db.popcount(values[::2]).tolist() == expected[::2]